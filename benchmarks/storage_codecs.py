@@ -0,0 +1,143 @@
+"""
+Encode/decode time and stored size of the data store codecs for tickers, positions and trades.
+
+    python benchmarks/storage_codecs.py [iterations]
+
+Only the codecs module is loaded (by path), so it runs without installing the package or its dependencies
+"""
+import importlib.util
+import logging
+import os
+import sys
+import timeit
+
+CODECS_PATH = os.path.join(os.path.dirname(__file__), os.pardir, "nexus_bitmex_node", "storage", "codecs.py")
+
+spec = importlib.util.spec_from_file_location("codecs_under_benchmark", CODECS_PATH)
+codecs = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(codecs)
+
+logger = logging.getLogger("benchmarks.storage_codecs")
+
+FieldType = codecs.FieldType
+
+# Positions and trades are stored as JSON; their schemas only exist here, under ids the store never uses
+POSITION_SCHEMA = (
+    ("symbol", FieldType.STRING),
+    ("is_open", FieldType.BOOL),
+    ("currency", FieldType.STRING),
+    ("underlying", FieldType.STRING),
+    ("quote_currency", FieldType.STRING),
+    ("leverage", FieldType.NUMBER),
+    ("simple_quantity", FieldType.NUMBER),
+    ("current_quantity", FieldType.NUMBER),
+    ("mark_price", FieldType.NUMBER),
+    ("margin", FieldType.NUMBER),
+    ("maintenance_margin", FieldType.NUMBER),
+    ("average_entry_price", FieldType.NUMBER),
+)
+
+TRADE_SCHEMA = (
+    ("order_id", FieldType.STRING),
+    ("symbol", FieldType.STRING),
+    ("side", FieldType.STRING),
+    ("order_type", FieldType.STRING),
+    ("order_status", FieldType.STRING),
+    ("order_quantity", FieldType.NUMBER),
+    ("filled_quantity", FieldType.NUMBER),
+    ("avg_price", FieldType.NUMBER),
+    ("client_order_id", FieldType.STRING),
+    ("client_order_link_id", FieldType.STRING),
+    ("peg_price_type", FieldType.STRING),
+    ("peg_offset_value", FieldType.NUMBER),
+    ("text", FieldType.STRING),
+    ("stop_price", FieldType.NUMBER),
+)
+
+codecs.register_schema(250, POSITION_SCHEMA)
+codecs.register_schema(251, TRADE_SCHEMA)
+
+TICKER = {
+    "symbol": "XBTUSD",
+    "state": "Open",
+    "currency": "XBt",
+    "underlying": "XBT",
+    "quote_currency": "USD",
+    "mark_price": 57231.42,
+    "lot_size": 100,
+    "max_price": 1000000,
+    "max_order_qty": 10000000,
+    "tick_size": 0.5,
+    "last_price_protected": 57230.5,
+    "multiplier": -100000000,
+    "is_quanto": False,
+    "is_inverse": True,
+    "underlying_to_settle_multiplier": None,
+}
+
+POSITION = {
+    "symbol": "XBTUSD",
+    "is_open": True,
+    "currency": "XBt",
+    "underlying": "XBT",
+    "quote_currency": "USD",
+    "leverage": 5,
+    "simple_quantity": None,
+    "current_quantity": 2500,
+    "mark_price": 57231.42,
+    "margin": 873421,
+    "maintenance_margin": 21834,
+    "average_entry_price": 56890.5,
+}
+
+TRADE = {
+    "order_id": "5fd1b8a2-8c3e-4a4f-9d41-1e6c0c6a8f3b",
+    "symbol": "XBTUSD",
+    "side": "Buy",
+    "order_type": "Limit",
+    "order_status": "Filled",
+    "order_quantity": 2500.0,
+    "filled_quantity": 2500.0,
+    "avg_price": 56890.5,
+    "client_order_id": "c1a6f3e2_main_3f2a",
+    "client_order_link_id": None,
+    "peg_price_type": None,
+    "peg_offset_value": None,
+    "text": "Submitted via API.",
+    "stop_price": None,
+}
+
+ENTITIES = (
+    ("ticker", TICKER, codecs.TICKER_SCHEMA),
+    ("position", POSITION, POSITION_SCHEMA),
+    ("trade", TRADE, TRADE_SCHEMA),
+)
+
+
+def microseconds(statement, iterations: int) -> float:
+    return timeit.timeit(statement, number=iterations) / iterations * 1000000
+
+
+def benchmark(name: str, data: dict, schema, iterations: int):
+    for codec in (codecs.JsonCodec(), codecs.BinaryCodec(schema)):
+        value = codec.encode(data)
+        assert codecs.decode_value(value) == data, f"{codec.name} round trip changed the {name}"
+
+        stored_size = len(value.encode("utf-8") if isinstance(value, str) else value)
+        encode_us = microseconds(lambda: codec.encode(data), iterations)
+        decode_us = microseconds(lambda: codecs.decode_value(value), iterations)
+
+        logger.info(f"{name:<10}{codec.name:<8}{stored_size:>8}{encode_us:>12.2f}{decode_us:>12.2f}")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    logger.info(f"{'entity':<10}{'codec':<8}{'bytes':>8}{'encode us':>12}{'decode us':>12}")
+    for name, data, schema in ENTITIES:
+        benchmark(name, data, schema, iterations)
+
+
+if __name__ == "__main__":
+    main()
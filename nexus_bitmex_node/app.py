@@ -9,6 +9,8 @@ from uvicorn.loops import asyncio as uv_asyncio
 from nexus_bitmex_node import settings
 from nexus_bitmex_node.event_bus import event_bus
 from nexus_bitmex_node.exchange_account import ExchangeAccountManager
+from nexus_bitmex_node.http_session import http_session
+from nexus_bitmex_node.metrics import metrics
 from nexus_bitmex_node.queues import AccountQueueManager, OrderQueueManager, PositionQueueManager
 from nexus_bitmex_node.storage import data_store
 from nexus_bitmex_node.settings import REDIS_URL, AMQP_URL
@@ -25,6 +27,26 @@ def status(request: Request) -> JSONResponse:
     return JSONResponse()
 
 
+def metrics_snapshot(request: Request) -> JSONResponse:
+    return JSONResponse(metrics.snapshot())
+
+
+def circuit_breaker_state(request: Request) -> JSONResponse:
+    account = exchange_account_manager.account if exchange_account_manager else None
+    return JSONResponse({
+        "accountId": account.account_id if account else None,
+        "circuitBreaker": account.circuit_breaker if account else None,
+    })
+
+
+def executions_state(request: Request) -> JSONResponse:
+    account = exchange_account_manager.account if exchange_account_manager else None
+    return JSONResponse({
+        "accountId": account.account_id if account else None,
+        "executions": account.executions if account else [],
+    })
+
+
 async def on_start():
     global exchange_account_manager
 
@@ -50,6 +72,8 @@ async def on_shutdown():
     if exchange_account_manager:
         await exchange_account_manager.disconnect()
 
+    await http_session.close()
+
 
 async def setup_queue_managers():
     global exchange_account_manager
@@ -74,6 +98,9 @@ async def setup_queue_managers():
 
 routes = [
     Route("/status", status),
+    Route("/metrics", metrics_snapshot),
+    Route("/circuit-breaker", circuit_breaker_state),
+    Route("/executions", executions_state),
 ]
 
 app = Starlette(
@@ -1,56 +1,57 @@
 import json
 import logging
 import typing
-from uuid import uuid4
 from datetime import datetime
 
-import ccxtpro
 import watchtower
-from ccxt import (
-    AuthenticationError, PermissionDenied, ArgumentsRequired,
-    InsufficientFunds, InvalidOrder, OrderNotFound,
-)
-from tenacity import (
-    wait_random,
-    AsyncRetrying,
-    stop_after_attempt,
-    retry_unless_exception_type,
-)
 
 from nexus_bitmex_node import settings
+from nexus_bitmex_node.bitmex_client import BitmexClient
+from nexus_bitmex_node.contract_values import contract_valuations
 from nexus_bitmex_node.event_bus import (
     EventBus,
     event_bus,
     ExchangeEventEmitter, OrderEventEmitter,
 )
+from nexus_bitmex_node.instrument_specs import instrument_specs, InstrumentSpec
 from nexus_bitmex_node.models.order import BitmexOrder, OrderSide, OrderType, StopTriggerType
 from nexus_bitmex_node.models.position import BitmexPosition
 from nexus_bitmex_node.models.symbol import BitmexSymbol, create_symbol
-
-FATAL_ORDER_EXCEPTIONS = (
-    AuthenticationError,
-    PermissionDenied,
-    ArgumentsRequired,
-    InsufficientFunds,
-    InvalidOrder,
-    OrderNotFound,
+from nexus_bitmex_node.order_index import SubmissionState, generate_cl_ord_id
+from nexus_bitmex_node.retry import (
+    RetryPolicy, ErrorClass, classify_error,
+    PLACE_ORDER_RETRY, PLACE_STOP_RETRY, CLOSE_POSITION_RETRY, CANCEL_ORDER_RETRY, SET_LEVERAGE_RETRY,
+    AMEND_ORDER_RETRY,
 )
+from nexus_bitmex_node.stream_fallback import ORDERS_STREAM, POSITIONS_STREAM, BALANCE_STREAM, TICKERS_STREAM
+from nexus_bitmex_node.tracing import tracer, REST_ACK
+from nexus_bitmex_node.validation import validate_order
 
 logger = logging.getLogger(__name__)
 logger.addHandler(watchtower.CloudWatchLogHandler(log_group="nexus-bitmex-node", stream_name=settings.app_env))
 
 
+# Amend command fields -> Bitmex amend fields
+AMEND_ORDER_FIELDS = {
+    "price": "price",
+    "orderQty": "orderQty",
+    "stopPrice": "stopPx",
+    "pegOffsetValue": "pegOffsetValue",
+}
+
+
 def _set_leverage_successfully(retry_state):
     return retry_state.get("leverage", None) is not None
 
 
 class BitmexManager(ExchangeEventEmitter, OrderEventEmitter):
     _symbol_data: dict
-    _client: ccxtpro.bitmex
+    _client: BitmexClient
     _client_id: str
     _watching_streams: bool
     _orders_cache: dict
     _positions_cache: dict
+    _margins_hash: typing.Optional[int]
 
     def __init__(self, bus: EventBus):
         ExchangeEventEmitter.__init__(self, bus)
@@ -58,6 +59,7 @@ class BitmexManager(ExchangeEventEmitter, OrderEventEmitter):
         self._symbol_data = {}
         self._orders_cache = {}
         self._positions_cache = {}
+        self._margins_hash = None
 
     def start_streams(self):
         self._watching_streams = True
@@ -66,32 +68,39 @@ class BitmexManager(ExchangeEventEmitter, OrderEventEmitter):
         self._watching_streams = False
 
     @staticmethod
-    async def place_order(client: ccxtpro.bitmex, order: BitmexOrder, ticker, margin):
+    def order_quantity(order: BitmexOrder, ticker, margin) -> typing.Tuple[int, float]:
+        """
+        Validated contracts and price of an order sized by its margin percent
+        :raises PreTradeValidationError:
+        """
+        price = order.price or ticker.get("last_price_protected")
+        quantity = BitmexOrder.calculate_order_quantity(margin, order.percent, price, order.leverage,
+                                                        ticker)
+        return validate_order(order, ticker, quantity, price, margin)
+
+    @staticmethod
+    async def place_order(client: BitmexClient, order: BitmexOrder, ticker, margin,
+                          quantity: typing.Optional[int] = None, cl_ord_id: typing.Optional[str] = None):
+        """
+        :param quantity: contracts to place instead of the order percent of `margin`
+        :param cl_ord_id: clOrdID to submit with, generated from the order's clOrderId by default
+        """
         async def execute_order():
-            async for attempt in AsyncRetrying(reraise=True,
-                                               stop=stop_after_attempt(3),
-                                               retry=retry_unless_exception_type(FATAL_ORDER_EXCEPTIONS),
-                                               wait=wait_random(min=5, max=20)):
-                with attempt:
-                    params = {
-                        "clOrdID": f"{order.client_order_id}_{str(uuid4())[:4]}"
-                    }
-                    logger.info({
-                        "event": "BitmexManager.place_order",
-                        "order": order,
-                        "params": params,
-                        "timestamp": datetime.now()
-                    })
-                    result = await order_func(symbol, side, quantity, price, params)
-                    if result.get("status", None) is not None:
-                        return result
-                    raise Exception('{}')
+            logger.info({
+                "event": "BitmexManager.place_order",
+                "order": order,
+                "params": params,
+                "timestamp": datetime.now()
+            })
+            return await order_func(symbol, side, quantity, price, params)
 
-        price = order.price or ticker.get("last_price_protected")
         side = BitmexOrder.convert_order_side(order.side)
         order_type = BitmexOrder.convert_order_type(order.order_type)
-        quantity = BitmexOrder.calculate_order_quantity(margin, order.percent, price, order.leverage,
-                                                        ticker)
+        if quantity is None:
+            quantity, price = BitmexManager.order_quantity(order, ticker, margin)
+        else:
+            price = order.price or ticker.get("last_price_protected")
+            quantity, price = validate_order(order, ticker, quantity, price, margin)
         symbol = client.safe_symbol(order.symbol)
 
         order_func: typing.Callable = {
@@ -100,33 +109,22 @@ class BitmexManager(ExchangeEventEmitter, OrderEventEmitter):
             OrderType.MARKET: client.create_market_order,
         }[order.order_type]
 
-        return await execute_order()
+        params = {
+            "clOrdID": cl_ord_id or generate_cl_ord_id(order.client_order_id)
+        }
+        return await BitmexManager.submit_order(client, params["clOrdID"], symbol, execute_order, PLACE_ORDER_RETRY)
 
     @staticmethod
-    async def place_stop_order(client: ccxtpro.bitmex, stop_order: BitmexOrder, quantity, ticker):
+    async def place_stop_order(client: BitmexClient, stop_order: BitmexOrder, quantity, ticker):
         async def execute_stop_order():
-            async for attempt in AsyncRetrying(reraise=True,
-                                               stop=stop_after_attempt(3),
-                                               retry=retry_unless_exception_type(FATAL_ORDER_EXCEPTIONS),
-                                               wait=wait_random(min=5, max=20)):
-                with attempt:
-                    params: typing.Dict[str, typing.Any] = {
-                        "stopPx": stop_price,
-                        "clOrdID": f"{stop_order.client_order_id}_{str(uuid4())[:4]}",
-                        "execInst": f"ReduceOnly,{trigger_type}",
-                    }
-                    logger.info({
-                        "event": "BitmexManager.place_stop_order",
-                        "order": stop_order,
-                        "params": params,
-                        "timestamp": datetime.now(),
-                    })
-                    result = await client.create_order(market_symbol, order_type, side, amount=quantity,
-                                                       price=stop_price,
-                                                       params=params)
-                    if result.get("status", None) is not None:
-                        return result
-                    raise Exception('{}')
+            logger.info({
+                "event": "BitmexManager.place_stop_order",
+                "order": stop_order,
+                "params": params,
+                "timestamp": datetime.now(),
+            })
+            return await client.create_order(market_symbol, order_type, side, amount=quantity, price=stop_price,
+                                             params=params)
 
         trigger_type: typing.Optional[str] = BitmexOrder.convert_trigger_type(
             StopTriggerType(stop_order.stop_trigger_type)
@@ -148,44 +146,34 @@ class BitmexManager(ExchangeEventEmitter, OrderEventEmitter):
             raise ValueError("Stop Price Missing")
 
         symbol: BitmexSymbol = create_symbol(ticker)
+        spec: InstrumentSpec = instrument_specs.get(symbol)
 
-        # Rounds price off to the correct tick_size and digits
-        stop_price = float(round(stop_order.stop_price, symbol.fractional_digits))
-        stop_price = stop_price - (stop_price % symbol.tick_size)
+        stop_price = spec.round_price(stop_order.stop_price)
 
         side = BitmexOrder.convert_order_side(stop_order.side)
 
         order_type: typing.Optional[str] = BitmexOrder.convert_order_type(OrderType.STOP)
         market_symbol = client.safe_symbol(symbol.symbol)
 
-        return await execute_stop_order()
+        params: typing.Dict[str, typing.Any] = {
+            "stopPx": stop_price,
+            "clOrdID": generate_cl_ord_id(stop_order.client_order_id),
+            "execInst": f"ReduceOnly,{trigger_type}",
+        }
+        return await BitmexManager.submit_order(client, params["clOrdID"], market_symbol, execute_stop_order,
+                                                PLACE_STOP_RETRY)
 
     @staticmethod
-    async def place_tsl_order(client: ccxtpro.bitmex, tsl_order: BitmexOrder, quantity, ticker):
+    async def place_tsl_order(client: BitmexClient, tsl_order: BitmexOrder, quantity, ticker):
         async def execute_tsl_order():
-            async for attempt in AsyncRetrying(reraise=True,
-                                               stop=stop_after_attempt(3),
-                                               retry=retry_unless_exception_type(FATAL_ORDER_EXCEPTIONS),
-                                               wait=wait_random(min=5, max=20)):
-                with attempt:
-                    params: typing.Dict[str, typing.Any] = {
-                        "stopPx": stop_price,
-                        "pegOffsetValue": peg_offset_value,
-                        "pegPriceType": "TrailingStopPeg",
-                        "clOrdID": f"{tsl_order.client_order_id}_{str(uuid4())[:4]}",
-                        "execInst": f"ReduceOnly,{trigger_type}",
-                    }
-                    logger.info({
-                        "event": "BitmexManager.place_tsl_order",
-                        "order": tsl_order,
-                        "params": params,
-                    })
-                    result = await client.create_order(market_symbol, order_type,
-                                                       BitmexOrder.convert_order_side(tsl_order.side),
-                                                       amount=quantity, price=stop_price, params=params)
-                    if result.get("status", None) is not None:
-                        return result
-                    raise Exception('{}')
+            logger.info({
+                "event": "BitmexManager.place_tsl_order",
+                "order": tsl_order,
+                "params": params,
+            })
+            return await client.create_order(market_symbol, order_type,
+                                             BitmexOrder.convert_order_side(tsl_order.side),
+                                             amount=quantity, price=stop_price, params=params)
 
         trigger_type: typing.Optional[str] = BitmexOrder.convert_trigger_type(
             StopTriggerType(tsl_order.stop_trigger_type)
@@ -205,6 +193,7 @@ class BitmexManager(ExchangeEventEmitter, OrderEventEmitter):
             raise ValueError("Trailing Stop Percent Missing")
 
         symbol: BitmexSymbol = create_symbol(ticker)
+        spec: InstrumentSpec = instrument_specs.get(symbol)
 
         main_order_side = OrderSide.BUY if tsl_order.side == OrderSide.SELL else OrderSide.SELL
 
@@ -221,51 +210,41 @@ class BitmexManager(ExchangeEventEmitter, OrderEventEmitter):
             peg_offset = -1 * current_price * (1 - trailing_offset_factor)
             stop_price = current_price * trailing_offset_factor
 
-        # Rounds price off to the correct tick_size and digits
-        stop_price = float(round(stop_price, symbol.fractional_digits))
-        stop_price = stop_price - (stop_price % symbol.tick_size)
-
-        peg_offset_value = float(round(peg_offset, symbol.fractional_digits))
-        peg_offset_value = peg_offset_value - (peg_offset_value % symbol.tick_size)
+        stop_price = spec.round_price(stop_price)
+        peg_offset_value = spec.round_price(peg_offset)
 
         order_type: typing.Optional[str] = BitmexOrder.convert_order_type(OrderType.STOP)
         market_symbol = client.safe_symbol(symbol.symbol)
 
-        return await execute_tsl_order()
+        params: typing.Dict[str, typing.Any] = {
+            "stopPx": stop_price,
+            "pegOffsetValue": peg_offset_value,
+            "pegPriceType": "TrailingStopPeg",
+            "clOrdID": generate_cl_ord_id(tsl_order.client_order_id),
+            "execInst": f"ReduceOnly,{trigger_type}",
+        }
+        return await BitmexManager.submit_order(client, params["clOrdID"], market_symbol, execute_tsl_order,
+                                                PLACE_STOP_RETRY)
 
     @staticmethod
     async def close_position(
-        client: ccxtpro.bitmex,
+        client: BitmexClient,
         order: BitmexOrder,
         position: BitmexPosition,
         ticker,
     ):
         async def execute_close():
-            async for attempt in AsyncRetrying(reraise=True,
-                                               stop=stop_after_attempt(3),
-                                               retry=retry_unless_exception_type(FATAL_ORDER_EXCEPTIONS),
-                                               wait=wait_random(min=5, max=20)):
-                with attempt:
-                    params: typing.Dict[str, typing.Any] = {
-                        "execInst": "Close",
-                        "clOrdID": f"{order.client_order_id}_{str(uuid4())[:4]}",
-                    }
-
-                    logger.info({
-                        "event": "BitmexManager.close_position",
-                        "order_type": order_type,
-                        "side": side,
-                        "symbol": symbol,
-                        "order_quantity": order_quantity,
-                        "price": price,
-                        "params": params,
-                        "timestamp": datetime.now(),
-                    })
-                    result = await client.create_order(symbol, order_type, side, order_quantity, price,
-                                                       params=params)
-                    if result.get("status", None) is not None:
-                        return result
-                    raise Exception('{}')
+            logger.info({
+                "event": "BitmexManager.close_position",
+                "order_type": order_type,
+                "side": side,
+                "symbol": symbol,
+                "order_quantity": order_quantity,
+                "price": price,
+                "params": params,
+                "timestamp": datetime.now(),
+            })
+            return await client.create_order(symbol, order_type, side, order_quantity, price, params=params)
 
         symbol = client.safe_symbol(order.symbol)
         price = float(order.price or ticker.get("last_price_protected"))
@@ -277,40 +256,34 @@ class BitmexManager(ExchangeEventEmitter, OrderEventEmitter):
 
         order_type = BitmexOrder.convert_order_type(OrderType.LIMIT if price else OrderType.MARKET)
 
-        return await execute_close()
+        params: typing.Dict[str, typing.Any] = {
+            "execInst": "Close",
+            "clOrdID": generate_cl_ord_id(order.client_order_id),
+        }
+        return await BitmexManager.submit_order(client, params["clOrdID"], symbol, execute_close,
+                                                CLOSE_POSITION_RETRY)
 
     @staticmethod
     async def add_stop_to_position(
-        client: ccxtpro.bitmex,
+        client: BitmexClient,
         symbol: BitmexSymbol,
         position: BitmexPosition,
         raw_price: float,
-        trigger_price_type: StopTriggerType
+        trigger_price_type: StopTriggerType,
+        cl_ord_id: str,
     ):
         async def execute_order():
-            async for attempt in AsyncRetrying(reraise=True,
-                                               stop=stop_after_attempt(3),
-                                               retry=retry_unless_exception_type(FATAL_ORDER_EXCEPTIONS),
-                                               wait=wait_random(min=5, max=20)):
-                with attempt:
-                    params: typing.Dict[str, typing.Any] = {
-                        "execInst": f"Close,{trigger_type}"
-                    }
-
-                    logger.info({
-                        "event": "BitmexManager.add_stop_to_position",
-                        "order_type": order_type,
-                        "symbol": symbol,
-                        "side": side,
-                        "price": stop_price,
-                        "params": params,
-                        "timestamp": datetime.now(),
-                    })
-                    result = await client.create_order(market_symbol, order_type, side, amount=None, price=stop_price,
-                                                       params=params)
-                    if result.get("status", None) is not None:
-                        return result
-                    raise Exception('{}')
+            logger.info({
+                "event": "BitmexManager.add_stop_to_position",
+                "order_type": order_type,
+                "symbol": symbol,
+                "side": side,
+                "price": stop_price,
+                "params": params,
+                "timestamp": datetime.now(),
+            })
+            return await client.create_order(market_symbol, order_type, side, amount=None, price=stop_price,
+                                             params=params)
 
         trigger_type: typing.Optional[str] = BitmexOrder.convert_trigger_type(StopTriggerType(trigger_price_type))
         if not trigger_type:
@@ -321,25 +294,41 @@ class BitmexManager(ExchangeEventEmitter, OrderEventEmitter):
             })
             raise ValueError("Invalid Stop Trigger Type")
 
-        # Rounds price off to the correct tick_size and digits
-        stop_price = float(round(raw_price, symbol.fractional_digits))
-        stop_price = stop_price - (stop_price % symbol.tick_size)
+        stop_price = instrument_specs.get(symbol).round_price(raw_price)
 
         side = BitmexOrder.convert_order_side(position.side)
 
         order_type: typing.Optional[str] = BitmexOrder.convert_order_type(OrderType.STOP)
         market_symbol = client.safe_symbol(symbol.symbol)
 
-        return await execute_order()
+        params: typing.Dict[str, typing.Any] = {
+            "clOrdID": cl_ord_id,
+            "execInst": f"Close,{trigger_type}",
+        }
+        return await BitmexManager.submit_order(client, cl_ord_id, market_symbol, execute_order, PLACE_STOP_RETRY)
 
     @staticmethod
     async def add_tsl_to_position(
-        client: ccxtpro.bitmex,
+        client: BitmexClient,
         symbol: BitmexSymbol,
         position: BitmexPosition,
         tsl_percent: float,
-        trigger_price_type: StopTriggerType
+        trigger_price_type: StopTriggerType,
+        cl_ord_id: str,
     ):
+        async def execute_tsl_order():
+            logger.info({
+                "event": "BitmexManager.add_tsl_to_position",
+                "symbol": market_symbol,
+                "order_type": order_type,
+                "side": tsl_side,
+                "price": stop_price,
+                "params": params,
+                "timestamp": datetime.now(),
+            })
+            return await client.create_order(market_symbol, order_type, tsl_side, amount=None, price=stop_price,
+                                             params=params)
+
         trigger_type: typing.Optional[str] = BitmexOrder.convert_trigger_type(StopTriggerType(trigger_price_type))
         if not trigger_type:
             logger.info({
@@ -362,52 +351,195 @@ class BitmexManager(ExchangeEventEmitter, OrderEventEmitter):
         stop_price = current_price * trailing_offset_factor
 
         tsl_side = BitmexOrder.convert_order_side(OrderSide.SELL if position.side == OrderSide.BUY else OrderSide.BUY)
-        stop_px = float(round(stop_price, symbol.fractional_digits))
-        stop_px = stop_px - (stop_px % symbol.tick_size)
-
-        peg_offset_value = float(round(peg_offset, symbol.fractional_digits))
-        peg_offset_value = peg_offset_value - (peg_offset_value % symbol.tick_size)
+        spec: InstrumentSpec = instrument_specs.get(symbol)
+        stop_px = spec.round_price(stop_price)
+        peg_offset_value = spec.round_price(peg_offset)
 
         params: typing.Dict[str, typing.Any] = {
             "stopPx": stop_px,
             "pegPriceType": "TrailingStopPeg",
             "pegOffsetValue": peg_offset_value,
+            "clOrdID": cl_ord_id,
             "execInst": f"Close,{trigger_type}",
         }
+        return await BitmexManager.submit_order(client, cl_ord_id, market_symbol, execute_tsl_order,
+                                                PLACE_STOP_RETRY)
+
+    @staticmethod
+    async def submit_order(
+        client: BitmexClient,
+        cl_ord_id: str,
+        market_symbol: str,
+        submit: typing.Callable[[], typing.Awaitable[dict]],
+        retry_policy: RetryPolicy,
+    ):
+        """
+        Submits an order under `retry_policy` keeping the same clOrdID on every attempt.
+        After an ambiguous failure the order is looked up by clOrdID before it is sent again
+        """
+        submitted_orders = client.submitted_orders
+
+        async for attempt in retry_policy.retrying():
+            with attempt:
+                if submitted_orders.state(cl_ord_id) == SubmissionState.PENDING:
+                    existing = await BitmexManager.find_order_by_cl_ord_id(client, cl_ord_id, market_symbol)
+                    if existing:
+                        return existing
+
+                submitted_orders.track(cl_ord_id)
+                tracer.mark_submitted(cl_ord_id, attempt.retry_state.attempt_number)
+                try:
+                    result = await submit()
+                except Exception as e:
+                    if "duplicate clordid" in str(e).lower():
+                        existing = await BitmexManager.find_order_by_cl_ord_id(client, cl_ord_id, market_symbol)
+                        if existing:
+                            return existing
+                    if classify_error(e) == ErrorClass.FATAL:
+                        submitted_orders.discard(cl_ord_id)
+                    raise
+
+                if result.get("status", None) is not None:
+                    submitted_orders.acknowledge(cl_ord_id, result)
+                    tracer.mark(REST_ACK)
+                    return result
+                raise Exception('{}')
+
+    @staticmethod
+    async def find_order_by_cl_ord_id(client: BitmexClient, cl_ord_id: str,
+                                      market_symbol: typing.Optional[str] = None) -> typing.Optional[dict]:
+        known = client.submitted_orders.get(cl_ord_id)
+        if known:
+            return known
 
         logger.info({
-            "event": "BitmexManager.add_tsl_to_position",
-            "symbol": market_symbol,
-            "order_type": order_type,
-            "side": tsl_side,
-            "price": stop_price,
-            "params": params,
+            "event": "BitmexManager.find_order_by_cl_ord_id",
+            "cl_ord_id": cl_ord_id,
             "timestamp": datetime.now(),
         })
-
-        return await client.create_order(market_symbol, order_type, tsl_side, amount=None, price=stop_price,
-                                         params=params)
+        orders = await client.fetch_orders(market_symbol, limit=1, params={"filter": {"clOrdID": cl_ord_id}})
+        for order in orders:
+            if order.get("info", {}).get("clOrdID") == cl_ord_id:
+                client.submitted_orders.acknowledge(cl_ord_id, order)
+                return order
+        return None
 
     @staticmethod
-    async def cancel_order(client: ccxtpro.bitmex, order_id: str):
-        async for attempt in AsyncRetrying(reraise=True,
-                                           stop=stop_after_attempt(3),
-                                           retry=retry_unless_exception_type(FATAL_ORDER_EXCEPTIONS),
-                                           wait=wait_random(min=5, max=20)):
+    async def cancel_order(client: BitmexClient, order_id: str):
+        async for attempt in CANCEL_ORDER_RETRY.retrying():
             with attempt:
                 logger.info({
                     "event": "BitmexManager.cancel_order",
                     "order_id": order_id,
                     "timestamp": datetime.now(),
                 })
-                return await client.cancel_order(order_id)
+                tracer.mark_attempt(attempt.retry_state.attempt_number)
+                canceled_order = await client.cancel_order(order_id)
+                tracer.mark(REST_ACK)
+                return canceled_order
 
     @staticmethod
-    async def set_position_leverage(client: ccxtpro.bitmex, symbol: str, leverage: float):
-        async for attempt in AsyncRetrying(reraise=True,
-                                           stop=stop_after_attempt(3),
-                                           retry=retry_unless_exception_type(FATAL_ORDER_EXCEPTIONS),
-                                           wait=wait_random(min=5, max=20)):
+    async def cancel_orders(
+        client: BitmexClient,
+        order_ids: typing.Optional[typing.List[str]] = None,
+        cl_ord_ids: typing.Optional[typing.List[str]] = None,
+    ) -> typing.List[dict]:
+        """
+        Cancels several orders in one request. Orders that could not be canceled
+        are returned with their reason in `info["error"]`
+        """
+        request: typing.Dict[str, typing.Any] = {}
+        if order_ids:
+            request["orderID"] = order_ids
+        if cl_ord_ids:
+            request["clOrdID"] = cl_ord_ids
+        if not request:
+            return []
+
+        async for attempt in CANCEL_ORDER_RETRY.retrying():
+            with attempt:
+                logger.info({
+                    "event": "BitmexManager.cancel_orders",
+                    "request": request,
+                    "timestamp": datetime.now(),
+                })
+                return client.parse_orders(await client.privateDeleteOrder(request))
+
+    @staticmethod
+    async def cancel_orders_by_cl_ord_id_prefix(client: BitmexClient, prefix: str) -> typing.List[dict]:
+        def matching(orders: typing.Iterable[dict]) -> typing.List[str]:
+            return [
+                order["info"]["clOrdID"] for order in orders
+                if order.get("status") == "open" and (order.get("info", {}).get("clOrdID") or "").startswith(prefix)
+            ]
+
+        cl_ord_ids = matching(client.orders or [])
+        if not cl_ord_ids:
+            cl_ord_ids = matching(await client.fetch_open_orders())
+
+        return await BitmexManager.cancel_orders(client, cl_ord_ids=cl_ord_ids)
+
+    @staticmethod
+    async def cancel_all_orders(client: BitmexClient, symbol: typing.Optional[str] = None) -> typing.List[dict]:
+        request = {"symbol": symbol} if symbol else {}
+
+        async for attempt in CANCEL_ORDER_RETRY.retrying():
+            with attempt:
+                logger.info({
+                    "event": "BitmexManager.cancel_all_orders",
+                    "symbol": symbol,
+                    "timestamp": datetime.now(),
+                })
+                return client.parse_orders(await client.privateDeleteOrderAll(request))
+
+    @staticmethod
+    async def cancel_all_after(client: BitmexClient, timeout: int) -> dict:
+        """
+        Arms (or disarms with `timeout=0`) Bitmex's dead man's switch
+        :param timeout: milliseconds until every open order is canceled
+        """
+        async for attempt in CANCEL_ORDER_RETRY.retrying():
+            with attempt:
+                logger.info({
+                    "event": "BitmexManager.cancel_all_after",
+                    "timeout": timeout,
+                    "timestamp": datetime.now(),
+                })
+                return await client.privatePostOrderCancelAllAfter({"timeout": timeout})
+
+    @staticmethod
+    async def amend_orders(client: BitmexClient, amendments: typing.List[dict]) -> typing.List[dict]:
+        """
+        Amends resting orders in place. Several amendments are sent as one bulk request
+        :param amendments: [{"orderId": ..., "price": ..., "orderQty": ..., "stopPrice": ..., "pegOffsetValue": ...}]
+        :return: the amended orders
+        """
+        requests: typing.List[dict] = []
+        for amendment in amendments:
+            request = {"orderID": amendment["orderId"]}
+            for field, bitmex_field in AMEND_ORDER_FIELDS.items():
+                if amendment.get(field) is not None:
+                    request[bitmex_field] = amendment[field]
+            requests.append(request)
+
+        async for attempt in AMEND_ORDER_RETRY.retrying():
+            with attempt:
+                logger.info({
+                    "event": "BitmexManager.amend_orders",
+                    "orders": requests,
+                    "timestamp": datetime.now(),
+                })
+                tracer.mark_attempt(attempt.retry_state.attempt_number)
+                if len(requests) == 1:
+                    response = [await client.privatePutOrder(requests[0])]
+                else:
+                    response = await client.privatePutOrderBulk({"orders": requests})
+                tracer.mark(REST_ACK)
+                return client.parse_orders(response)
+
+    @staticmethod
+    async def set_position_leverage(client: BitmexClient, symbol: str, leverage: float):
+        async for attempt in SET_LEVERAGE_RETRY.retrying():
             with attempt:
                 logger.info({
                     "event": "BitmexManager.set_position_leverage",
@@ -420,7 +552,7 @@ class BitmexManager(ExchangeEventEmitter, OrderEventEmitter):
                     return result
                 raise Exception('{}')
 
-    async def watch_my_trades_stream(self, client_id: str, client: ccxtpro.bitmex):
+    async def watch_my_trades_stream(self, client_id: str, client: BitmexClient):
         while self._watching_streams:
             try:
                 await client.watch_my_trades()
@@ -428,37 +560,43 @@ class BitmexManager(ExchangeEventEmitter, OrderEventEmitter):
             except Exception:
                 pass
 
-    async def watch_positions_stream(self, client_id: str, client: ccxtpro.bitmex):
+    async def watch_positions_stream(self, client_id: str, client: BitmexClient):
         while self._watching_streams:
             try:
                 await client.watch_positions()
+                client.stream_freshness.touch(POSITIONS_STREAM)
                 await self.update_positions_data(client_id, client.positions)
             except Exception:
-                pass
+                client.stream_freshness.lose(POSITIONS_STREAM)
 
-    async def watch_tickers_stream(self, client_id: str, client: ccxtpro.bitmex):
+    async def watch_tickers_stream(self, client_id: str, client: BitmexClient):
         while self._watching_streams:
             try:
                 await client.watch_instruments()
+                client.stream_freshness.touch(TICKERS_STREAM)
                 await self.update_ticker_data(client_id, client.tickers)
             except Exception:
                 pass
 
-    async def watch_balance_stream(self, client_id: str, client: ccxtpro.bitmex):
+    async def watch_balance_stream(self, client_id: str, client: BitmexClient):
         while self._watching_streams:
             try:
                 await client.watch_balance()
+                client.stream_freshness.touch(BALANCE_STREAM)
                 await self.update_margin_data(client_id, client.balance)
             except Exception:
-                pass
+                client.stream_freshness.lose(BALANCE_STREAM)
 
-    async def watch_orders_stream(self, client_id: str, client: ccxtpro.bitmex):
+    async def watch_orders_stream(self, client_id: str, client: BitmexClient):
         while self._watching_streams:
             try:
-                await client.watch_orders()
+                orders = await client.watch_orders()
+                client.stream_freshness.touch(ORDERS_STREAM)
+                client.submitted_orders.observe(orders)
+                tracer.observe_orders(orders)
                 await self.update_orders_data(client_id, client.orders)
             except Exception:
-                pass
+                client.stream_freshness.lose(ORDERS_STREAM)
 
     async def update_ticker_data(self, client_id: str, data: typing.Dict):
         if not data:
@@ -471,20 +609,32 @@ class BitmexManager(ExchangeEventEmitter, OrderEventEmitter):
                 continue
             symbol = info.get("symbol")
             tickers[symbol] = info
+        instrument_specs.update_instruments(tickers.values())
+        contract_valuations.update_instruments(tickers.values())
         await self.emit_ticker_updated_event(client_id, tickers)
 
-    async def update_margin_data(self, client_id: str, data: typing.Dict):
+    async def update_margin_data(self, client_id: str, data: typing.Dict) -> bool:
         if not data:
-            return
+            return False
 
+        margins_hash = hash(json.dumps(data.get("info"), default=str))
+        if self._margins_hash == margins_hash:
+            return False
+
+        self._margins_hash = margins_hash
         await self.emit_margins_updated_event(client_id, data)
+        return True
 
-    async def update_orders_data(self, client_id: str, data: typing.Dict):
+    async def update_orders_data(self, client_id: str, data: typing.Dict) -> bool:
+        """
+        :return: whether any order changed
+        """
         if not data:
-            return
+            return False
 
         # ccxt updates give us data for ALL orders even if they were not part of the update.
         # this code will filter out the stuff that didn't change.
+        changed = False
         for order in data:
             order_id = order["id"]
             order_hash = hash(json.dumps(order))
@@ -493,11 +643,16 @@ class BitmexManager(ExchangeEventEmitter, OrderEventEmitter):
                 continue
 
             self._orders_cache[order["id"]] = order_hash
+            changed = True
             await self.emit_order_updated_event(order)
+        return changed
 
-    async def update_positions_data(self, client_id: str, data: typing.Dict):
+    async def update_positions_data(self, client_id: str, data: typing.Dict) -> bool:
+        """
+        :return: whether any position changed
+        """
         if not data:
-            return
+            return False
 
         # ccxt updates give us data for ALL positions even if they were not part of the update.
         # this code will filter out the stuff that didn't change.
@@ -513,6 +668,7 @@ class BitmexManager(ExchangeEventEmitter, OrderEventEmitter):
             self._positions_cache[position_symbol] = position_hash
 
         await self.emit_positions_updated_event(client_id, updated_positions)
+        return bool(updated_positions)
 
     async def update_my_trades_data(self, client_id: str, data: typing.Dict):
         if not data:
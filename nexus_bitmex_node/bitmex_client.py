@@ -0,0 +1,52 @@
+import typing
+
+import ccxtpro
+
+from nexus_bitmex_node.circuit_breaker import CircuitBreaker
+from nexus_bitmex_node.order_index import SubmittedOrderIndex
+from nexus_bitmex_node.rate_limit import RateLimitScheduler, request_priority
+from nexus_bitmex_node.stream_fallback import StreamFreshness
+
+
+class BitmexClient(ccxtpro.bitmex):
+    """
+    ccxtpro Bitmex client whose REST requests go through the account's `CircuitBreaker` and
+    `RateLimitScheduler` instead of ccxt's generic `enableRateLimit` throttle
+    """
+    scheduler: RateLimitScheduler
+    circuit_breaker: CircuitBreaker
+    submitted_orders: SubmittedOrderIndex
+    stream_freshness: StreamFreshness
+
+    def __init__(self, config: typing.Optional[dict] = None, scheduler: typing.Optional[RateLimitScheduler] = None,
+                 circuit_breaker: typing.Optional[CircuitBreaker] = None):
+        super(BitmexClient, self).__init__(dict(config or {}, enableRateLimit=False))
+        self.scheduler = scheduler or RateLimitScheduler()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker("bitmex")
+        self.submitted_orders = SubmittedOrderIndex()
+        self.stream_freshness = StreamFreshness()
+
+    async def fetch2(self, path, api="public", method="GET", params={}, headers=None, body=None):
+        # An open circuit fails fast without spending a token. The probe slot is only taken once the token is:
+        # a request waiting for it must not hold a half-open probe slot
+        self.circuit_breaker.check()
+        await self.scheduler.acquire(request_priority(path, method))
+        generation = self.circuit_breaker.before_request()
+        try:
+            response = await super(BitmexClient, self).fetch2(path, api, method, params, headers, body)
+        except Exception as e:
+            self.circuit_breaker.record_error(generation, e)
+            raise
+        except BaseException:
+            self.circuit_breaker.release(generation)
+            raise
+        self.circuit_breaker.record_success(generation)
+        return response
+
+    async def fetch(self, url, method="GET", headers=None, body=None):
+        self.last_response_headers = None
+        try:
+            return await super(BitmexClient, self).fetch(url, method, headers, body)
+        finally:
+            # ccxt stores the headers before parsing/raising, so this also covers 429 responses
+            self.scheduler.update_from_headers(self.last_response_headers)
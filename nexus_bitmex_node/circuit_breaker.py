@@ -0,0 +1,167 @@
+import enum
+import logging
+import time
+import typing
+from collections import deque
+from datetime import datetime
+
+import watchtower
+
+from nexus_bitmex_node import settings
+from nexus_bitmex_node.exceptions import CircuitOpenError
+from nexus_bitmex_node.metrics import metrics
+from nexus_bitmex_node.retry import ErrorClass, classify_error
+
+logger = logging.getLogger(__name__)
+logger.addHandler(watchtower.CloudWatchLogHandler(log_group="nexus-bitmex-node", stream_name=settings.app_env))
+
+circuit_transitions = metrics.counter("bitmex_circuit_transitions_total", "Circuit breaker state changes")
+circuit_rejected = metrics.counter("bitmex_circuit_rejected_total", "REST requests refused by an open circuit")
+
+# Errors that mean Bitmex could not serve the request
+FAILURE_CLASSES = (ErrorClass.OVERLOAD, ErrorClass.NETWORK)
+
+
+class CircuitState(enum.Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Error-rate circuit breaker for one account's REST requests. While open every request fails fast
+    with `CircuitOpenError`; after `open_seconds` up to `half_open_probes` requests probe the exchange
+    and close the circuit again, or reopen it.
+    Every state change starts a new generation: an outcome only counts in the generation its request was
+    admitted in, so a slow request sent while closed cannot close or reopen a half-open circuit
+    """
+    def __init__(self, name: str, failure_rate: float = 0.5, min_requests: int = 6, window: float = 30.0,
+                 open_seconds: float = 15.0, half_open_probes: int = 1):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_requests = min_requests
+        self.window = window
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+
+        self._state = CircuitState.CLOSED
+        self._generation = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._outcomes: typing.Deque[typing.Tuple[float, bool]] = deque()
+
+    @property
+    def state(self) -> CircuitState:
+        if self._state == CircuitState.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._transition(CircuitState.HALF_OPEN)
+        return self._state
+
+    @property
+    def retry_after(self) -> float:
+        return max(0.0, self.open_seconds - (time.monotonic() - self._opened_at))
+
+    def check(self):
+        """
+        Fails fast like `before_request`, without taking a half-open probe slot
+        :raises CircuitOpenError: when the request may not be sent
+        """
+        state = self.state
+        if state == CircuitState.CLOSED:
+            return
+        if state == CircuitState.HALF_OPEN and self._probes < self.half_open_probes:
+            return
+
+        circuit_rejected.inc(circuit=self.name)
+        raise CircuitOpenError(self.retry_after or self.open_seconds)
+
+    def before_request(self) -> int:
+        """
+        :return: the generation the request is admitted in, to pass to `record_*` and `release`
+        :raises CircuitOpenError: when the request may not be sent
+        """
+        self.check()
+        if self._state == CircuitState.HALF_OPEN:
+            self._probes += 1
+        return self._generation
+
+    def record_success(self, generation: int):
+        self._record(generation, failed=False)
+
+    def record_error(self, generation: int, error: BaseException):
+        if isinstance(error, CircuitOpenError):
+            return
+        self._record(generation, failed=classify_error(error) in FAILURE_CLASSES)
+
+    def release(self, generation: int):
+        """
+        Frees the probe slot of a request that ended without an outcome (cancelled)
+        """
+        if generation == self._generation and self._state == CircuitState.HALF_OPEN:
+            self._probes = max(0, self._probes - 1)
+
+    def snapshot(self) -> dict:
+        self._trim(time.monotonic())
+        failures = sum(1 for _, failed in self._outcomes if failed)
+        return {
+            "state": self.state.value,
+            "requests": len(self._outcomes),
+            "failures": failures,
+            "retryAfter": round(self.retry_after, 3) if self._state == CircuitState.OPEN else 0,
+        }
+
+    def _record(self, generation: int, failed: bool):
+        if generation != self._generation:
+            return
+        if self._state == CircuitState.HALF_OPEN:
+            self._probes = max(0, self._probes - 1)
+            self._transition(CircuitState.OPEN if failed else CircuitState.CLOSED)
+            return
+        if self._state == CircuitState.OPEN:
+            return
+
+        now = time.monotonic()
+        self._outcomes.append((now, failed))
+        self._trim(now)
+
+        if failed and len(self._outcomes) >= self.min_requests:
+            failures = sum(1 for _, outcome in self._outcomes if outcome)
+            if failures / len(self._outcomes) >= self.failure_rate:
+                self._transition(CircuitState.OPEN)
+
+    def _trim(self, now: float):
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            self._outcomes.popleft()
+
+    def _transition(self, state: CircuitState):
+        if state == self._state:
+            return
+
+        if state == CircuitState.OPEN:
+            self._opened_at = time.monotonic()
+        if state != CircuitState.HALF_OPEN:
+            self._probes = 0
+        if state == CircuitState.CLOSED:
+            self._outcomes.clear()
+
+        logger.info({
+            "event": "CircuitBreaker.transition",
+            "circuit": self.name,
+            "from": self._state.value,
+            "to": state.value,
+            "timestamp": datetime.now(),
+        })
+        circuit_transitions.inc(circuit=self.name, state=state.value)
+        self._state = state
+        self._generation += 1
+
+
+def create_circuit_breaker(name: str) -> CircuitBreaker:
+    return CircuitBreaker(
+        name,
+        failure_rate=settings.CIRCUIT_BREAKER_FAILURE_RATE,
+        min_requests=settings.CIRCUIT_BREAKER_MIN_REQUESTS,
+        window=settings.CIRCUIT_BREAKER_WINDOW,
+        open_seconds=settings.CIRCUIT_BREAKER_OPEN_SECONDS,
+        half_open_probes=settings.CIRCUIT_BREAKER_HALF_OPEN_PROBES,
+    )
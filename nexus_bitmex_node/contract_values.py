@@ -0,0 +1,96 @@
+import typing
+
+from attr import dataclass
+
+# Settlement currency base unit -> major unit (e.g. satoshi -> XBT)
+SETTLEMENT_CURRENCY_FACTORS = {
+    "XBt": 1 / 100000000,
+    "USDt": 1 / 1000000,
+    "GWei": 1 / 1000000000,
+}
+DEFAULT_SETTLEMENT_CURRENCY = "XBt"
+
+VALUATION_FIELDS = ("multiplier", "is_quanto", "is_inverse", "currency", "underlying_to_settle_multiplier")
+INSTRUMENT_VALUATION_FIELDS = ("multiplier", "isQuanto", "isInverse", "settlCurrency", "underlyingToSettleMultiplier")
+
+
+def settlement_currency_factor(currency: typing.Optional[str]) -> float:
+    return SETTLEMENT_CURRENCY_FACTORS.get(currency, 1)
+
+
+@dataclass(frozen=True)
+class ContractValuation:
+    """
+    Value of one contract in its settlement currency (XBT for XBt settled contracts).
+    Inverse contracts are worth `factor / price`, quanto and linear contracts `factor * price`
+    """
+    symbol: str
+    is_inverse: bool
+    factor: float
+
+    def value(self, price: float) -> float:
+        return self.factor / price if self.is_inverse else self.factor * price
+
+
+def create_contract_valuation(symbol: str, multiplier: typing.Optional[float], is_quanto: typing.Optional[bool],
+                              is_inverse: typing.Optional[bool], currency: typing.Optional[str],
+                              underlying_to_settle_multiplier: typing.Optional[float]) -> ContractValuation:
+    settle_factor = settlement_currency_factor(currency)
+
+    if multiplier is None:
+        if not underlying_to_settle_multiplier:
+            raise ValueError(f"Missing contract multiplier for {symbol}")
+        # Linear contracts on one unit of the underlying
+        multiplier = underlying_to_settle_multiplier
+
+    # A negative multiplier also marks an inverse contract
+    inverse = bool(is_inverse) or (not is_quanto and multiplier < 0)
+    return ContractValuation(symbol=symbol, is_inverse=inverse, factor=abs(multiplier) * settle_factor)
+
+
+class ContractValuationRegistry:
+    """
+    Per-symbol contract valuations, recomputed only when the instrument's valuation fields change
+    """
+    _valuations: typing.Dict[str, typing.Tuple[tuple, ContractValuation]]
+
+    def __init__(self):
+        self._valuations = {}
+
+    def __len__(self):
+        return len(self._valuations)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._valuations
+
+    def get(self, ticker: dict) -> ContractValuation:
+        """
+        :param ticker: stored instrument data (see `BitmexSymbol.to_json`)
+        """
+        return self._put(ticker["symbol"], tuple(ticker.get(field) for field in VALUATION_FIELDS))
+
+    def update_instruments(self, instruments: typing.Iterable[dict]):
+        """
+        :param instruments: raw Bitmex instrument data
+        """
+        for instrument in instruments:
+            if instrument.get("symbol") and instrument.get("multiplier") is not None:
+                self._put(instrument["symbol"], tuple(instrument.get(field) for field in INSTRUMENT_VALUATION_FIELDS))
+
+    def value(self, ticker: dict, price: float) -> float:
+        return self.get(ticker).value(price)
+
+    def _put(self, symbol: str, source: tuple) -> ContractValuation:
+        multiplier, is_quanto, is_inverse, currency, underlying_to_settle_multiplier = source
+        source = (multiplier, bool(is_quanto), bool(is_inverse), currency, underlying_to_settle_multiplier)
+
+        cached = self._valuations.get(symbol)
+        if cached and cached[0] == source:
+            return cached[1]
+
+        valuation = create_contract_valuation(symbol, *source)
+        self._valuations[symbol] = (source, valuation)
+        return valuation
+
+
+contract_valuations = ContractValuationRegistry()
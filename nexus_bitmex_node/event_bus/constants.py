@@ -25,12 +25,15 @@ MY_TRADES_UPDATED_EVENT_KEY = "my_trades_updated_event"
 CREATE_ORDER_CMD_KEY = "create_order_cmd"
 UPDATE_ORDER_CMD_KEY = "update_order_cmd"
 CANCEL_ORDER_CMD_KEY = "cancel_order_cmd"
+CANCEL_ORDERS_CMD_KEY = "cancel_orders_cmd"
 
 # Order events
 ORDER_PLACED_EVENT_KEY = "order_placed_event"
 ORDER_CREATED_EVENT_KEY = "order_created_event"
 ORDER_UPDATED_EVENT_KEY = "order_updated_event"
+ORDER_AMENDED_EVENT_KEY = "order_amended_event"
 ORDER_CANCELED_EVENT_KEY = "order_deleted_event"
+ORDERS_CANCELED_EVENT_KEY = "orders_deleted_event"
 
 # Position commands
 POSITION_CLOSE_CMD_KEY = "position_close_cmd"
@@ -5,10 +5,13 @@ from .constants import (
     CREATE_ORDER_CMD_KEY,
     UPDATE_ORDER_CMD_KEY,
     CANCEL_ORDER_CMD_KEY,
+    CANCEL_ORDERS_CMD_KEY,
 
     ORDER_CREATED_EVENT_KEY,
     ORDER_UPDATED_EVENT_KEY,
+    ORDER_AMENDED_EVENT_KEY,
     ORDER_CANCELED_EVENT_KEY,
+    ORDERS_CANCELED_EVENT_KEY,
 )
 
 
@@ -25,15 +28,24 @@ class OrderEventListener(EventListener):
     def register_cancel_order_listener(self, listener: typing.Callable, loop, rate_limit: float = None):
         self.register_listener(CANCEL_ORDER_CMD_KEY, listener, loop, rate_limit)
 
+    def register_cancel_orders_listener(self, listener: typing.Callable, loop, rate_limit: float = None):
+        self.register_listener(CANCEL_ORDERS_CMD_KEY, listener, loop, rate_limit)
+
     def register_order_created_listener(self, listener: typing.Callable, loop, rate_limit: float = None):
         self.register_listener(ORDER_CREATED_EVENT_KEY, listener, loop, rate_limit)
 
     def register_order_updated_listener(self, listener: typing.Callable, loop, rate_limit: float = None):
         self.register_listener(ORDER_UPDATED_EVENT_KEY, listener, loop, rate_limit)
 
+    def register_order_amended_listener(self, listener: typing.Callable, loop, rate_limit: float = None):
+        self.register_listener(ORDER_AMENDED_EVENT_KEY, listener, loop, rate_limit)
+
     def register_order_canceled_listener(self, listener: typing.Callable, loop, rate_limit: float = None):
         self.register_listener(ORDER_CANCELED_EVENT_KEY, listener, loop, rate_limit)
 
+    def register_orders_canceled_listener(self, listener: typing.Callable, loop, rate_limit: float = None):
+        self.register_listener(ORDERS_CANCELED_EVENT_KEY, listener, loop, rate_limit)
+
 
 class OrderEventEmitter(EventEmitter):
     async def emit_create_order_event(self, *args, **kwargs):
@@ -45,11 +57,20 @@ class OrderEventEmitter(EventEmitter):
     async def emit_cancel_order_event(self, *args, **kwargs):
         await self.emit(CANCEL_ORDER_CMD_KEY, *args, **kwargs)
 
+    async def emit_cancel_orders_event(self, *args, **kwargs):
+        await self.emit(CANCEL_ORDERS_CMD_KEY, *args, **kwargs)
+
     async def emit_order_created_event(self, *args, **kwargs):
         await self.emit(ORDER_CREATED_EVENT_KEY, *args, **kwargs)
 
     async def emit_order_updated_event(self, *args, **kwargs):
         await self.emit(ORDER_UPDATED_EVENT_KEY, *args, **kwargs)
 
+    async def emit_order_amended_event(self, *args, **kwargs):
+        await self.emit(ORDER_AMENDED_EVENT_KEY, *args, **kwargs)
+
     async def emit_order_canceled_event(self, *args, **kwargs):
         await self.emit(ORDER_CANCELED_EVENT_KEY, *args, **kwargs)
+
+    async def emit_orders_canceled_event(self, *args, **kwargs):
+        await self.emit(ORDERS_CANCELED_EVENT_KEY, *args, **kwargs)
@@ -1,5 +1,18 @@
+import json
 import typing
 
+from ccxt import InvalidOrder, ExchangeNotAvailable
+
+CIRCUIT_OPEN_ERROR_CODE = "CIRCUIT_OPEN"
+
+
+def bitmex_error_body(message: str, name: str) -> str:
+    """
+    Formats a locally raised error like a Bitmex error response, so that
+    `ExchangeAccount.parse_order_error_message` handles it the same way
+    """
+    return "bitmex " + json.dumps({"error": {"message": message, "name": name}})
+
 
 class InvalidApiKeysError(ValueError):
     def __init__(self, account_id: str):
@@ -17,3 +30,23 @@ class WrongOrderError(ValueError):
     def __init__(self, order_id: typing.Optional[str]):
         super(WrongOrderError, self).__init__()
         self.order_id: typing.Optional[str] = order_id
+
+
+class PreTradeValidationError(InvalidOrder):
+    """
+    Order rejected locally before it was sent to Bitmex
+    """
+    def __init__(self, message: str):
+        super(PreTradeValidationError, self).__init__(bitmex_error_body(message, "ValidationError"))
+        self.message: str = message
+
+
+class CircuitOpenError(ExchangeNotAvailable):
+    """
+    Request refused locally because the account's circuit breaker is open
+    """
+    def __init__(self, retry_after: float):
+        self.message: str = f"{CIRCUIT_OPEN_ERROR_CODE}: Bitmex is overloaded, requests are paused for " \
+                            f"{max(1, round(retry_after))}s"
+        super(CircuitOpenError, self).__init__(bitmex_error_body(self.message, "CircuitOpen"))
+        self.retry_after: float = retry_after
@@ -12,21 +12,45 @@ from ccxtpro.base import AuthenticationError as ClientAuthenticationError
 
 from nexus_bitmex_node import settings
 from nexus_bitmex_node.bitmex import bitmex_manager, BitmexManager
+from nexus_bitmex_node.bitmex_client import BitmexClient
+from nexus_bitmex_node.circuit_breaker import create_circuit_breaker
 from nexus_bitmex_node.event_bus import (
     OrderEventListener, OrderEventEmitter,
-    EventBus, AccountEventEmitter, ExchangeEventEmitter, PositionEventEmitter, PositionEventListener,
+    EventBus, AccountEventEmitter, ExchangeEventEmitter, ExchangeEventListener, PositionEventEmitter,
+    PositionEventListener,
 )
 from nexus_bitmex_node.exceptions import InvalidApiKeysError
+from nexus_bitmex_node.execution import (
+    ExecutionScheduler, ExecutionState, TimerWheel, aggregate_order, create_execution_spec, create_execution_state,
+)
+from nexus_bitmex_node.http_session import http_session
 from nexus_bitmex_node.models.order import BitmexOrder, create_order, StopTriggerType
 from nexus_bitmex_node.models.position import BitmexPosition
 from nexus_bitmex_node.models.symbol import BitmexSymbol, create_symbol
+from nexus_bitmex_node.order_index import position_stop_cl_ord_id
+from nexus_bitmex_node.rate_limit import RateLimitScheduler
 from nexus_bitmex_node.settings import ServerMode
-from nexus_bitmex_node.storage import DataStore
+from nexus_bitmex_node.storage import DataStore, TradingContext
+from nexus_bitmex_node.stream_fallback import StreamPollingFallback
+from nexus_bitmex_node.symbol_actors import SymbolActorPool
+from nexus_bitmex_node.tracing import tracer, BUS_DISPATCHED, LEVERAGE_SET, TRIGGERED
+from nexus_bitmex_node.triggers import TriggerEngine, ConditionalOrder, create_conditional_order
+
+
+def command_symbol(message_id: str, data: dict) -> typing.Optional[str]:
+    """
+    Symbol an order/position command acts on, if it names one
+    """
+    orders = data.get("orders")
+    if isinstance(orders, dict):
+        return (orders.get("main") or {}).get("symbol")
+    return data.get("symbol")
 
 
 class ExchangeAccount(
     AccountEventEmitter,
     ExchangeEventEmitter,
+    ExchangeEventListener,
     OrderEventListener,
     OrderEventEmitter,
     PositionEventListener,
@@ -41,6 +65,9 @@ class ExchangeAccount(
         :raises:
             InvalidApiKeys: Raised when either the api_key or api_secret are invalid
         """
+        self._symbol_actors = SymbolActorPool(on_dropped=self._on_dropped_command)
+        self._triggers = TriggerEngine(self._on_conditional_order_triggered)
+
         AccountEventEmitter.__init__(self, event_bus=bus)
         OrderEventListener.__init__(self, event_bus=bus)
 
@@ -52,6 +79,10 @@ class ExchangeAccount(
         self._api_secret = api_secret
         self._client: typing.Optional[ccxtpro.bitmex] = None
         self._websocket_stream_ids: typing.List[uuid.UUID] = []
+        self._keep_warm_task: typing.Optional[asyncio.Future] = None
+        self._stream_fallback_task: typing.Optional[asyncio.Future] = None
+        self._execution_wheel = TimerWheel(tick=settings.EXECUTION_TIMER_TICK)
+        self._executions: typing.Optional[ExecutionScheduler] = None
 
     async def start(self):
         await self._connect_client()
@@ -59,33 +90,139 @@ class ExchangeAccount(
         await self._connect_to_socket_stream()
 
     async def disconnect(self):
+        # Conditional orders are not persisted, their commands are answered instead of left waiting
+        for conditional_order in self._triggers.cancel_by_client_order_id_prefix(""):
+            await self.emit_order_created_event(conditional_order.id, orders=None,
+                                                errors={"main": "Conditional order canceled, the account disconnected"})
+
+        # Queued commands were acked on the queue, they run or are answered (see `_on_dropped_command`)
+        await self._symbol_actors.stop(settings.SYMBOL_ACTOR_DRAIN_TIMEOUT)
+
+        if self._keep_warm_task:
+            self._keep_warm_task.cancel()
+            self._keep_warm_task = None
+
+        if self._stream_fallback_task:
+            self._stream_fallback_task.cancel()
+            self._stream_fallback_task = None
+
+        await self._execution_wheel.stop()
+
         if self._client:
             await self._client.close()
             self._client = None
 
         bitmex_manager.stop_streams()
 
+    @property
+    def circuit_breaker(self) -> typing.Optional[dict]:
+        return self._client.circuit_breaker.snapshot() if self._client else None
+
+    @property
+    def symbol_actors(self) -> typing.Dict[str, int]:
+        """
+        Commands queued per symbol actor
+        """
+        return self._symbol_actors.state()
+
+    @property
+    def executions(self) -> typing.List[dict]:
+        """
+        Parent orders being worked in slices
+        """
+        return self._executions.state() if self._executions else []
+
     def register_listeners(self):
         loop = asyncio.get_event_loop()
-        self.register_create_order_listener(self._on_create_order, loop)
-        self.register_cancel_order_listener(self._on_cancel_order, loop)
-        self.register_close_position_listener(self._on_close_position, loop)
-        self.register_add_stop_to_position_listener(self._on_add_stop_to_position, loop)
-        self.register_add_tsl_to_position_listener(self._on_add_tsl_to_position, loop)
+
+        # Commands for one symbol run in order on that symbol's actor, other symbols run in parallel
+        def on_symbol(handler):
+            return self._symbol_actors.dispatcher(handler, command_symbol)
+
+        self.register_create_order_listener(on_symbol(self._on_create_order), loop)
+        self.register_update_order_listener(on_symbol(self._on_update_order), loop)
+        self.register_cancel_order_listener(
+            self._symbol_actors.dispatcher(self._on_cancel_order, self._cancel_order_symbol), loop)
+        self.register_cancel_orders_listener(on_symbol(self._on_cancel_orders), loop)
+        self.register_close_position_listener(on_symbol(self._on_close_position), loop)
+        self.register_add_stop_to_position_listener(on_symbol(self._on_add_stop_to_position), loop)
+        self.register_add_tsl_to_position_listener(on_symbol(self._on_add_tsl_to_position), loop)
+        self.register_ticker_updated_listener(self._on_ticker_updated, loop)
+        self.register_order_updated_listener(self._on_order_updated, loop)
+
+    async def _cancel_order_symbol(self, message_id: str, data: dict) -> typing.Optional[str]:
+        """
+        Symbol of the order a cancel order command names, so the cancel runs after the commands placing it
+        """
+        order_id = data.get("orderId")
+        if not isinstance(order_id, str):
+            return None
+
+        state = self._executions.get(order_id) if self._executions else None
+        if state:
+            return state.order.symbol
+        trade = await self._data_store.get_trade(self.account_id, order_id)
+        return trade.symbol if trade else None
+
+    async def _on_dropped_command(self, handler: typing.Callable[..., typing.Awaitable[None]], *args):
+        """
+        Answers the commands the account disconnected before running to the end
+        """
+        error = "Command canceled, the account disconnected"
+        rejections = {
+            self._on_create_order: lambda message_id, _: self.emit_order_created_event(
+                message_id, orders=None, errors={"main": error}),
+            self._place_triggered_order: lambda conditional_order, _: self.emit_order_created_event(
+                conditional_order.id, orders=None, errors={"main": error}),
+            self._on_update_order: lambda message_id, _: self.emit_order_amended_event(
+                message_id, orders=None, error=error),
+            self._on_cancel_order: lambda message_id, _: self.emit_order_canceled_event(
+                message_id, order=None, error=error),
+            self._on_cancel_orders: lambda message_id, _: self.emit_orders_canceled_event(
+                message_id, orders=None, error=error, cancel_all_after=None),
+            self._on_close_position: lambda message_id, _: self.emit_position_closed_event(
+                message_id, None, error=error),
+            self._on_add_stop_to_position: lambda message_id, _: self.emit_added_stop_to_position_event(
+                message_id, stop_order=None, error=error),
+            self._on_add_tsl_to_position: lambda message_id, _: self.emit_added_tsl_to_position_event(
+                message_id, tsl_order=None, error=error),
+        }
+        reject = rejections.get(handler)
+        if reject:
+            await reject(*args)
 
     async def _connect_client(self):
-        self._client = ccxtpro.bitmex(
+        scheduler = RateLimitScheduler(
+            limit=settings.BITMEX_RATE_LIMIT,
+            period=settings.BITMEX_RATE_LIMIT_PERIOD,
+            reserve=settings.BITMEX_RATE_LIMIT_RESERVE,
+        )
+        self._client = BitmexClient(
             {
                 "apiKey": self._api_key,
                 "secret": self._api_secret,
                 "timeout": 30000,
-                "enableRateLimit": True,
-            }
+                "session": http_session.session,
+            },
+            scheduler=scheduler,
+            circuit_breaker=create_circuit_breaker(self.account_id),
+        )
+        self._executions = ExecutionScheduler(
+            self._execution_wheel,
+            scheduler,
+            min_tokens=settings.EXECUTION_MIN_RATE_TOKENS,
+            place_slice=self._place_execution_slice,
+            on_progress=self._on_execution_progress,
+            dispatch=self._symbol_actors.tell,
+            cancel_slices=self._cancel_execution_slices,
         )
+        self._execution_wheel.start()
 
         if not settings.SERVER_MODE == ServerMode.PROD and not settings.app_env == "production":
             self._client.set_sandbox_mode(True)
 
+        await self._warm_up_connections()
+
         try:
             margins = await self._client.fetch_balance()
             positions = await self._client.fetch_positions()
@@ -99,6 +236,16 @@ class ExchangeAccount(
             print(f"invalid creds {self._api_key} {self._api_secret}")
             raise InvalidApiKeysError(self.account_id)
 
+    async def _warm_up_connections(self):
+        api_urls = self._client.urls["api"]
+        api_url = api_urls["private"] if isinstance(api_urls, dict) else api_urls
+        ping_url = f"{api_url}/api/v1"
+
+        await http_session.warm_up(ping_url, settings.HTTP_WARM_CONNECTIONS)
+        self._keep_warm_task = asyncio.ensure_future(
+            http_session.keep_warm(ping_url, settings.HTTP_KEEP_WARM_INTERVAL, settings.HTTP_WARM_CONNECTIONS)
+        )
+
     async def _connect_to_socket_stream(self):
         bitmex_manager.start_streams()
 
@@ -108,6 +255,17 @@ class ExchangeAccount(
         asyncio.ensure_future(bitmex_manager.watch_balance_stream(self.account_id, self._client))
         asyncio.ensure_future(bitmex_manager.watch_orders_stream(self.account_id, self._client))
 
+        stream_fallback = StreamPollingFallback(
+            bitmex_manager,
+            self.account_id,
+            self._client,
+            stale_after=settings.STREAM_STALE_SECONDS,
+            min_interval=settings.STREAM_POLL_MIN_INTERVAL,
+            max_interval=settings.STREAM_POLL_MAX_INTERVAL,
+            budget_share=settings.STREAM_POLL_BUDGET_SHARE,
+        )
+        self._stream_fallback_task = asyncio.ensure_future(stream_fallback.run())
+
     async def _init_tickers(self):
         data = await self._client.fetch_tickers()
         tickers: typing.Dict = {}
@@ -120,6 +278,8 @@ class ExchangeAccount(
         await self.emit_ticker_updated_event(self.account_id, tickers)
 
     async def _on_create_order(self, message_id: str, order_data: dict):
+        tracer.mark(BUS_DISPATCHED)
+
         orders: typing.Dict[str, dict] = order_data["orders"]
         errors: typing.Dict[str, str] = {}
 
@@ -127,12 +287,17 @@ class ExchangeAccount(
             await self.emit_order_created_event(message_id, orders=None, errors={"main": "Missing main order"})
             return
 
+        if orders["main"].get("triggers"):
+            await self._arm_conditional_order(message_id, order_data)
+            return
+
         main_order: BitmexOrder = create_order(orders.get("main", {}))
         stop_order: typing.Optional[BitmexOrder] = None
         tsl_order: typing.Optional[BitmexOrder] = None
 
         try:
             await BitmexManager.set_position_leverage(self._client, main_order.symbol, main_order.leverage)
+            tracer.mark(LEVERAGE_SET)
         except Exception as e:
             parsed_error = ExchangeAccount.parse_order_error_message(e)
             errors = {
@@ -150,16 +315,20 @@ class ExchangeAccount(
             elif "tsl" in cl_order_id:
                 tsl_order = create_order(order)
 
-        ticker = await self._data_store.get_ticker(self.account_id, main_order.symbol)
+        # The margin of the symbol's settlement currency, contract values are in that currency too
+        context: TradingContext = await self._data_store.get_trading_context(self.account_id, main_order.symbol)
+        ticker = context.ticker
 
-        # currency = ticker.get("underlying")
-        # self._client.safe_market(order.symbol)
-        # safe = self._client.safe_currency(currency)
-        # TODO: Fix this
-        currency = "BTC"
+        margin_balance = context.margin.get("available", 0)
 
-        margin = await self._data_store.get_margin(self.account_id, "XBt")
-        margin_balance = margin.get("available", 0)
+        if orders["main"].get("execution"):
+            if stop_order or tsl_order:
+                await self.emit_order_created_event(message_id, orders=None, errors={
+                    "main": "Stop and trailing stop orders are not supported with sliced execution"
+                })
+                return
+            await self._start_execution(message_id, orders["main"]["execution"], main_order, ticker, margin_balance)
+            return
 
         order_results = {}
         main_order_result = None
@@ -194,13 +363,121 @@ class ExchangeAccount(
 
         await self.emit_order_created_event(message_id, orders=order_results, errors=errors)
 
+    async def _start_execution(self, message_id: str, execution: dict, main_order: BitmexOrder,
+                               ticker: typing.Optional[dict], margin: float):
+        """
+        Works the main order as a series of child orders; it is answered once the first slice is placed
+        """
+        try:
+            spec = create_execution_spec(execution)
+        except ValueError as e:
+            await self.emit_order_created_event(message_id, orders=None, errors={"main": str(e)})
+            return
+
+        if not ticker:
+            await self.emit_order_created_event(message_id, orders=None, errors={"main": "Ticker not found"})
+            return
+
+        try:
+            quantity, _ = BitmexManager.order_quantity(main_order, ticker, margin)
+        except Exception as e:
+            parsed_error = ExchangeAccount.parse_order_error_message(e)
+            await self.emit_order_created_event(message_id, orders=None, errors={"main": parsed_error})
+            return
+
+        if self._executions is None:
+            await self.emit_order_created_event(message_id, orders=None, errors={"main": "Account not connected"})
+            return
+
+        state = create_execution_state(message_id, main_order, spec, ticker, margin, quantity)
+        await self._executions.start(state)
+
+    async def _place_execution_slice(self, state: ExecutionState, quantity: int, cl_ord_id: str) -> dict:
+        return await BitmexManager.place_order(self._client, state.order, state.ticker, state.margin,
+                                               quantity=quantity, cl_ord_id=cl_ord_id)
+
+    async def _cancel_execution_slices(self, state: ExecutionState, cl_ord_ids: typing.List[str]):
+        await BitmexManager.cancel_orders(self._client, cl_ord_ids=cl_ord_ids)
+
+    async def _on_execution_progress(self, state: ExecutionState):
+        if state.acknowledged:
+            await self.emit_order_updated_event(aggregate_order(state))
+            return
+
+        state.acknowledged = True
+        if state.error:
+            parsed_error = ExchangeAccount.parse_order_error_message(state.error)
+            await self.emit_order_created_event(state.id, orders=None, errors={"main": parsed_error})
+        else:
+            await self.emit_order_created_event(state.id, orders={"main": aggregate_order(state)}, errors={})
+
+    async def _on_order_updated(self, order: dict):
+        if self._executions and len(self._executions):
+            await self._executions.on_order_update(order)
+
+    async def _arm_conditional_order(self, message_id: str, order_data: dict):
+        """
+        Holds a create order command until its triggers are crossed; it is answered once placed.
+        The command is only held in memory and is answered as canceled when the account disconnects
+        """
+        try:
+            conditional_order = create_conditional_order(message_id, order_data)
+        except (KeyError, ValueError) as e:
+            await self.emit_order_created_event(message_id, orders=None, errors={"main": str(e)})
+            return
+
+        self._triggers.add(conditional_order)
+
+    def _on_conditional_order_triggered(self, conditional_order: ConditionalOrder, triggered_at: float):
+        self._symbol_actors.tell(conditional_order.symbol, self._place_triggered_order,
+                                 conditional_order, triggered_at)
+
+    async def _place_triggered_order(self, conditional_order: ConditionalOrder, triggered_at: float):
+        # Trigger-to-submit latency is the rest_submit stage of the "conditional_order" lifecycle metrics
+        tracer.start(conditional_order.id, "conditional_order", stage=TRIGGERED, started=triggered_at)
+        await self._on_create_order(conditional_order.id, conditional_order.order_data)
+
+    async def _on_ticker_updated(self, account_id: str, tickers: typing.Dict[str, dict]):
+        if not account_id == self.account_id or not len(self._triggers):
+            return
+
+        for symbol, ticker in tickers.items():
+            self._triggers.on_ticker(symbol, ticker)
+
+    async def _on_update_order(self, message_id: str, update_order_data: dict):
+        tracer.mark(BUS_DISPATCHED)
+
+        account_id = update_order_data.get("accountId")
+        amendments: typing.List[dict] = update_order_data.get("orders", [])
+
+        if not amendments or not account_id == self.account_id:
+            return
+
+        error = None
+        amended_orders = None
+        try:
+            amended_orders = await BitmexManager.amend_orders(self._client, amendments)
+        except Exception as e:
+            error = ExchangeAccount.parse_order_error_message(e)
+
+        await self.emit_order_amended_event(message_id, orders=amended_orders, error=error)
+
     async def _on_cancel_order(self, message_id: str, cancel_order_data: dict):
+        tracer.mark(BUS_DISPATCHED)
+
         order_id = cancel_order_data["orderId"]
         account_id = cancel_order_data["accountId"]
 
         if not order_id or not account_id == self.account_id:
             return
 
+        state = await self._executions.cancel(order_id) if self._executions is not None else None
+        if state:
+            # A sliced order is reported with its execution id, it has no order on the exchange
+            await self._on_execution_progress(state)
+            await self.emit_order_canceled_event(message_id, order=aggregate_order(state))
+            return
+
         error = None
         canceled_order = None
         try:
@@ -210,16 +487,77 @@ class ExchangeAccount(
 
         await self.emit_order_canceled_event(message_id, order=canceled_order, error=error)
 
+    async def _on_cancel_orders(self, message_id: str, cancel_orders_data: dict):
+        tracer.mark(BUS_DISPATCHED)
+
+        if not cancel_orders_data.get("accountId") == self.account_id:
+            return
+
+        error = None
+        canceled_orders = None
+        cancel_all_after = None
+        try:
+            if cancel_orders_data.get("cancelAllAfter") is not None:
+                cancel_all_after = await BitmexManager.cancel_all_after(self._client,
+                                                                        cancel_orders_data["cancelAllAfter"])
+            elif cancel_orders_data.get("cancelAll"):
+                canceled_orders = await BitmexManager.cancel_all_orders(self._client, cancel_orders_data.get("symbol"))
+            elif cancel_orders_data.get("orderIds"):
+                order_ids = cancel_orders_data["orderIds"]
+                execution_ids = [order_id for order_id in order_ids if self._executions and order_id in self._executions]
+                canceled_orders = await self._cancel_executions(execution_ids)
+                exchange_order_ids = [order_id for order_id in order_ids if order_id not in execution_ids]
+                if exchange_order_ids:
+                    canceled_orders += await BitmexManager.cancel_orders(self._client, order_ids=exchange_order_ids)
+            elif cancel_orders_data.get("clOrderIdPrefix") or cancel_orders_data.get("clOrderId"):
+                prefix = cancel_orders_data.get("clOrderIdPrefix") or f"{cancel_orders_data.get('clOrderId')}_"
+                await self._cancel_local_orders(prefix)
+                canceled_orders = await BitmexManager.cancel_orders_by_cl_ord_id_prefix(self._client, prefix)
+            else:
+                error = "Missing clOrderId"
+        except Exception as e:
+            error = ExchangeAccount.parse_order_error_message(e)
+
+        await self.emit_orders_canceled_event(message_id, orders=canceled_orders, error=error,
+                                              cancel_all_after=cancel_all_after)
+
+    async def _cancel_executions(self, execution_ids: typing.List[str]) -> typing.List[dict]:
+        canceled: typing.List[dict] = []
+        if self._executions is None:
+            return canceled
+
+        for execution_id in execution_ids:
+            state = await self._executions.cancel(execution_id)
+            if state:
+                await self._on_execution_progress(state)
+                canceled.append(aggregate_order(state))
+        return canceled
+
+    async def _cancel_local_orders(self, client_order_id_prefix: str):
+        """
+        Cancels the conditional orders and the sliced executions whose slices the exchange cancel will not stop
+        """
+        for conditional_order in self._triggers.cancel_by_client_order_id_prefix(client_order_id_prefix):
+            await self.emit_order_created_event(conditional_order.id, orders=None,
+                                                errors={"main": "Conditional order canceled"})
+
+        if self._executions:
+            for state in self._executions.cancel_by_client_order_id_prefix(client_order_id_prefix):
+                await self._on_execution_progress(state)
+
     async def _on_close_position(self, message_id: str, data: typing.Dict):
+        tracer.mark(BUS_DISPATCHED)
+
         main_order_data = data.get("orders", {}).get("main")
         if not main_order_data:
             await self.emit_position_closed_event(message_id, None, error="Order data not found in message")
             return
 
         order: BitmexOrder = create_order(main_order_data)
-        ticker = await self._data_store.get_ticker(self.account_id, order.symbol)
+        context: TradingContext = await self._data_store.get_trading_context(self.account_id, order.symbol)
+        ticker = context.ticker
 
-        position: typing.Optional[BitmexPosition] = await self._data_store.get_position(self.account_id, order.symbol)
+        position: typing.Optional[BitmexPosition] = context.position
         if not position:
             await self.emit_position_closed_event(message_id, None, "Position not found")
             return
@@ -242,7 +580,8 @@ class ExchangeAccount(
             await self.emit_added_stop_to_position_event(message_id, None, "Symbol required")
             return
 
-        stored_data: typing.Optional[dict] = await self._data_store.get_ticker(self.account_id, raw_symbol)
+        context: TradingContext = await self._data_store.get_trading_context(self.account_id, raw_symbol)
+        stored_data: typing.Optional[dict] = context.ticker
         if not stored_data:
             await self.emit_added_stop_to_position_event(message_id, None, "Symbol not found")
             return
@@ -253,14 +592,15 @@ class ExchangeAccount(
             await self.emit_added_stop_to_position_event(message_id, None, "Stop price is required")
             return
 
-        position: typing.Optional[BitmexPosition] = await self._data_store.get_position(self.account_id, symbol.symbol)
+        position: typing.Optional[BitmexPosition] = context.position
         if not position:
             await self.emit_added_stop_to_position_event(message_id, None, "Position not found")
             return
 
         try:
             stop_order = await BitmexManager.add_stop_to_position(
-                self._client, symbol, position, stop_price, trigger_price_type)
+                self._client, symbol, position, stop_price, trigger_price_type,
+                position_stop_cl_ord_id(message_id, "stop"))
             await self.emit_added_stop_to_position_event(message_id, stop_order)
         except (BaseError, BadRequest) as e:
             error = e.args
@@ -282,21 +622,23 @@ class ExchangeAccount(
             await self.emit_added_stop_to_position_event(message_id, None, "Symbol required")
             return
 
-        stored_data: typing.Optional[dict] = await self._data_store.get_ticker(self.account_id, raw_symbol)
+        context: TradingContext = await self._data_store.get_trading_context(self.account_id, raw_symbol)
+        stored_data: typing.Optional[dict] = context.ticker
         if not stored_data:
             await self.emit_added_stop_to_position_event(message_id, None, "Symbol not found")
             return
 
         symbol: BitmexSymbol = create_symbol(stored_data)
 
-        position: typing.Optional[BitmexPosition] = await self._data_store.get_position(self.account_id, symbol.symbol)
+        position: typing.Optional[BitmexPosition] = context.position
         if not position:
             await self.emit_added_stop_to_position_event(message_id, None, "Position not found")
             return
 
         try:
             tsl_order = await BitmexManager.add_tsl_to_position(
-                self._client, symbol, position, tsl_percent, trigger_price_type)
+                self._client, symbol, position, tsl_percent, trigger_price_type,
+                position_stop_cl_ord_id(message_id, "tsl"))
             await self.emit_added_tsl_to_position_event(message_id, tsl_order)
         except (BaseError, BadRequest) as e:
             error = e.args
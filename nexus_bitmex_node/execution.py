@@ -0,0 +1,438 @@
+import asyncio
+import enum
+import logging
+import math
+import typing
+from datetime import datetime
+
+import watchtower
+from attr import dataclass
+
+from nexus_bitmex_node import settings
+from nexus_bitmex_node.instrument_specs import instrument_specs, Rounding
+from nexus_bitmex_node.metrics import metrics
+from nexus_bitmex_node.models.order import BitmexOrder
+from nexus_bitmex_node.models.symbol import create_symbol
+from nexus_bitmex_node.order_index import generate_child_cl_ord_id
+from nexus_bitmex_node.rate_limit import RateLimitScheduler
+
+logger = logging.getLogger(__name__)
+logger.addHandler(watchtower.CloudWatchLogHandler(log_group="nexus-bitmex-node", stream_name=settings.app_env))
+
+execution_slices = metrics.counter("execution_slices_total", "Child orders placed by the execution scheduler")
+execution_deferrals = metrics.counter("execution_deferrals_total", "Slices postponed for lack of rate limit budget")
+
+# Bitmex order statuses after which an order no longer changes
+TERMINAL_ORDER_STATUSES = ("Filled", "Canceled", "Rejected")
+
+
+class ExecutionType(enum.Enum):
+    TWAP = "TWAP"
+    ICEBERG = "ICEBERG"
+
+
+class ExecutionStatus(enum.Enum):
+    WORKING = "working"
+    DONE = "done"
+    CANCELED = "canceled"
+    FAILED = "failed"
+
+
+@dataclass(frozen=True)
+class ExecutionSpec:
+    type: ExecutionType
+    slices: int = 1
+    duration: float = 0.0
+    visible_qty: typing.Optional[float] = None
+
+
+def create_execution_spec(data: dict) -> ExecutionSpec:
+    """
+    :param data: `execution` of a main order:
+        {"type": "TWAP", "slices": ..., "duration": seconds} or {"type": "ICEBERG", "visibleQty": ...}
+    :raises ValueError: on an invalid execution
+    """
+    try:
+        execution_type = ExecutionType(str(data["type"]).upper())
+        if execution_type == ExecutionType.TWAP:
+            spec = ExecutionSpec(type=execution_type, slices=int(data["slices"]),
+                                 duration=float(data.get("duration", 0)))
+            valid = spec.slices >= 1 and spec.duration >= 0
+        else:
+            visible_qty = float(data["visibleQty"])
+            spec = ExecutionSpec(type=execution_type, visible_qty=visible_qty)
+            valid = visible_qty > 0
+    except (KeyError, TypeError, ValueError):
+        valid = False
+
+    if not valid:
+        raise ValueError(f"Invalid execution: {data}")
+    return spec
+
+
+@dataclass(slots=True)
+class ChildOrder:
+    quantity: int
+    filled: int = 0
+    avg_price: float = 0.0
+    status: str = "New"
+
+
+@dataclass(slots=True)
+class ExecutionState:
+    """
+    Progress of one parent order. Fills are aggregated from the child orders' updates
+    """
+    id: str
+    order: BitmexOrder
+    spec: ExecutionSpec
+    ticker: dict
+    margin: float
+    total_qty: int
+    slice_qty: int
+    interval: float
+    children: typing.Dict[str, ChildOrder]
+    placed_qty: int = 0
+    filled_qty: int = 0
+    notional: float = 0.0
+    status: ExecutionStatus = ExecutionStatus.WORKING
+    error: typing.Optional[Exception] = None
+    acknowledged: bool = False
+    active_child: typing.Optional[str] = None
+
+    @property
+    def avg_price(self) -> typing.Optional[float]:
+        return self.notional / self.filled_qty if self.filled_qty else None
+
+    @property
+    def order_status(self) -> str:
+        if self.total_qty and self.filled_qty >= self.total_qty:
+            return "Filled"
+        if self.status != ExecutionStatus.WORKING:
+            return "Canceled"
+        return "PartiallyFilled" if self.filled_qty else "New"
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "symbol": self.order.symbol,
+            "type": self.spec.type.value,
+            "status": self.status.value,
+            "totalQty": self.total_qty,
+            "placedQty": self.placed_qty,
+            "filledQty": self.filled_qty,
+            "slices": len(self.children),
+        }
+
+
+def create_execution_state(message_id: str, order: BitmexOrder, spec: ExecutionSpec, ticker: dict,
+                           margin: float, total_qty: int) -> ExecutionState:
+    """
+    :param total_qty: validated quantity of the parent order (a multiple of the lot size)
+    """
+    instrument = instrument_specs.get(create_symbol(ticker))
+
+    if spec.type == ExecutionType.TWAP:
+        slice_qty = instrument.round_quantity(total_qty / spec.slices, Rounding.CEILING)
+        interval = spec.duration / spec.slices
+    else:
+        slice_qty = instrument.round_quantity(spec.visible_qty or 0.0, Rounding.FLOOR)
+        interval = 0.0
+
+    return ExecutionState(
+        id=message_id,
+        order=order,
+        spec=spec,
+        ticker=ticker,
+        margin=margin,
+        total_qty=total_qty,
+        slice_qty=max(int(slice_qty), int(instrument.lot_size) or 1),
+        interval=interval,
+        children={},
+    )
+
+
+def aggregate_order(state: ExecutionState) -> dict:
+    """
+    The parent order in the shape of a ccxt order, so it is reported like any other order
+    """
+    remaining = max(0, state.total_qty - state.filled_qty)
+    return {
+        "id": state.id,
+        "clientOrderId": state.order.client_order_id,
+        "symbol": state.order.symbol,
+        "amount": state.total_qty,
+        "filled": state.filled_qty,
+        "remaining": remaining,
+        "average": state.avg_price,
+        "info": {
+            "orderID": state.id,
+            "clOrdID": state.order.client_order_id,
+            "clOrdLinkID": None,
+            "symbol": state.order.symbol,
+            "ordStatus": state.order_status,
+            "orderQty": state.total_qty,
+            "leavesQty": remaining,
+            "cumQty": state.filled_qty,
+            "price": state.order.price,
+            "avgPx": state.avg_price,
+            "stopPx": None,
+            "pegOffsetValue": None,
+            "timestamp": datetime.utcnow().isoformat(timespec="milliseconds") + "Z",
+        },
+    }
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel: scheduling is O(1) and a single task advances the wheel every `tick` seconds,
+    firing the callbacks of the current slot
+    """
+    def __init__(self, tick: float = 0.5, slots: int = 512):
+        self.tick = tick
+        self._slots: typing.List[typing.List[typing.List]] = [[] for _ in range(slots)]
+        self._cursor = 0
+        self._task: typing.Optional[asyncio.Future] = None
+
+    def __len__(self):
+        return sum(len(slot) for slot in self._slots)
+
+    def start(self):
+        if not self._task:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def schedule(self, delay: float, callback: typing.Callable[[], None]):
+        ticks = max(1, math.ceil(delay / self.tick))
+        slot = (self._cursor + ticks) % len(self._slots)
+        # [rounds left, callback]: the slot is visited every len(slots) ticks
+        self._slots[slot].append([(ticks - 1) // len(self._slots), callback])
+
+    async def _run(self):
+        loop = asyncio.get_event_loop()
+        next_tick = loop.time()
+        while True:
+            next_tick += self.tick
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+            self._advance()
+
+    def _advance(self):
+        self._cursor = (self._cursor + 1) % len(self._slots)
+        timers = self._slots[self._cursor]
+        due = [callback for rounds, callback in timers if rounds == 0]
+        self._slots[self._cursor] = [[rounds - 1, callback] for rounds, callback in timers if rounds > 0]
+
+        for callback in due:
+            try:
+                callback()
+            except Exception as e:
+                logger.error({"event": "TimerWheel.error", "error": str(e), "timestamp": datetime.now()})
+
+
+PlaceSlice = typing.Callable[[ExecutionState, int, str], typing.Awaitable[dict]]
+CancelSlices = typing.Callable[[ExecutionState, typing.List[str]], typing.Awaitable[None]]
+OnProgress = typing.Callable[[ExecutionState], typing.Awaitable[None]]
+
+
+class ExecutionScheduler:
+    """
+    Works parent orders as a series of child orders: TWAP places `slices` children evenly over `duration`,
+    ICEBERG shows `visibleQty` at a time and places the next child once the previous one filled.
+    Slices wait on the timer wheel while the account's rate limit has fewer than `min_tokens` left.
+    A parent order stops when one of its slices is canceled or rejected on the exchange, and its live
+    slices are canceled when it stops early
+    """
+    _states: typing.Dict[str, ExecutionState]
+    _parents: typing.Dict[str, str]
+
+    def __init__(self, wheel: TimerWheel, rate_limit: RateLimitScheduler, min_tokens: float,
+                 place_slice: PlaceSlice, on_progress: OnProgress,
+                 dispatch: typing.Optional[typing.Callable[..., None]] = None,
+                 cancel_slices: typing.Optional[CancelSlices] = None):
+        """
+        :param place_slice: places a child order of the given quantity and clOrdID
+        :param on_progress: called after every slice and fill of a parent order
+        :param cancel_slices: cancels the child orders with the given clOrdIDs on the exchange
+        :param dispatch: runs `handler(*args)` for a symbol (see `SymbolActorPool.tell`)
+        """
+        self._wheel = wheel
+        self._rate_limit = rate_limit
+        self._min_tokens = min_tokens
+        self._place_slice = place_slice
+        self._on_progress = on_progress
+        self._dispatch = dispatch or (lambda symbol, handler, *args: asyncio.ensure_future(handler(*args)))
+        self._cancel_slices = cancel_slices
+        self._states = {}
+        self._parents = {}
+
+    def __len__(self):
+        return len(self._states)
+
+    def __contains__(self, execution_id: str) -> bool:
+        return execution_id in self._states
+
+    def get(self, execution_id: str) -> typing.Optional[ExecutionState]:
+        return self._states.get(execution_id)
+
+    def state(self) -> typing.List[dict]:
+        return [state.to_dict() for state in self._states.values()]
+
+    async def start(self, state: ExecutionState):
+        self._states[state.id] = state
+        logger.info({
+            "event": "ExecutionScheduler.start",
+            "execution": state.to_dict(),
+            "slice_qty": state.slice_qty,
+            "interval": state.interval,
+            "timestamp": datetime.now(),
+        })
+        await self._run_slice(state)
+
+    async def cancel(self, execution_id: str) -> typing.Optional[ExecutionState]:
+        """
+        Stops a parent order and cancels its live slices on the exchange
+        """
+        state = self._states.get(execution_id)
+        if not state:
+            return None
+
+        state.status = ExecutionStatus.CANCELED
+        live_slices = self._live_slices(state)
+        self._remove(state)
+        await self._cancel_live_slices(state, live_slices)
+        return state
+
+    def cancel_by_client_order_id_prefix(self, prefix: str) -> typing.List[ExecutionState]:
+        """
+        Stops the parent orders of a clOrdID prefix. Their slices share the prefix, the caller cancels
+        them on the exchange with the same prefix
+        """
+        canceled = [
+            state for state in self._states.values()
+            if str(state.order.client_order_id).startswith(prefix)
+        ]
+        for state in canceled:
+            state.status = ExecutionStatus.CANCELED
+            self._remove(state)
+        return canceled
+
+    async def on_order_update(self, order: dict):
+        info = order.get("info") or {}
+        cl_ord_id = info.get("clOrdID")
+        execution_id = self._parents.get(cl_ord_id) if cl_ord_id else None
+        state = self._states.get(execution_id) if execution_id else None
+        if not cl_ord_id or not state or cl_ord_id not in state.children:
+            return
+        child = state.children[cl_ord_id]
+
+        filled = int(info.get("cumQty") or 0)
+        avg_price = float(info.get("avgPx") or 0)
+        state.filled_qty += filled - child.filled
+        state.notional += filled * avg_price - child.filled * child.avg_price
+        child.filled, child.avg_price = filled, avg_price
+        child.status = info.get("ordStatus") or child.status
+
+        live_slices: typing.List[str] = []
+        if child.status in TERMINAL_ORDER_STATUSES and child.status != "Filled":
+            # A slice canceled or rejected on the exchange stops the parent order and its other slices
+            state.active_child = None
+            state.status = ExecutionStatus.CANCELED
+            live_slices = self._live_slices(state)
+        elif child.status == "Filled" and state.active_child == cl_ord_id:
+            state.active_child = None
+            if state.placed_qty < state.total_qty:
+                self._schedule(state, 0)
+
+        self._complete_if_done(state)
+        await self._cancel_live_slices(state, live_slices)
+        await self._on_progress(state)
+
+    async def _run_slice(self, state: ExecutionState):
+        if state.status != ExecutionStatus.WORKING or state.placed_qty >= state.total_qty:
+            return
+
+        if self._rate_limit.tokens < self._min_tokens:
+            execution_deferrals.inc(symbol=state.order.symbol)
+            self._schedule(state, self._wheel.tick)
+            return
+
+        quantity = min(state.slice_qty, state.total_qty - state.placed_qty)
+        cl_ord_id = generate_child_cl_ord_id(state.order.client_order_id, len(state.children) + 1)
+        state.children[cl_ord_id] = ChildOrder(quantity=quantity)
+        self._parents[cl_ord_id] = state.id
+
+        try:
+            await self._place_slice(state, quantity, cl_ord_id)
+        except Exception as e:
+            state.children.pop(cl_ord_id, None)
+            self._parents.pop(cl_ord_id, None)
+            state.status = ExecutionStatus.FAILED
+            state.error = e
+            self._remove(state)
+            await self._on_progress(state)
+            return
+
+        execution_slices.inc(symbol=state.order.symbol, type=state.spec.type.value)
+        state.placed_qty += quantity
+
+        if state.spec.type == ExecutionType.ICEBERG:
+            if state.children[cl_ord_id].status not in TERMINAL_ORDER_STATUSES:
+                state.active_child = cl_ord_id
+            elif state.placed_qty < state.total_qty:
+                self._schedule(state, 0)
+        elif state.placed_qty < state.total_qty:
+            self._schedule(state, state.interval)
+
+        self._complete_if_done(state)
+        await self._on_progress(state)
+
+    @staticmethod
+    def _live_slices(state: ExecutionState) -> typing.List[str]:
+        return [cl_ord_id for cl_ord_id, child in state.children.items() if child.status not in TERMINAL_ORDER_STATUSES]
+
+    async def _cancel_live_slices(self, state: ExecutionState, cl_ord_ids: typing.List[str]):
+        if not cl_ord_ids or not self._cancel_slices:
+            return
+        try:
+            await self._cancel_slices(state, cl_ord_ids)
+        except Exception as e:
+            logger.error({
+                "event": "ExecutionScheduler.cancel_slices",
+                "execution": state.to_dict(),
+                "slices": cl_ord_ids,
+                "error": str(e),
+                "timestamp": datetime.now(),
+            })
+
+    def _schedule(self, state: ExecutionState, delay: float):
+        self._wheel.schedule(delay, lambda: self._dispatch(state.order.symbol, self._run_slice, state))
+
+    def _complete_if_done(self, state: ExecutionState):
+        if state.status == ExecutionStatus.WORKING:
+            if state.placed_qty < state.total_qty:
+                return
+            if any(child.status not in TERMINAL_ORDER_STATUSES for child in state.children.values()):
+                return
+            state.status = ExecutionStatus.DONE
+        self._remove(state)
+
+    def _remove(self, state: ExecutionState):
+        if self._states.pop(state.id, None) is None:
+            return
+        for cl_ord_id in state.children:
+            self._parents.pop(cl_ord_id, None)
+
+        logger.info({
+            "event": "ExecutionScheduler.end",
+            "execution": state.to_dict(),
+            "timestamp": datetime.now(),
+        })
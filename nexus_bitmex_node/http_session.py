@@ -0,0 +1,78 @@
+import asyncio
+import logging
+import ssl
+import typing
+
+import aiohttp
+import certifi
+import watchtower
+
+from nexus_bitmex_node import settings
+
+logger = logging.getLogger(__name__)
+logger.addHandler(watchtower.CloudWatchLogHandler(log_group="nexus-bitmex-node", stream_name=settings.app_env))
+
+
+class SharedHttpSession:
+    """
+    aiohttp session owned by the node and shared by every ccxt client, so that connections
+    (DNS, TCP and TLS setup) are reused across clients and kept alive between orders
+    """
+    _session: typing.Optional[aiohttp.ClientSession]
+
+    def __init__(self, limit: int, limit_per_host: int, keepalive_timeout: float, dns_cache_ttl: int):
+        self._limit = limit
+        self._limit_per_host = limit_per_host
+        self._keepalive_timeout = keepalive_timeout
+        self._dns_cache_ttl = dns_cache_ttl
+        self._session = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self._limit,
+                limit_per_host=self._limit_per_host,
+                keepalive_timeout=self._keepalive_timeout,
+                use_dns_cache=True,
+                ttl_dns_cache=self._dns_cache_ttl,
+                enable_cleanup_closed=True,
+                ssl=ssl.create_default_context(cafile=certifi.where()),
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def warm_up(self, url: str, connections: int = 1):
+        """
+        Opens `connections` keep-alive connections to `url` in parallel
+        """
+        await asyncio.gather(*[self.ping(url) for _ in range(connections)])
+
+    async def keep_warm(self, url: str, interval: float, connections: int = 1):
+        while True:
+            await asyncio.sleep(interval)
+            await self.warm_up(url, connections)
+
+    async def ping(self, url: str):
+        try:
+            async with self.session.head(url, allow_redirects=False) as response:
+                await response.release()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.info({
+                "event": "SharedHttpSession.ping",
+                "url": url,
+                "error": str(e),
+            })
+
+
+http_session = SharedHttpSession(
+    limit=settings.HTTP_POOL_SIZE,
+    limit_per_host=settings.HTTP_POOL_SIZE_PER_HOST,
+    keepalive_timeout=settings.HTTP_KEEPALIVE_TIMEOUT,
+    dns_cache_ttl=settings.HTTP_DNS_CACHE_TTL,
+)
@@ -0,0 +1,112 @@
+import enum
+import math
+import typing
+from decimal import Decimal
+
+from attr import dataclass
+
+from nexus_bitmex_node.models.symbol import BitmexSymbol, decimal_places
+
+
+class Rounding(enum.Enum):
+    FLOOR = "floor"
+    CEILING = "ceiling"
+    NEAREST = "nearest"
+
+
+def _round_units(units: float, step: int, rounding: Rounding) -> int:
+    # Rounded to 9 decimals first, so float artefacts (1.005 * 100 == 100.49999999999999) do not cross a step
+    steps = round(units / step, 9)
+    if rounding == Rounding.FLOOR:
+        return math.floor(steps)
+    if rounding == Rounding.CEILING:
+        return math.ceil(steps)
+    return math.floor(steps + 0.5)
+
+
+@dataclass(frozen=True)
+class InstrumentSpec:
+    """
+    Price and quantity grid of an instrument as integers: a tick is `tick_units` / `price_scale`
+    and a lot is `lot_units` / `quantity_scale`, so rounded values are whole numbers of ticks and lots
+    """
+    symbol: str
+    tick_size: Decimal
+    lot_size: Decimal
+    price_precision: int
+    price_scale: int
+    tick_units: int
+    quantity_scale: int
+    lot_units: int
+
+    def round_price(self, price: float, rounding: Rounding = Rounding.FLOOR) -> float:
+        ticks = _round_units(price * self.price_scale, self.tick_units, rounding)
+        return ticks * self.tick_units / self.price_scale
+
+    def round_quantity(self, quantity: float, rounding: Rounding = Rounding.FLOOR) -> float:
+        lots = _round_units(quantity * self.quantity_scale, self.lot_units, rounding)
+        return lots * self.lot_units / self.quantity_scale
+
+    def price_to_ticks(self, price: float) -> int:
+        return _round_units(price * self.price_scale, self.tick_units, Rounding.NEAREST)
+
+    def ticks_to_price(self, ticks: int) -> float:
+        return ticks * self.tick_units / self.price_scale
+
+
+def create_instrument_spec(symbol: str, tick_size: float, lot_size: float) -> InstrumentSpec:
+    tick = Decimal(repr(tick_size or 1))
+    lot = Decimal(repr(lot_size or 1))
+    price_precision = decimal_places(tick_size or 1)
+    quantity_precision = decimal_places(lot_size or 1)
+    price_scale = 10 ** price_precision
+    quantity_scale = 10 ** quantity_precision
+
+    return InstrumentSpec(
+        symbol=symbol,
+        tick_size=tick,
+        lot_size=lot,
+        price_precision=price_precision,
+        price_scale=price_scale,
+        tick_units=int(tick * price_scale),
+        quantity_scale=quantity_scale,
+        lot_units=int(lot * quantity_scale),
+    )
+
+
+class InstrumentSpecTable:
+    """
+    Per-symbol instrument specs, rebuilt only when an instrument's tick or lot size changes
+    """
+    _specs: typing.Dict[str, InstrumentSpec]
+
+    def __init__(self):
+        self._specs = {}
+        self._sources: typing.Dict[str, typing.Tuple[float, float]] = {}
+
+    def __len__(self):
+        return len(self._specs)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._specs
+
+    def update(self, symbol: str, tick_size: float, lot_size: float) -> InstrumentSpec:
+        source = (tick_size, lot_size)
+        if self._sources.get(symbol) != source:
+            self._specs[symbol] = create_instrument_spec(symbol, tick_size, lot_size)
+            self._sources[symbol] = source
+        return self._specs[symbol]
+
+    def update_instruments(self, instruments: typing.Iterable[dict]):
+        """
+        :param instruments: raw Bitmex instrument data (`tickSize`, `lotSize`)
+        """
+        for instrument in instruments:
+            if instrument.get("symbol") and instrument.get("tickSize"):
+                self.update(instrument["symbol"], instrument["tickSize"], instrument.get("lotSize"))
+
+    def get(self, symbol: BitmexSymbol) -> InstrumentSpec:
+        return self.update(symbol.symbol, symbol.tick_size, symbol.lot_size)
+
+
+instrument_specs = InstrumentSpecTable()
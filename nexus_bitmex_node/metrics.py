@@ -0,0 +1,88 @@
+import bisect
+import typing
+from collections import defaultdict
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelKey = typing.Tuple[typing.Tuple[str, str], ...]
+
+
+def _label_key(labels: typing.Dict[str, typing.Any]) -> LabelKey:
+    return tuple(sorted((key, str(val)) for key, val in labels.items()))
+
+
+class Counter:
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        self._values: typing.Dict[LabelKey, float] = defaultdict(float)
+
+    def inc(self, amount: float = 1, **labels):
+        self._values[_label_key(labels)] += amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0)
+
+    def snapshot(self) -> typing.List[dict]:
+        return [{"labels": dict(key), "value": val} for key, val in self._values.items()]
+
+
+class Histogram:
+    def __init__(self, name: str, description: str = "", buckets: typing.Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self._counts: typing.Dict[LabelKey, typing.List[int]] = {}
+        self._sums: typing.Dict[LabelKey, float] = defaultdict(float)
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sums[key] += value
+
+    def snapshot(self) -> typing.List[dict]:
+        entries = []
+        for key, counts in self._counts.items():
+            cumulative, buckets = 0, {}
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                buckets["+Inf" if bound == float("inf") else str(bound)] = cumulative
+            entries.append({
+                "labels": dict(key),
+                "count": cumulative,
+                "sum": self._sums[key],
+                "buckets": buckets,
+            })
+        return entries
+
+
+class MetricsRegistry:
+    """
+    Minimal in-process metrics registry, exposed as JSON on the `/metrics` route
+    """
+    def __init__(self):
+        self._metrics: typing.Dict[str, typing.Union[Counter, Histogram]] = {}
+
+    def counter(self, name: str, description: str = "") -> Counter:
+        metric = self._metrics.get(name) or self._metrics.setdefault(name, Counter(name, description))
+        assert isinstance(metric, Counter), f"{name} is not a counter"
+        return metric
+
+    def histogram(self, name: str, description: str = "", buckets: typing.Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = self._metrics.get(name) or self._metrics.setdefault(name, Histogram(name, description, buckets))
+        assert isinstance(metric, Histogram), f"{name} is not a histogram"
+        return metric
+
+    def snapshot(self) -> typing.Dict[str, dict]:
+        return {
+            name: {
+                "type": "counter" if isinstance(metric, Counter) else "histogram",
+                "description": metric.description,
+                "values": metric.snapshot(),
+            }
+            for name, metric in self._metrics.items()
+        }
+
+
+metrics = MetricsRegistry()
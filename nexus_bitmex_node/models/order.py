@@ -6,6 +6,7 @@ import glom
 from attr import dataclass
 from glom import Coalesce
 
+from nexus_bitmex_node.contract_values import contract_valuations
 from nexus_bitmex_node.models.base import BitmexBaseModel
 
 
@@ -41,26 +42,8 @@ ORDER_SPEC = {
     "trailing_stop_percent": "trailingStopPercent",
 }
 
-mXBT_TO_XBT_FACTOR = 1 / 1000
 XBt_TO_XBT_FACTOR = 1 / 100000000
 
-CONTRACT_VALUE_MULTIPLIERS = {
-    "ADAUSDTH21": 0.01,
-    "BCHUSD": 0.001 * mXBT_TO_XBT_FACTOR,
-    "BNBUSDTH21": 0.0001,
-    "DOGEUSDT": 0.001,
-    "DOTUSDTH21": 0.0001,
-    "EOSUSDTH21": 0.0001,
-    "ETHUSD": 0.001 * mXBT_TO_XBT_FACTOR,
-    "ETHUSDH21": 0.001 * mXBT_TO_XBT_FACTOR,
-    "LINKUSDT": 0.0001,
-    "LINKUSDTH21": 0.0001,
-    "LTCUSD": 0.002 * mXBT_TO_XBT_FACTOR,
-    "XRPUSD": 0.0002,
-    "XTZUSDTH21": 0.0001,
-    "YFIUSDTH21": 0.0001 * mXBT_TO_XBT_FACTOR,
-}
-
 
 @dataclass
 class BitmexOrder(BitmexBaseModel):
@@ -111,16 +94,20 @@ class BitmexOrder(BitmexBaseModel):
             return 0
 
         margin_to_spend = round(percent * margin, 8)
-        symbol_value = BitmexOrder.get_symbol_value_in_xbt(ticker, price)
-        return math.floor(margin_to_spend * leverage / symbol_value)
+        contract_value = BitmexOrder.get_contract_value(ticker, price)
+        return math.floor(margin_to_spend * leverage / contract_value)
 
     @staticmethod
-    def get_symbol_value_in_xbt(ticker, price: float) -> float:
-        if ticker.get("underlying") == "XBT":
+    def get_contract_value(ticker, price: float) -> float:
+        """
+        :return: value of one contract in the instrument's settlement currency (XBT, USDT, ...),
+        the currency of the margin it is bought with
+        """
+        if ticker.get("multiplier") is None and ticker.get("underlying") == "XBT":
+            # Instrument stored before contract fields were kept
             return 1 / price
 
-        multiplier = CONTRACT_VALUE_MULTIPLIERS.get(ticker["symbol"], 1)
-        return price * multiplier
+        return contract_valuations.value(ticker, price)
 
     def to_json(self):
         return json.dumps({
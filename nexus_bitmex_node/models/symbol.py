@@ -1,7 +1,10 @@
 import json
+import typing
+from decimal import Decimal
 
 import glom
 from attr import dataclass
+from glom import Coalesce
 
 from nexus_bitmex_node.models.base import BitmexBaseModel
 
@@ -16,10 +19,19 @@ SYMBOL_SPEC = {
     "max_price": "maxPrice",
     "max_order_qty": "maxOrderQty",
     "tick_size": "tickSize",
-    "last_price_protected": "lastPriceProtected"
+    "last_price_protected": "lastPriceProtected",
+    "multiplier": Coalesce("multiplier", default=None),
+    "is_quanto": Coalesce("isQuanto", default=None),
+    "is_inverse": Coalesce("isInverse", default=None),
+    "underlying_to_settle_multiplier": Coalesce("underlyingToSettleMultiplier", default=None),
 }
 
 
+def decimal_places(value: float) -> int:
+    exponent = Decimal(repr(value)).normalize().as_tuple().exponent
+    return max(0, -exponent)
+
+
 @dataclass
 class BitmexSymbol(BitmexBaseModel):
     symbol: str
@@ -33,6 +45,10 @@ class BitmexSymbol(BitmexBaseModel):
     max_order_qty: float
     tick_size: float
     last_price_protected: float
+    multiplier: typing.Optional[float] = None
+    is_quanto: typing.Optional[bool] = None
+    is_inverse: typing.Optional[bool] = None
+    underlying_to_settle_multiplier: typing.Optional[float] = None
 
     def to_json(self) -> str:
         return json.dumps({
@@ -47,6 +63,10 @@ class BitmexSymbol(BitmexBaseModel):
             "max_order_qty": self.max_order_qty,
             "tick_size": self.tick_size,
             "last_price_protected": self.last_price_protected,
+            "multiplier": self.multiplier,
+            "is_quanto": self.is_quanto,
+            "is_inverse": self.is_inverse,
+            "underlying_to_settle_multiplier": self.underlying_to_settle_multiplier,
         })
 
     @property
@@ -55,16 +75,7 @@ class BitmexSymbol(BitmexBaseModel):
 
     @property
     def fractional_digits(self) -> int:
-        exponential_form = "{:e}".format(self.tick_size)
-        split_character = '+' if '+' in exponential_form else '-'
-        base, exponent = exponential_form.replace('e', '').split(split_character)
-        base = base.rstrip('0')
-        exponent = int(exponent)
-        additional_digits = 0
-        if '.' in base:
-            additional_digits += len(base.split('.').pop())
-
-        return int(exponent) + additional_digits
+        return decimal_places(self.tick_size)
 
 
 def create_symbol(symbol_data: dict) -> BitmexSymbol:
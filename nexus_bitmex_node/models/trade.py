@@ -15,6 +15,10 @@ class TradeOrderStatus(enum.Enum):
     CANCELED = "Canceled"
 
 
+# Order statuses of a trade that can still change
+OPEN_TRADE_STATUSES = ("New", "PartiallyFilled", "PendingNew", "Untriggered")
+
+
 class TradeOrderType(enum.Enum):
     LIMIT = "Limit"
     MARKET = "Market"
@@ -98,6 +102,10 @@ class BitmexTrade(BitmexBaseModel):
 
 
 def create_trade(trade_data: dict) -> BitmexTrade:
+    if "order_id" in trade_data:
+        # Stored trade (see `to_json`)
+        return BitmexTrade(**glom.glom(trade_data, TRADE_JSON_SPEC))
+
     try:
         glommed = glom.glom(trade_data, TRADE_SPEC)
         return BitmexTrade(**glommed)
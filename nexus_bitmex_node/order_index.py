@@ -0,0 +1,90 @@
+import enum
+import hashlib
+import re
+import typing
+from collections import OrderedDict
+from uuid import uuid4
+
+
+class SubmissionState(enum.Enum):
+    PENDING = "pending"
+    ACKNOWLEDGED = "acknowledged"
+
+
+CHILD_CL_ORD_ID_PATTERN = re.compile(r"_s\d+-[0-9a-f]{4}$")
+
+
+def generate_cl_ord_id(client_order_id: str) -> str:
+    return f"{client_order_id}_{str(uuid4())[:4]}"
+
+
+def generate_child_cl_ord_id(client_order_id: str, slice_number: int) -> str:
+    """
+    clOrdID of one slice of a scheduled (TWAP/iceberg) order. It keeps the parent's prefix,
+    so cancelling by the parent's clOrderId also cancels its slices
+    """
+    return f"{client_order_id}_s{slice_number}-{str(uuid4())[:4]}"
+
+
+def position_stop_cl_ord_id(message_id: str, kind: str) -> str:
+    """
+    clOrdID of a stop or trailing stop added to a position. It is derived from the request's message id,
+    so retries and redeliveries of the same request submit the same clOrdID
+    """
+    return f"{kind}_{hashlib.sha1(message_id.encode('utf-8')).hexdigest()[:24]}"
+
+
+def is_child_cl_ord_id(cl_ord_id: typing.Optional[str]) -> bool:
+    return bool(cl_ord_id) and CHILD_CL_ORD_ID_PATTERN.search(cl_ord_id) is not None
+
+
+class SubmittedOrderIndex:
+    """
+    Bounded (LRU) index of the clOrdIDs submitted by this node. An id stays PENDING until the exchange
+    acknowledges it, either through the REST response or the orders stream, so an ambiguous failure
+    can be resolved before the order is sent again.
+    """
+    _entries: "OrderedDict[str, typing.Tuple[SubmissionState, typing.Optional[dict]]]"
+
+    def __init__(self, max_size: int = 5000):
+        self._max_size = max_size
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, cl_ord_id: str) -> bool:
+        return cl_ord_id in self._entries
+
+    def state(self, cl_ord_id: str) -> typing.Optional[SubmissionState]:
+        entry = self._entries.get(cl_ord_id)
+        return entry[0] if entry else None
+
+    def get(self, cl_ord_id: str) -> typing.Optional[dict]:
+        entry = self._entries.get(cl_ord_id)
+        return entry[1] if entry else None
+
+    def track(self, cl_ord_id: str):
+        if cl_ord_id not in self._entries:
+            self._put(cl_ord_id, SubmissionState.PENDING, None)
+
+    def acknowledge(self, cl_ord_id: str, order: dict):
+        self._put(cl_ord_id, SubmissionState.ACKNOWLEDGED, order)
+
+    def discard(self, cl_ord_id: str):
+        self._entries.pop(cl_ord_id, None)
+
+    def observe(self, orders: typing.Iterable[dict]):
+        """
+        Acknowledges tracked ids seen on the orders stream
+        """
+        for order in orders:
+            cl_ord_id = (order.get("info") or {}).get("clOrdID")
+            if cl_ord_id and cl_ord_id in self._entries:
+                self.acknowledge(cl_ord_id, order)
+
+    def _put(self, cl_ord_id: str, state: SubmissionState, order: typing.Optional[dict]):
+        self._entries[cl_ord_id] = (state, order)
+        self._entries.move_to_end(cl_ord_id)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
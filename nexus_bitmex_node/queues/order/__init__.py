@@ -21,14 +21,18 @@ from nexus_bitmex_node import settings
 from nexus_bitmex_node.event_bus import OrderEventEmitter, EventBus, OrderEventListener, AccountEventListener, \
     ExchangeEventListener
 from nexus_bitmex_node.exceptions import WrongOrderError
+from nexus_bitmex_node.order_index import is_child_cl_ord_id
 from nexus_bitmex_node.queues.order.helpers import (
     handle_create_order_message,
     handle_update_order_message,
     handle_cancel_order_message,
+    is_bulk_cancel_message,
+    create_order_response_data,
 )
 from nexus_bitmex_node.queues.queue_manager import QueueManager, QUEUE_EXPIRATION_TIME
 from nexus_bitmex_node.queues.utils import cleanup_queue, MESSAGE_EXPIRATION_SECONDS
 from nexus_bitmex_node.settings import BITMEX_EXCHANGE
+from nexus_bitmex_node.tracing import tracer
 
 from nexus_bitmex_node.queues.order.constants import (
     BITMEX_CREATE_ORDER_CMD_PREFIX,
@@ -92,7 +96,7 @@ class OrderQueueManager(
     async def create_channels(self):
         self._recv_order_channel = await self.create_channel(self.recv_connection)
         self._send_order_channel = await self.create_channel(self.send_connection)
-        await self._recv_order_channel.set_qos(prefetch_count=1)
+        await self._recv_order_channel.set_qos(prefetch_count=settings.AMQP_PREFETCH_COUNT)
 
     def register_listeners(self):
         loop = asyncio.get_event_loop()
@@ -100,7 +104,9 @@ class OrderQueueManager(
         self.register_account_deleted_listener(self.stop_listening_to_order_queues, loop)
         self.register_order_created_listener(self._on_order_created, loop)
         self.register_order_updated_listener(self._on_order_updated, loop)
+        self.register_order_amended_listener(self._on_order_amended, loop)
         self.register_order_canceled_listener(self._on_order_canceled, loop)
+        self.register_orders_canceled_listener(self._on_orders_canceled, loop)
         self.register_trades_updated_listener(self._on_trades_updated, loop)
 
     async def declare_exchanges(self):
@@ -114,43 +120,22 @@ class OrderQueueManager(
 
     async def _on_order_created(self, message_id: str, orders: typing.Dict,
                                 errors: typing.Dict[str, str] = None) -> None:
-        def create_order_data(order_data):
-            order = order_data["info"]
-            if not order["clOrdID"]:
-                return {}
-            order_qty = order["orderQty"]
-            leaves_qty = order["leavesQty"]
-            filled_qty = order_qty - leaves_qty if order_qty and leaves_qty else None
-            return {
-                "remoteOrderId": order["orderID"],
-                "status": order["ordStatus"],
-                "clOrderId": '_'.join(order["clOrdID"].split("_")[:2]),
-                "clOrderLinkId": order["clOrdLinkID"],
-                "orderQty": order_qty,
-                "filledQty": filled_qty,
-                "price": order["price"],
-                "avgPrice": order["avgPx"],
-                "stopPrice": order["stopPx"],
-                "pegOffsetValue": order["pegOffsetValue"],
-                "timestamp": order["timestamp"],
-            }
-
         logger.info({"event": "_on_order_created", "message_id": message_id, "errors": errors})
 
         orders_data = None
 
         if orders:
             orders_data = {
-                "main": create_order_data(orders["main"]),
+                "main": create_order_response_data(orders["main"]),
             }
 
             stop_order = orders.get("stop", {})
             tsl_order = orders.get("tsl", {})
 
             if stop_order:
-                orders_data["stop"] = create_order_data(stop_order)
+                orders_data["stop"] = create_order_response_data(stop_order)
             if tsl_order:
-                orders_data["tsl"] = create_order_data(tsl_order)
+                orders_data["tsl"] = create_order_response_data(tsl_order)
 
         response_payload: dict = {
             "orders": orders_data,
@@ -158,6 +143,8 @@ class OrderQueueManager(
             "errors": errors,
         }
 
+        tracer.attach(message_id, response_payload)
+
         response = Message(
             bytes(json.dumps(response_payload), "utf-8"),
             delivery_mode=DeliveryMode.PERSISTENT,
@@ -173,33 +160,40 @@ class OrderQueueManager(
         logger.info({"event": "_on_order_updated", "update": order_update})
 
         order = order_update["info"]
-        if not order["clOrdID"]:
+        # Slices of a scheduled order are reported through their parent's aggregate updates
+        if not order["clOrdID"] or is_child_cl_ord_id(order["clOrdID"]):
             return
 
-        order_qty = order.get("orderQty")
-        leaves_qty = order.get("leavesQty")
-        filled_qty = order_qty - leaves_qty if order_qty and leaves_qty else None
-
-        order_data = {
-            "remoteOrderId": order["orderID"],
-            "status": order["ordStatus"],
-            "clOrderId": '_'.join(order["clOrdID"].split("_")[:2]),
-            "orderQty": order_qty,
-            "filledQty": filled_qty,
-            "price": order.get("price"),
-            "avgPrice": order.get("avgPx"),
-            "stopPrice": order.get("stopPx"),
-            "pegOffsetValue": order.get("pegOffsetValue"),
-            "timestamp": order["timestamp"],
+        response_payload: dict = {
+            "order": create_order_response_data(order_update),
         }
 
+        response = Message(
+            bytes(json.dumps(response_payload), "utf-8"),
+            delivery_mode=DeliveryMode.PERSISTENT,
+            content_type="application/json",
+            expiration=MESSAGE_EXPIRATION_SECONDS,
+        )
+        await self._send_bitmex_exchange.publish(
+            response, routing_key=BITMEX_ORDER_UPDATED_EVENT_KEY
+        )
+
+    async def _on_order_amended(self, message_id: str, orders: typing.Optional[typing.List[dict]],
+                                error: str = None) -> None:
+        logger.info({"event": "_on_order_amended", "message_id": message_id, "errors": error})
+
         response_payload: dict = {
-            "order": order_data,
+            "orders": [create_order_response_data(order) for order in orders] if orders else None,
+            "success": not error,
+            "error": error,
         }
 
+        tracer.attach(message_id, response_payload)
+
         response = Message(
             bytes(json.dumps(response_payload), "utf-8"),
             delivery_mode=DeliveryMode.PERSISTENT,
+            correlation_id=message_id,
             content_type="application/json",
             expiration=MESSAGE_EXPIRATION_SECONDS,
         )
@@ -208,35 +202,46 @@ class OrderQueueManager(
         )
 
     async def _on_order_canceled(self, message_id: str, order: dict, error: str = None) -> None:
-        def create_order_data(order_data):
-            order_info = order_data["info"]
-            if not order_info["clOrdID"]:
-                return {}
-            order_qty = order_info["orderQty"]
-            leaves_qty = order_info["leavesQty"]
-            filled_qty = order_qty - leaves_qty if order_qty and leaves_qty else None
-            return {
-                "remoteOrderId": order_info["orderID"],
-                "status": order_info["ordStatus"],
-                "clOrderId": '_'.join(order_info["clOrdID"].split("_")[:2]),
-                "clOrderLinkId": order_info["clOrdLinkID"],
-                "orderQty": order_qty,
-                "filledQty": filled_qty,
-                "price": order_info["price"],
-                "avgPrice": order_info["avgPx"],
-                "stopPrice": order_info["stopPx"],
-                "pegOffsetValue": order_info["pegOffsetValue"],
-                "timestamp": order_info["timestamp"],
-            }
-
         logger.info({"event": "_on_order_canceled", "message_id": message_id, "errors": error})
 
         response_payload: dict = {
-            "order": create_order_data(order) if order else None,
+            "order": create_order_response_data(order) if order else None,
             "success": not error,
             "errors": error,
         }
 
+        tracer.attach(message_id, response_payload)
+
+        response = Message(
+            bytes(json.dumps(response_payload), "utf-8"),
+            delivery_mode=DeliveryMode.PERSISTENT,
+            correlation_id=message_id,
+            content_type="application/json",
+            expiration=MESSAGE_EXPIRATION_SECONDS,
+        )
+        await self._send_bitmex_exchange.publish(
+            response, routing_key=BITMEX_ORDER_CANCELED_EVENT_KEY
+        )
+
+    async def _on_orders_canceled(self, message_id: str, orders: typing.Optional[typing.List[dict]],
+                                  error: str = None, cancel_all_after: typing.Optional[dict] = None) -> None:
+        def create_result_data(order_data):
+            return dict(create_order_response_data(order_data),
+                        remoteOrderId=order_data["info"].get("orderID"),
+                        error=order_data["info"].get("error"))
+
+        logger.info({"event": "_on_orders_canceled", "message_id": message_id, "errors": error})
+
+        response_payload: dict = {
+            "orders": [create_result_data(order) for order in orders] if orders is not None else None,
+            "success": not error,
+            "error": error,
+        }
+        if cancel_all_after is not None:
+            response_payload["cancelAllAfter"] = cancel_all_after
+
+        tracer.attach(message_id, response_payload)
+
         response = Message(
             bytes(json.dumps(response_payload), "utf-8"),
             delivery_mode=DeliveryMode.PERSISTENT,
@@ -320,6 +325,7 @@ class OrderQueueManager(
 
     async def on_create_order_message(self, message: IncomingMessage):
         async with message.process(ignore_processed=True):
+            tracer.start(message.correlation_id, "create_order")
             order_id = None
             response_payload: dict = {}
 
@@ -356,7 +362,8 @@ class OrderQueueManager(
             message.ack()
 
     async def on_update_order_message(self, message: IncomingMessage):
-        async with message.process():
+        async with message.process(ignore_processed=True):
+            tracer.start(message.correlation_id, "update_order")
             order_id = None
 
             response_payload: dict = {}
@@ -398,6 +405,7 @@ class OrderQueueManager(
 
     async def on_cancel_order_message(self, message: IncomingMessage):
         async with message.process(ignore_processed=True):
+            tracer.start(message.correlation_id, "cancel_order")
             cl_order_id = None
 
             response_payload: dict = {}
@@ -406,7 +414,10 @@ class OrderQueueManager(
                 cancel_order_data = await handle_cancel_order_message(message)
                 if cancel_order_data:
                     message.ack()
-                    await self.emit_cancel_order_event(message.correlation_id, cancel_order_data)
+                    if is_bulk_cancel_message(cancel_order_data):
+                        await self.emit_cancel_orders_event(message.correlation_id, cancel_order_data)
+                    else:
+                        await self.emit_cancel_order_event(message.correlation_id, cancel_order_data)
                     return
             except JSONDecodeError:
                 response_payload.update({"success": False, "error": "Invalid Message"})
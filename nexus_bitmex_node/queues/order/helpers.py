@@ -25,28 +25,102 @@ async def handle_create_order_message(message: IncomingMessage) -> bool:
     return data
 
 
-async def handle_update_order_message(message: IncomingMessage) -> str:
+async def handle_update_order_message(message: IncomingMessage) -> dict:
     try:
         data = json.loads(message.body.decode("utf-8"))
     except JSONDecodeError as err:
         raise err
 
-    order_id = data.get("orderId")
+    account_id = data.get("accountId")
+    orders = data.get("orders") or [data]
+
+    if not account_id:
+        raise WrongOrderError(None)
 
+    amendments = []
+    for order in orders:
+        order_id = order.get("orderId")
+        if not order_id:
+            raise WrongOrderError(None)
+
+        amendment = {"orderId": order_id}
+        for key in ("price", "orderQty", "stopPrice", "pegOffsetValue"):
+            if order.get(key) is not None:
+                amendment[key] = int(order[key]) if key == "orderQty" else float(order[key])
+        if len(amendment) == 1:
+            raise WrongOrderError(order_id)
+        amendments.append(amendment)
+
+    data["orders"] = amendments
     return data
 
 
-async def handle_cancel_order_message(message: IncomingMessage) -> str:
+async def handle_cancel_order_message(message: IncomingMessage) -> dict:
     try:
         data = json.loads(message.body)
     except JSONDecodeError as err:
         raise err
 
-    order_id = data.get("orderId")
-    cl_order_id = data.get("clOrderId")
+    if not isinstance(data, dict):
+        raise WrongOrderError(None)
+
     account_id = data.get("accountId")
+    targets = ("orderId", "clOrderId", "orderIds", "clOrderIdPrefix", "cancelAll")
+
+    if not account_id:
+        raise WrongOrderError(None)
+
+    if data.get("cancelAllAfter") is not None:
+        try:
+            data["cancelAllAfter"] = int(data["cancelAllAfter"])
+        except (TypeError, ValueError):
+            raise WrongOrderError(None)
+    elif not any(data.get(key) for key in targets):
+        raise WrongOrderError(None)
 
-    if not account_id or not (order_id or cl_order_id):
+    for key in ("orderId", "clOrderId", "clOrderIdPrefix"):
+        if data.get(key) is not None and not isinstance(data[key], str):
+            raise WrongOrderError(None)
+
+    order_ids = data.get("orderIds")
+    if order_ids is not None and not (isinstance(order_ids, list) and all(isinstance(id_, str) for id_ in order_ids)):
         raise WrongOrderError(None)
 
     return data
+
+
+def is_bulk_cancel_message(data: dict) -> bool:
+    """
+    :return: whether `data` cancels several orders: by ids, by clOrderId prefix, all of them or after a
+    timeout. A clOrderId without an orderId cancels the order and its slices, which share its prefix
+    """
+    if data.get("cancelAllAfter") is not None or data.get("cancelAll"):
+        return True
+    if data.get("orderIds"):
+        return isinstance(data["orderIds"], list)
+    if data.get("clOrderIdPrefix"):
+        return isinstance(data["clOrderIdPrefix"], str)
+    return isinstance(data.get("clOrderId"), str) and bool(data["clOrderId"]) and not data.get("orderId")
+
+
+def create_order_response_data(order_data: dict) -> dict:
+    order = order_data["info"]
+    if not order.get("clOrdID"):
+        return {}
+
+    order_qty = order.get("orderQty")
+    leaves_qty = order.get("leavesQty")
+    filled_qty = order_qty - leaves_qty if order_qty and leaves_qty else None
+    return {
+        "remoteOrderId": order["orderID"],
+        "status": order.get("ordStatus"),
+        "clOrderId": '_'.join(order["clOrdID"].split("_")[:2]),
+        "clOrderLinkId": order.get("clOrdLinkID"),
+        "orderQty": order_qty,
+        "filledQty": filled_qty,
+        "price": order.get("price"),
+        "avgPrice": order.get("avgPx"),
+        "stopPrice": order.get("stopPx"),
+        "pegOffsetValue": order.get("pegOffsetValue"),
+        "timestamp": order.get("timestamp"),
+    }
@@ -30,6 +30,7 @@ from nexus_bitmex_node.queues.position.helpers import (
 from nexus_bitmex_node.queues.queue_manager import QueueManager, QUEUE_EXPIRATION_TIME
 from nexus_bitmex_node.queues.utils import cleanup_queue, MESSAGE_EXPIRATION_SECONDS
 from nexus_bitmex_node.settings import BITMEX_EXCHANGE
+from nexus_bitmex_node.tracing import tracer
 
 from nexus_bitmex_node.queues.position.constants import (
     BITMEX_POSITION_CLOSE_CMD_PREFIX,
@@ -102,7 +103,7 @@ class PositionQueueManager(
     async def create_channels(self):
         self._recv_position_channel = await self.create_channel(self.recv_connection)
         self._send_position_channel = await self.create_channel(self.send_connection)
-        await self._recv_position_channel.set_qos(prefetch_count=1)
+        await self._recv_position_channel.set_qos(prefetch_count=settings.AMQP_PREFETCH_COUNT)
 
     def register_listeners(self):
         loop = asyncio.get_event_loop()
@@ -182,6 +183,8 @@ class PositionQueueManager(
             "order": order_data
         })
 
+        tracer.attach(message_id, response_payload)
+
         response = Message(
             bytes(json.dumps(response_payload), "utf-8"),
             delivery_mode=DeliveryMode.PERSISTENT,
@@ -316,6 +319,7 @@ class PositionQueueManager(
 
     async def on_close_position_message(self, message: IncomingMessage):
         async with message.process(ignore_processed=True):
+            tracer.start(message.correlation_id, "close_position")
             position_id = None
             response_payload: dict = {}
 
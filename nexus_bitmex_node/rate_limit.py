@@ -0,0 +1,157 @@
+import asyncio
+import enum
+import heapq
+import itertools
+import time
+import typing
+
+
+class RequestPriority(enum.IntEnum):
+    ORDER = 0
+    ACCOUNT = 1
+    READ = 2
+
+
+def request_priority(path: str, method: str) -> RequestPriority:
+    if method == "GET":
+        return RequestPriority.READ
+    if path.startswith("order"):
+        return RequestPriority.ORDER
+    return RequestPriority.ACCOUNT
+
+
+class RateLimitScheduler:
+    """
+    Token bucket shared by every REST call of one account. The bucket is refilled locally at `limit / period`
+    and re-synced with the `x-ratelimit-*` headers of each response. Callers wait in priority order instead of
+    being rejected by the exchange, and lower priorities leave `reserve` tokens for order placement/cancellation.
+    """
+    _waiters: typing.List[typing.Tuple[int, int, asyncio.Future]]
+
+    def __init__(self, limit: int = 60, period: float = 60.0, reserve: int = 5):
+        self._limit = limit
+        self._period = period
+        self._reserve = reserve
+        self._tokens = float(limit)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._waiters = []
+        self._counter = itertools.count()
+        self._wakeup: typing.Optional[asyncio.TimerHandle] = None
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @property
+    def period(self) -> float:
+        return self._period
+
+    @property
+    def tokens(self) -> float:
+        self._refill()
+        return self._tokens
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, priority: RequestPriority = RequestPriority.READ):
+        if not self._waiters and self._try_take(priority):
+            return
+
+        waiter = asyncio.get_event_loop().create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._counter), waiter))
+        self._dispatch()
+
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The token was granted right before the cancellation, give it back
+                self._tokens += 1
+            self._waiters = [entry for entry in self._waiters if entry[2] is not waiter]
+            heapq.heapify(self._waiters)
+            self._dispatch()
+            raise
+
+    def update_from_headers(self, headers: typing.Optional[typing.Mapping]):
+        if not headers:
+            return
+
+        headers = {str(key).lower(): val for key, val in headers.items()}
+        now = time.monotonic()
+        self._refill()
+
+        limit = _to_int(headers.get("x-ratelimit-limit"))
+        if limit:
+            self._limit = limit
+
+        remaining = _to_int(headers.get("x-ratelimit-remaining"))
+        if remaining is not None:
+            # Requests still in flight are already subtracted locally but may not be counted by the exchange yet
+            self._tokens = min(self._tokens, float(remaining))
+
+            reset = _to_int(headers.get("x-ratelimit-reset"))
+            if remaining <= 0 and reset:
+                self._blocked_until = max(self._blocked_until, now + max(0.0, reset - time.time()))
+
+        retry_after = _to_int(headers.get("retry-after"))
+        if retry_after:
+            self._tokens = 0.0
+            self._blocked_until = max(self._blocked_until, now + retry_after)
+
+        self._dispatch()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        if elapsed > 0:
+            self._tokens = min(float(self._limit), self._tokens + elapsed * self._limit / self._period)
+
+    def _floor(self, priority: int) -> float:
+        return 0.0 if priority == RequestPriority.ORDER else float(self._reserve)
+
+    def _try_take(self, priority: int) -> bool:
+        if time.monotonic() < self._blocked_until:
+            return False
+
+        self._refill()
+        if self._tokens - 1 < self._floor(priority):
+            return False
+
+        self._tokens -= 1
+        return True
+
+    def _dispatch(self):
+        if self._wakeup:
+            self._wakeup.cancel()
+            self._wakeup = None
+
+        while self._waiters:
+            priority, _, waiter = self._waiters[0]
+            if waiter.done():
+                heapq.heappop(self._waiters)
+                continue
+
+            if not self._try_take(priority):
+                break
+
+            heapq.heappop(self._waiters)
+            waiter.set_result(None)
+
+        if not self._waiters:
+            return
+
+        priority = self._waiters[0][0]
+        missing = self._floor(priority) + 1 - self._tokens
+        delay = max(missing * self._period / self._limit, self._blocked_until - time.monotonic(), 0.001)
+        self._wakeup = asyncio.get_event_loop().call_later(delay, self._dispatch)
+
+
+def _to_int(value) -> typing.Optional[int]:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
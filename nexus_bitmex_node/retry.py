@@ -0,0 +1,146 @@
+import asyncio
+import enum
+import logging
+import random
+import typing
+
+import watchtower
+from attr import dataclass
+from ccxt import (
+    BaseError, NetworkError, DDoSProtection, ExchangeNotAvailable, InvalidNonce,
+)
+from tenacity import AsyncRetrying, RetryCallState
+
+from nexus_bitmex_node import settings
+from nexus_bitmex_node.exceptions import CircuitOpenError
+from nexus_bitmex_node.metrics import metrics
+
+logger = logging.getLogger(__name__)
+logger.addHandler(watchtower.CloudWatchLogHandler(log_group="nexus-bitmex-node", stream_name=settings.app_env))
+
+retry_attempts = metrics.counter("bitmex_retry_attempts_total", "Retried REST calls by operation and error class")
+retry_exhausted = metrics.counter("bitmex_retry_exhausted_total", "REST calls that failed after their retry budget")
+retry_wait_seconds = metrics.histogram("bitmex_retry_wait_seconds", "Backoff slept before a retry")
+
+
+class ErrorClass(enum.Enum):
+    NETWORK = "network"
+    OVERLOAD = "overload"
+    RATE_LIMIT = "rate_limit"
+    NONCE = "nonce"
+    FATAL = "fatal"
+
+
+def classify_error(error: BaseException) -> ErrorClass:
+    message = str(error).lower()
+
+    if isinstance(error, CircuitOpenError):
+        # Fails fast, retrying would only wait for the breaker to close
+        return ErrorClass.FATAL
+    if isinstance(error, DDoSProtection):
+        return ErrorClass.RATE_LIMIT
+    if isinstance(error, InvalidNonce) or "nonce" in message or "request has expired" in message:
+        return ErrorClass.NONCE
+    if isinstance(error, ExchangeNotAvailable) or "overloaded" in message:
+        return ErrorClass.OVERLOAD
+    if isinstance(error, (NetworkError, asyncio.TimeoutError, ConnectionError)):
+        return ErrorClass.NETWORK
+    if isinstance(error, (BaseError, ValueError, TypeError, KeyError)):
+        return ErrorClass.FATAL
+    # Anything else (e.g. an empty order result) is ambiguous and treated like a network failure
+    return ErrorClass.NETWORK
+
+
+@dataclass(frozen=True)
+class Backoff:
+    initial: float
+    multiplier: float = 2.0
+    maximum: float = 5.0
+    max_attempts: int = 3
+    jitter: float = 0.1
+
+    def base_delay(self, attempt_number: int) -> float:
+        return min(self.maximum, self.initial * self.multiplier ** max(0, attempt_number - 1))
+
+    def delay(self, attempt_number: int) -> float:
+        base = self.base_delay(attempt_number)
+        return base + random.uniform(0, base * self.jitter)
+
+
+NO_RETRY = Backoff(initial=0, max_attempts=1)
+
+DEFAULT_BACKOFFS: typing.Dict[ErrorClass, Backoff] = {
+    ErrorClass.NETWORK: Backoff(initial=0.1, multiplier=2, maximum=1.0, max_attempts=4),
+    ErrorClass.OVERLOAD: Backoff(initial=1.0, multiplier=2, maximum=8.0, max_attempts=3, jitter=0.5),
+    ErrorClass.RATE_LIMIT: Backoff(initial=1.0, multiplier=2, maximum=10.0, max_attempts=3, jitter=0.25),
+    ErrorClass.NONCE: Backoff(initial=0, max_attempts=2),
+    ErrorClass.FATAL: NO_RETRY,
+}
+
+
+class RetryPolicy:
+    """
+    Retry strategy for one type of REST operation. Errors are classified with `classify_error` and each
+    class gets its own backoff curve and attempt limit, bounded by a total latency budget (`deadline`, seconds)
+    """
+    def __init__(self, operation: str, deadline: float,
+                 backoffs: typing.Optional[typing.Dict[ErrorClass, Backoff]] = None):
+        self.operation = operation
+        self.deadline = deadline
+        self.backoffs = {**DEFAULT_BACKOFFS, **(backoffs or {})}
+
+    def retrying(self) -> AsyncRetrying:
+        return AsyncRetrying(
+            reraise=True,
+            retry=self._should_retry,
+            stop=self._should_stop,
+            wait=self._wait,
+            before_sleep=self._before_sleep,
+        )
+
+    def backoff_for(self, retry_state: RetryCallState) -> Backoff:
+        return self.backoffs[classify_error(retry_state.outcome.exception())]
+
+    def _should_retry(self, retry_state: RetryCallState) -> bool:
+        return retry_state.outcome.failed and self.backoff_for(retry_state) is not NO_RETRY
+
+    def _should_stop(self, retry_state: RetryCallState) -> bool:
+        backoff = self.backoff_for(retry_state)
+        attempt = retry_state.attempt_number
+        out_of_time = retry_state.seconds_since_start + backoff.base_delay(attempt) >= self.deadline
+        stop = attempt >= backoff.max_attempts or out_of_time
+
+        if stop:
+            retry_exhausted.inc(operation=self.operation, error_class=classify_error(retry_state.outcome.exception()).value)
+        return stop
+
+    def _wait(self, retry_state: RetryCallState) -> float:
+        remaining = self.deadline - retry_state.seconds_since_start
+        return max(0.0, min(self.backoff_for(retry_state).delay(retry_state.attempt_number), remaining))
+
+    def _before_sleep(self, retry_state: RetryCallState):
+        error = retry_state.outcome.exception()
+        error_class = classify_error(error).value
+        wait = retry_state.next_action.sleep if retry_state.next_action else 0
+
+        retry_attempts.inc(operation=self.operation, error_class=error_class)
+        retry_wait_seconds.observe(wait, operation=self.operation, error_class=error_class)
+
+        logger.info({
+            "event": "RetryPolicy.retry",
+            "operation": self.operation,
+            "error_class": error_class,
+            "error": str(error),
+            "attempt": retry_state.attempt_number,
+            "wait": wait,
+        })
+
+
+PLACE_ORDER_RETRY = RetryPolicy("place_order", deadline=8.0)
+CLOSE_POSITION_RETRY = RetryPolicy("close_position", deadline=8.0)
+PLACE_STOP_RETRY = RetryPolicy("place_stop_order", deadline=15.0)
+CANCEL_ORDER_RETRY = RetryPolicy("cancel_order", deadline=10.0, backoffs={
+    ErrorClass.NETWORK: Backoff(initial=0.1, multiplier=2, maximum=1.0, max_attempts=5),
+})
+SET_LEVERAGE_RETRY = RetryPolicy("set_leverage", deadline=5.0)
+AMEND_ORDER_RETRY = RetryPolicy("amend_order", deadline=8.0)
@@ -62,6 +62,92 @@ BITMEX_EXCHANGE = SETTINGS['rabbitmq']['BITMEX_EXCHANGE']
 print("BITMEX_EXCHANGE")
 time.sleep(0.5)
 
+# Unacknowledged order/position commands per consumer. Commands for one symbol still run in order
+AMQP_PREFETCH_COUNT = config("AMQP_PREFETCH_COUNT", cast=int, default=10)
+
+# Bitmex REST rate limit (requests per period, in seconds). Reserve is kept for order placement/cancellation
+BITMEX_RATE_LIMIT = config("BITMEX_RATE_LIMIT", cast=int, default=60)
+BITMEX_RATE_LIMIT_PERIOD = config("BITMEX_RATE_LIMIT_PERIOD", cast=float, default=60.0)
+BITMEX_RATE_LIMIT_RESERVE = config("BITMEX_RATE_LIMIT_RESERVE", cast=int, default=5)
+
+# Per-account REST circuit breaker. Opens when at least FAILURE_RATE of the requests in the last WINDOW seconds
+# (and MIN_REQUESTS of them) failed with overload/network errors, then lets HALF_OPEN_PROBES requests through
+# after OPEN_SECONDS
+CIRCUIT_BREAKER_FAILURE_RATE = config("CIRCUIT_BREAKER_FAILURE_RATE", cast=float, default=0.5)
+CIRCUIT_BREAKER_MIN_REQUESTS = config("CIRCUIT_BREAKER_MIN_REQUESTS", cast=int, default=6)
+CIRCUIT_BREAKER_WINDOW = config("CIRCUIT_BREAKER_WINDOW", cast=float, default=30.0)
+CIRCUIT_BREAKER_OPEN_SECONDS = config("CIRCUIT_BREAKER_OPEN_SECONDS", cast=float, default=15.0)
+CIRCUIT_BREAKER_HALF_OPEN_PROBES = config("CIRCUIT_BREAKER_HALF_OPEN_PROBES", cast=int, default=1)
+
+# REST polling of the private streams (orders, positions, balance) while their websocket subscription is lost, or
+# the connection they share delivered nothing (not even instrument updates) for STREAM_STALE_SECONDS. Polls use
+# at most STREAM_POLL_BUDGET_SHARE of the rate limit
+STREAM_STALE_SECONDS = config("STREAM_STALE_SECONDS", cast=float, default=30.0)
+STREAM_POLL_MIN_INTERVAL = config("STREAM_POLL_MIN_INTERVAL", cast=float, default=2.0)
+STREAM_POLL_MAX_INTERVAL = config("STREAM_POLL_MAX_INTERVAL", cast=float, default=60.0)
+STREAM_POLL_BUDGET_SHARE = config("STREAM_POLL_BUDGET_SHARE", cast=float, default=0.25)
+
+# Commands queued for a symbol when the account disconnects run for up to SYMBOL_ACTOR_DRAIN_TIMEOUT seconds, the
+# ones left are answered with an error
+SYMBOL_ACTOR_DRAIN_TIMEOUT = config("SYMBOL_ACTOR_DRAIN_TIMEOUT", cast=float, default=5.0)
+
+# Sliced (TWAP/iceberg) order execution. Slices wait while fewer than EXECUTION_MIN_RATE_TOKENS
+# requests are left in the rate limit
+EXECUTION_TIMER_TICK = config("EXECUTION_TIMER_TICK", cast=float, default=0.5)
+EXECUTION_MIN_RATE_TOKENS = config("EXECUTION_MIN_RATE_TOKENS", cast=float, default=10.0)
+
+# Shared HTTP connection pool used by the ccxt REST clients
+HTTP_POOL_SIZE = config("HTTP_POOL_SIZE", cast=int, default=20)
+HTTP_POOL_SIZE_PER_HOST = config("HTTP_POOL_SIZE_PER_HOST", cast=int, default=10)
+HTTP_KEEPALIVE_TIMEOUT = config("HTTP_KEEPALIVE_TIMEOUT", cast=float, default=60.0)
+HTTP_DNS_CACHE_TTL = config("HTTP_DNS_CACHE_TTL", cast=int, default=300)
+HTTP_KEEP_WARM_INTERVAL = config("HTTP_KEEP_WARM_INTERVAL", cast=float, default=20.0)
+HTTP_WARM_CONNECTIONS = config("HTTP_WARM_CONNECTIONS", cast=int, default=2)
+
+# Order lifecycle tracing. Stage timings are always recorded as metrics, this also adds them to the responses
+ORDER_TRACE_IN_RESPONSE = config("ORDER_TRACE_IN_RESPONSE", cast=bool, default=False)
+
+# Redis write-behind: writes are coalesced per hash field and flushed in one pipeline once quiet for
+# FLUSH_INTERVAL seconds, and no later than MAX_LAG seconds after the oldest pending write. A failed flush is
+# retried after a delay doubling from FLUSH_INTERVAL up to MAX_RETRY_DELAY seconds
+REDIS_WRITE_FLUSH_INTERVAL = config("REDIS_WRITE_FLUSH_INTERVAL", cast=float, default=0.05)
+REDIS_WRITE_MAX_LAG = config("REDIS_WRITE_MAX_LAG", cast=float, default=0.25)
+REDIS_WRITE_MAX_RETRY_DELAY = config("REDIS_WRITE_MAX_RETRY_DELAY", cast=float, default=10.0)
+
+# Trade history retention: the newest RETENTION_COUNT trades, updated in the last RETENTION_AGE seconds (0: no
+# limit, every trade is kept by default). Open orders are always kept. Older trades are removed every
+# COMPACTION_INTERVAL seconds
+TRADE_RETENTION_COUNT = config("TRADE_RETENTION_COUNT", cast=int, default=0)
+TRADE_RETENTION_AGE = config("TRADE_RETENTION_AGE", cast=float, default=0)
+TRADE_COMPACTION_INTERVAL = config("TRADE_COMPACTION_INTERVAL", cast=float, default=60.0)
+TRADE_COMPACTION_BATCH = config("TRADE_COMPACTION_BATCH", cast=int, default=500)
+
+# Change log of the saved orders, positions and trades: a Redis Stream per account (bitmex:{id}:changes) capped
+# near MAX_LEN records
+CHANGE_LOG_ENABLED = config("CHANGE_LOG_ENABLED", cast=bool, default=True)
+CHANGE_LOG_MAX_LEN = config("CHANGE_LOG_MAX_LEN", cast=int, default=10000)
+
+# "redis", or "tiered": reads from memory hydrated from Redis on start, writes replayed to Redis in the background
+DATA_STORE = config("DATA_STORE", default="redis")
+
+# Tiered store writes to Redis. A failed write is retried, after a delay doubling from RETRY_DELAY up to
+# MAX_RETRY_DELAY seconds. Past QUEUE_SIZE waiting writes new ticker, margin, position and trade writes are
+# dropped (the exchange sends them again), orders are always kept. The stop waits STOP_TIMEOUT seconds at most
+REPLICATION_QUEUE_SIZE = config("REPLICATION_QUEUE_SIZE", cast=int, default=10000)
+REPLICATION_RETRY_DELAY = config("REPLICATION_RETRY_DELAY", cast=float, default=0.1)
+REPLICATION_MAX_RETRY_DELAY = config("REPLICATION_MAX_RETRY_DELAY", cast=float, default=30.0)
+REPLICATION_STOP_TIMEOUT = config("REPLICATION_STOP_TIMEOUT", cast=float, default=10.0)
+
+# Process cache of the tickers, margins and positions read by the order commands. KEYSPACE_EVENTS also
+# invalidates it when other processes write (the Redis server needs notify-keyspace-events "Kh")
+DATA_CACHE_ENABLED = config("DATA_CACHE_ENABLED", cast=bool, default=True)
+DATA_CACHE_MAX_ENTRIES = config("DATA_CACHE_MAX_ENTRIES", cast=int, default=1024)
+DATA_CACHE_TTL = config("DATA_CACHE_TTL", cast=float, default=5.0)
+DATA_CACHE_KEYSPACE_EVENTS = config("DATA_CACHE_KEYSPACE_EVENTS", cast=bool, default=False)
+
+# Encoding of the stored tickers: "json" or "binary". Both are read, so it can change on a live store
+DATA_CODEC = config("DATA_CODEC", default="json")
+
 # Logging Configuration
 
 LOG_LEVEL_ENUM = config("LOG_LEVEL", cast=LogLevel, default=LogLevel.INFO)
@@ -1,14 +1,31 @@
+from nexus_bitmex_node import settings
 from nexus_bitmex_node.event_bus import (
     event_bus,
     EventBus,
 )
-from nexus_bitmex_node.storage.data_store import DataStore
+from nexus_bitmex_node.storage.cached import CachedDataStore
+from nexus_bitmex_node.storage.data_store import DataStore, TradingContext
 from nexus_bitmex_node.storage.local import LocalDataStore
 from nexus_bitmex_node.storage.redis import RedisDataStore
+from nexus_bitmex_node.storage.tiered import TieredDataStore
 
 
 def create_data_store(bus: EventBus) -> DataStore:
-    return RedisDataStore(bus)
+    if settings.DATA_STORE == "tiered":
+        # Reads are served from memory already, the cache would only add copies
+        return TieredDataStore(bus, LocalDataStore(EventBus()), RedisDataStore(EventBus()))
+
+    if not settings.DATA_CACHE_ENABLED:
+        return RedisDataStore(bus)
+
+    # The cache handles the store events and writes through, the wrapped store gets a bus of its own
+    return CachedDataStore(
+        bus,
+        RedisDataStore(EventBus()),
+        max_entries=settings.DATA_CACHE_MAX_ENTRIES,
+        ttl=settings.DATA_CACHE_TTL,
+        keyspace_events=settings.DATA_CACHE_KEYSPACE_EVENTS,
+    )
 
 
 data_store = create_data_store(event_bus)
@@ -0,0 +1,294 @@
+import asyncio
+import copy
+import logging
+import time
+import typing
+from collections import OrderedDict, defaultdict
+from datetime import datetime
+
+import aioredis
+import watchtower
+
+from nexus_bitmex_node import settings
+from nexus_bitmex_node.event_bus import EventBus
+from nexus_bitmex_node.metrics import metrics
+from nexus_bitmex_node.models.order import BitmexOrder
+from nexus_bitmex_node.models.position import BitmexPosition
+from nexus_bitmex_node.models.trade import BitmexTrade
+from nexus_bitmex_node.storage.data_store import DataStore, TradingContext
+
+logger = logging.getLogger(__name__)
+logger.addHandler(watchtower.CloudWatchLogHandler(log_group="nexus-bitmex-node", stream_name=settings.app_env))
+
+cache_hits = metrics.counter("data_cache_hits_total", "Data store reads served by the process cache")
+cache_misses = metrics.counter("data_cache_misses_total", "Data store reads that went to the store")
+
+# Redis keyspace notifications of the stored hashes (needs `notify-keyspace-events` with K and h)
+KEYSPACE_PATTERN = "__keyspace@*__:bitmex:*"
+# Reconnection delays (seconds) of the keyspace subscription, doubled after every failed attempt
+KEYSPACE_RECONNECT_DELAY = 0.5
+KEYSPACE_RECONNECT_MAX_DELAY = 30.0
+
+MISSING = object()
+
+CacheKey = typing.Tuple[str, str]
+
+
+class CacheEntry:
+    __slots__ = ("value", "version", "expires_at")
+
+    def __init__(self, value: typing.Any, version: typing.Tuple[int, int, int], expires_at: float):
+        self.value = value
+        self.version = version
+        self.expires_at = expires_at
+
+
+class VersionedCache:
+    """
+    LRU cache of hash fields (`group` is the hash key). Every field and every group has a version that
+    invalidation bumps: an entry is only valid for the versions it was read at, so a read that raced with
+    a write can't store the value it read before that write. `clear` bumps the version of every entry
+    """
+    _entries: typing.OrderedDict[CacheKey, CacheEntry]
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 5.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._versions: typing.Dict[CacheKey, int] = defaultdict(int)
+        self._group_versions: typing.Dict[str, int] = defaultdict(int)
+        self._generation = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def version(self, group: str, field: str) -> typing.Tuple[int, int, int]:
+        return self._versions[(group, field)], self._group_versions[group], self._generation
+
+    def get(self, group: str, field: str) -> typing.Any:
+        key = (group, field)
+        entry = self._entries.get(key)
+        if not entry:
+            return MISSING
+
+        if entry.version != self.version(group, field) or entry.expires_at < time.monotonic():
+            del self._entries[key]
+            return MISSING
+
+        self._entries.move_to_end(key)
+        return entry.value
+
+    def put(self, group: str, field: str, value: typing.Any, version: typing.Tuple[int, int, int]):
+        """
+        :param version: `version(group, field)` from before the value was read
+        """
+        if version != self.version(group, field):
+            return
+
+        key = (group, field)
+        self._entries[key] = CacheEntry(value, version, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, group: str, fields: typing.Iterable[str]):
+        for field in fields:
+            self._versions[(group, field)] += 1
+            self._entries.pop((group, field), None)
+
+    def invalidate_group(self, group: str):
+        self._group_versions[group] += 1
+
+    def clear(self):
+        self._generation += 1
+        self._entries.clear()
+
+
+class CachedDataStore(DataStore):
+    """
+    Read-through cache in front of another `DataStore` for the lookups made by every command (ticker, margin,
+    position). The cache handles the store events itself and writes through to `store`, invalidating the
+    written fields before and after the write. `store` must not listen to the event bus
+    """
+    def __init__(self, event_bus: EventBus, store: DataStore, max_entries: int = 1024, ttl: float = 5.0,
+                 keyspace_events: bool = False):
+        """
+        :param keyspace_events: also invalidate when other processes write, from Redis keyspace notifications
+        """
+        self._store = store
+        self._cache = VersionedCache(max_entries=max_entries, ttl=ttl)
+        self._keyspace_events = keyspace_events
+        self._keyspace_task: typing.Optional[asyncio.Future] = None
+        super().__init__(event_bus)
+
+    def register_listeners(self):
+        loop = asyncio.get_event_loop()
+        self.register_margins_updated_listener(self.save_margins, loop)
+        self.register_ticker_updated_listener(self.save_tickers, loop)
+        self.register_trades_updated_listener(self.save_trades, loop)
+        self.register_positions_updated_listener(self.save_positions, loop)
+        self.register_order_placed_listener(self.save_order, loop)
+
+    async def start(self, *args, **kwargs):
+        await self._store.start(*args, **kwargs)
+        if self._keyspace_events and args:
+            self._keyspace_task = asyncio.ensure_future(self._watch_keyspace(args[0]))
+
+    async def stop(self):
+        if self._keyspace_task:
+            self._keyspace_task.cancel()
+            self._keyspace_task = None
+        await self._store.stop()
+
+    """ Orders """
+    async def save_order(self, client_key: str, order: BitmexOrder):
+        await self._store.save_order(client_key, order)
+
+    async def get_orders(self, client_key: str) -> typing.Dict[str, BitmexOrder]:
+        return await self._store.get_orders(client_key)
+
+    async def get_order(self, client_key: str, order_id: str) -> typing.Optional[BitmexOrder]:
+        return await self._store.get_order(client_key, order_id)
+
+    """ Margins """
+    async def save_margins(self, client_key: str, data: typing.Dict):
+        currencies = [entry.get("currency") for entry in data.get("info", [])]
+        await self._write_through(f"bitmex:{client_key}:margins", currencies,
+                                  self._store.save_margins(client_key, data))
+
+    async def get_margins(self, client_key: str):
+        return await self._store.get_margins(client_key)
+
+    async def get_margin(self, client_key: str, symbol: str):
+        return await self._read_through(f"bitmex:{client_key}:margins", symbol,
+                                        self._store.get_margin, client_key, symbol)
+
+    """ Positions """
+    async def save_positions(self, client_key: str, data: typing.List):
+        symbols = [entry.get("symbol") for entry in data]
+        await self._write_through(f"bitmex:{client_key}:positions", symbols,
+                                  self._store.save_positions(client_key, data))
+
+    async def get_positions(self, client_key: str) -> typing.Dict[str, BitmexPosition]:
+        return await self._store.get_positions(client_key)
+
+    async def get_position(self, client_key: str, symbol: str) -> typing.Optional[BitmexPosition]:
+        return await self._read_through(f"bitmex:{client_key}:positions", symbol,
+                                        self._store.get_position, client_key, symbol)
+
+    """ Trades """
+    async def save_trades(self, client_key: str, data: typing.List[BitmexTrade]):
+        await self._store.save_trades(client_key, data)
+
+    async def get_trades(self, client_key: str):
+        return await self._store.get_trades(client_key)
+
+    async def get_trade(self, client_key: str, trade_id: str) -> typing.Optional[BitmexTrade]:
+        return await self._store.get_trade(client_key, trade_id)
+
+    async def get_trades_page(self, client_key: str, offset: int = 0, limit: int = 100) -> typing.List[BitmexTrade]:
+        return await self._store.get_trades_page(client_key, offset, limit)
+
+    """ Tickers """
+    async def save_tickers(self, client_key: str, data: typing.Dict):
+        await self._write_through(f"bitmex:{client_key}:tickers", list(data),
+                                  self._store.save_tickers(client_key, data))
+
+    async def get_tickers(self, client_key: str):
+        return await self._store.get_tickers(client_key)
+
+    async def get_ticker(self, client_key: str, symbol: str):
+        return await self._read_through(f"bitmex:{client_key}:tickers", symbol,
+                                        self._store.get_ticker, client_key, symbol)
+
+    """ Trading context """
+    async def get_trading_context(self, client_key: str, symbol: str,
+                                  currency: typing.Optional[str] = None) -> TradingContext:
+        tickers_key = f"bitmex:{client_key}:tickers"
+        if not currency:
+            # The margin is cached per currency, the settlement currency is only known from a cached ticker
+            cached_ticker = self._cache.get(tickers_key, symbol)
+            if cached_ticker is not MISSING and cached_ticker:
+                currency = cached_ticker.get("currency")
+
+        fields = [(tickers_key, symbol), (f"bitmex:{client_key}:positions", symbol)]
+        if currency:
+            fields.append((f"bitmex:{client_key}:margins", currency))
+
+        cached = [self._cache.get(group, field) for group, field in fields]
+        if currency and all(value is not MISSING for value in cached):
+            cache_hits.inc(kind="context")
+            ticker, position, margin = (copy.copy(value) for value in cached)
+            return TradingContext(ticker=ticker, margin=margin, position=position)
+
+        # One round trip for all three, even when some of them are cached
+        cache_misses.inc(kind="context")
+        versions = [self._cache.version(group, field) for group, field in fields]
+        context = await self._store.get_trading_context(client_key, symbol, currency)
+        for (group, field), version, value in zip(fields, versions, (context.ticker, context.position, context.margin)):
+            if self._cacheable(group, value):
+                self._cache.put(group, field, copy.copy(value), version)
+        return context
+
+    """ Utils """
+    async def _read_through(self, group: str, field: str, load: typing.Callable[..., typing.Awaitable], *args):
+        kind = group.rsplit(":", 1)[-1]
+        value = self._cache.get(group, field)
+        if value is not MISSING:
+            cache_hits.inc(kind=kind)
+            return copy.copy(value)
+
+        cache_misses.inc(kind=kind)
+        version = self._cache.version(group, field)
+        value = await load(*args)
+        if self._cacheable(group, value):
+            self._cache.put(group, field, copy.copy(value), version)
+        return value
+
+    @staticmethod
+    def _cacheable(group: str, value: typing.Any) -> bool:
+        # A missing ticker is usually one not received yet, it is read again instead of cached for the TTL
+        return value is not None or not group.endswith(":tickers")
+
+    async def _write_through(self, group: str, fields: typing.List[str], write: typing.Awaitable):
+        self._cache.invalidate(group, fields)
+        try:
+            await write
+        finally:
+            self._cache.invalidate(group, fields)
+
+    async def _watch_keyspace(self, url: str):
+        """
+        Invalidates the groups written by other processes. Notifications sent while the subscription is down
+        are lost, so the cache is cleared whenever it is (re)established
+        """
+        delay = KEYSPACE_RECONNECT_DELAY
+        while True:
+            connection = None
+            try:
+                connection = await aioredis.create_redis(url, encoding="utf-8")
+                channel, = await connection.psubscribe(KEYSPACE_PATTERN)
+                self._cache.clear()
+                delay = KEYSPACE_RECONNECT_DELAY
+
+                while await channel.wait_message():
+                    name, _ = await channel.get(encoding="utf-8")
+                    name = name.decode() if isinstance(name, bytes) else name
+                    self._cache.invalidate_group(name.split(":", 1)[1])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error({
+                    "event": "CachedDataStore.watch_keyspace",
+                    "error": str(e),
+                    "retry_in": delay,
+                    "timestamp": datetime.now(),
+                })
+            finally:
+                if connection:
+                    connection.close()
+
+            # Writes made by other processes are not seen until the subscription is back
+            self._cache.clear()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, KEYSPACE_RECONNECT_MAX_DELAY)
@@ -0,0 +1,97 @@
+import enum
+import json
+import logging
+import typing
+from datetime import datetime
+
+import attr
+import watchtower
+from aioredis import Redis
+
+from nexus_bitmex_node import settings
+from nexus_bitmex_node.metrics import metrics
+from nexus_bitmex_node.models.base import BitmexBaseModel
+
+logger = logging.getLogger(__name__)
+logger.addHandler(watchtower.CloudWatchLogHandler(log_group="nexus-bitmex-node", stream_name=settings.app_env))
+
+changes_appended = metrics.counter("change_log_records_total", "Change records appended to the account streams")
+change_log_errors = metrics.counter("change_log_errors_total", "Change records that could not be appended")
+
+
+class ChangeKind:
+    ORDER = "order"
+    POSITION = "position"
+    TRADE = "trade"
+
+
+def compact_json(model: BitmexBaseModel) -> str:
+    """
+    :return: the non-null fields of `model`, which are the fields a stored entry is updated with
+    """
+    changes = {field: value for field, value in attr.asdict(model, recurse=False).items() if value is not None}
+    return json.dumps(changes, separators=(",", ":"), default=lambda value: value.value
+                      if isinstance(value, enum.Enum) else str(value))
+
+
+def change_log_key(client_key: str) -> str:
+    return f"bitmex:{client_key}:changes"
+
+
+class ChangeLog:
+    """
+    Redis Stream per account (`bitmex:{id}:changes`) with a record of every saved order, position and
+    trade: its kind, its id and its changed fields as JSON. Streams are capped near `max_len` records
+    (MAXLEN ~). Consumers tail them with XREAD and resume after the last id they read.
+    Positions and trades are merged by Lua scripts, which append their records themselves (`script_args`)
+    """
+    def __init__(self, client: Redis, max_len: int = 10000):
+        self._client = client
+        self.max_len = max_len
+
+    def script_args(self, client_key: str, kind: str) -> typing.Tuple[typing.List[str], typing.List]:
+        """
+        :return: the stream key and the leading args of a merge script (see `scripts.MERGE_POSITIONS`)
+        """
+        return [change_log_key(client_key)], [kind, self.max_len]
+
+    def appended(self, kind: str, count: int):
+        """
+        Counts the records appended by a merge script
+        """
+        changes_appended.inc(count, kind=kind)
+
+    async def append(self, client_key: str, kind: str, changes: typing.Iterable[typing.Tuple[str, BitmexBaseModel]],
+                     writes: typing.Optional[typing.Dict[str, typing.Dict[str, str]]] = None) -> bool:
+        """
+        Appends the records in one pipeline. Without `writes` the stored state is already written, failures
+        are only logged. `writes` (key -> hash fields) are written with the records in one MULTI, so readers
+        of the stream always find the state it records
+        :return: whether the records (and `writes`) were written
+        """
+        key = change_log_key(client_key)
+        pipeline = self._client.multi_exec() if writes else self._client.pipeline()
+        for hash_key, fields in (writes or {}).items():
+            pipeline.hmset_dict(hash_key, fields)
+        appended = [
+            pipeline.xadd(key, {"kind": kind, "id": entry_id, "data": compact_json(model)}, max_len=self.max_len)
+            for entry_id, model in changes
+        ]
+        if not appended and not writes:
+            return True
+
+        try:
+            await pipeline.execute()
+        except Exception as e:
+            change_log_errors.inc(len(appended), kind=kind)
+            logger.error({
+                "event": "ChangeLog.append",
+                "account": client_key,
+                "kind": kind,
+                "error": str(e),
+                "timestamp": datetime.now(),
+            })
+            return False
+        else:
+            changes_appended.inc(len(appended), kind=kind)
+            return True
@@ -0,0 +1,172 @@
+import abc
+import json
+import struct
+import typing
+
+# Leading byte of every binary value. JSON values start with "{", so both formats can be read side by side
+BINARY_FORMAT_VERSION = 1
+
+Value = typing.Union[str, bytes]
+
+
+class FieldType:
+    STRING = "s"
+    NUMBER = "n"
+    BOOL = "b"
+
+
+Schema = typing.Tuple[typing.Tuple[str, str], ...]
+
+# Fixed field order of the stored models (see their `to_json`). A changed schema needs a new schema id.
+# Only tickers are stored with the binary codec: positions and trades are merged by Lua scripts that read JSON
+TICKER_SCHEMA: Schema = (
+    ("symbol", FieldType.STRING),
+    ("state", FieldType.STRING),
+    ("currency", FieldType.STRING),
+    ("underlying", FieldType.STRING),
+    ("quote_currency", FieldType.STRING),
+    ("mark_price", FieldType.NUMBER),
+    ("lot_size", FieldType.NUMBER),
+    ("max_price", FieldType.NUMBER),
+    ("max_order_qty", FieldType.NUMBER),
+    ("tick_size", FieldType.NUMBER),
+    ("last_price_protected", FieldType.NUMBER),
+    ("multiplier", FieldType.NUMBER),
+    ("is_quanto", FieldType.BOOL),
+    ("is_inverse", FieldType.BOOL),
+    ("underlying_to_settle_multiplier", FieldType.NUMBER),
+)
+
+# Number tags: integers keep their type through a round trip
+INT_TAG = 0
+FLOAT_TAG = 1
+
+_INT = struct.Struct("<Bq")
+_FLOAT = struct.Struct("<Bd")
+_LENGTH = struct.Struct("<H")
+INT64_MIN, INT64_MAX = -(1 << 63), (1 << 63) - 1
+
+
+class Codec(abc.ABC):
+    name: str
+
+    @abc.abstractmethod
+    def encode(self, data: dict) -> Value:
+        ...
+
+    def decode(self, value: Value) -> dict:
+        return decode_value(value)
+
+
+class JsonCodec(Codec):
+    name = "json"
+
+    def encode(self, data: dict) -> Value:
+        return json.dumps(data)
+
+
+class BinaryCodec(Codec):
+    """
+    Version byte, schema id byte, a bitmap of the null fields, then the schema's fields in order: strings as
+    a uint16 length and UTF-8 bytes, numbers as a tag byte and an int64 or float64, bools as one byte.
+    Data with fields outside the schema is stored as JSON
+    """
+    name = "binary"
+
+    def __init__(self, schema: Schema):
+        self.schema = schema
+        self._fields = frozenset(field for field, _ in schema)
+
+    def encode(self, data: dict) -> Value:
+        if not self._fields.issuperset(data):
+            return json.dumps(data)
+
+        nulls = 0
+        body = bytearray()
+        for index, (field, field_type) in enumerate(self.schema):
+            value = data.get(field)
+            if value is None:
+                nulls |= 1 << index
+            elif field_type == FieldType.STRING:
+                encoded = str(value).encode("utf-8")
+                body += _LENGTH.pack(len(encoded))
+                body += encoded
+            elif field_type == FieldType.BOOL:
+                body.append(1 if value else 0)
+            elif isinstance(value, int) and not isinstance(value, bool) and INT64_MIN <= value <= INT64_MAX:
+                body += _INT.pack(INT_TAG, value)
+            else:
+                body += _FLOAT.pack(FLOAT_TAG, float(value))
+
+        header = bytes((BINARY_FORMAT_VERSION, SCHEMA_IDS[self.schema]))
+        return header + nulls.to_bytes(_bitmap_size(self.schema), "little") + bytes(body)
+
+
+SCHEMAS: typing.Dict[int, Schema] = {}
+SCHEMA_IDS: typing.Dict[Schema, int] = {}
+
+
+def register_schema(schema_id: int, schema: Schema):
+    """
+    Ids are stored with the values: an id is never reused for another schema
+    """
+    if SCHEMAS.get(schema_id, schema) != schema:
+        raise ValueError(f"Schema id {schema_id} is already registered")
+    SCHEMAS[schema_id] = schema
+    SCHEMA_IDS[schema] = schema_id
+
+
+register_schema(1, TICKER_SCHEMA)
+
+
+def _bitmap_size(schema: Schema) -> int:
+    return (len(schema) + 7) // 8
+
+
+def _decode_binary(value: bytes) -> dict:
+    version, schema_id = value[0], value[1]
+    if version != BINARY_FORMAT_VERSION:
+        raise ValueError(f"Unknown stored format version {version}")
+
+    schema = SCHEMAS[schema_id]
+    offset = 2 + _bitmap_size(schema)
+    nulls = int.from_bytes(value[2:offset], "little")
+
+    data: typing.Dict[str, typing.Any] = {}
+    for index, (field, field_type) in enumerate(schema):
+        if nulls & (1 << index):
+            data[field] = None
+        elif field_type == FieldType.STRING:
+            length, = _LENGTH.unpack_from(value, offset)
+            offset += _LENGTH.size
+            data[field] = value[offset:offset + length].decode("utf-8")
+            offset += length
+        elif field_type == FieldType.BOOL:
+            data[field] = value[offset] == 1
+            offset += 1
+        elif value[offset] == INT_TAG:
+            data[field] = _INT.unpack_from(value, offset)[1]
+            offset += _INT.size
+        else:
+            data[field] = _FLOAT.unpack_from(value, offset)[1]
+            offset += _FLOAT.size
+    return data
+
+
+def decode_value(value: Value) -> dict:
+    """
+    Decodes a stored value of either format
+    """
+    if isinstance(value, str):
+        return json.loads(value)
+    if value[:1] == b"{":
+        return json.loads(value)
+    return _decode_binary(value)
+
+
+def create_codec(name: str, schema: Schema) -> Codec:
+    if name == BinaryCodec.name:
+        return BinaryCodec(schema)
+    if name == JsonCodec.name:
+        return JsonCodec()
+    raise ValueError(f"Unknown data codec {name}")
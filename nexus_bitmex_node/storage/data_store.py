@@ -1,12 +1,27 @@
 import abc
+import asyncio
 import typing
 
+from attr import dataclass
+
+from nexus_bitmex_node.contract_values import DEFAULT_SETTLEMENT_CURRENCY
 from nexus_bitmex_node.event_bus import ExchangeEventListener
 from nexus_bitmex_node.models.order import BitmexOrder
 from nexus_bitmex_node.models.position import BitmexPosition
 from nexus_bitmex_node.models.trade import BitmexTrade
 
 
+@dataclass(frozen=True)
+class TradingContext:
+    """
+    What an order command reads: the stored ticker of the symbol, the margin of its settlement
+    currency (in XBT, USDT, ... like the contract values) and the position of the symbol
+    """
+    ticker: typing.Optional[dict]
+    margin: dict
+    position: typing.Optional[BitmexPosition]
+
+
 class DataStore(abc.ABC, ExchangeEventListener):
     @abc.abstractmethod
     async def start(self, *args, **kwargs):
@@ -72,6 +87,10 @@ class DataStore(abc.ABC, ExchangeEventListener):
     async def get_trade(self, client_key: str, trade_id: str) -> typing.Optional[BitmexTrade]:
         ...
 
+    @abc.abstractmethod
+    async def get_trades_page(self, client_key: str, offset: int = 0, limit: int = 100) -> typing.List[BitmexTrade]:
+        ...
+
     @abc.abstractmethod
     async def get_tickers(self, client_key: str):
         ...
@@ -80,3 +99,16 @@ class DataStore(abc.ABC, ExchangeEventListener):
     async def get_ticker(self, client_key: str, symbol: str):
         ...
 
+    async def get_trading_context(self, client_key: str, symbol: str,
+                                  currency: typing.Optional[str] = None) -> TradingContext:
+        """
+        Reads the ticker, margin and position together. Stores override it to read them in one round trip
+        :param currency: margin currency, the settlement currency of the symbol by default
+        """
+        ticker, position = await asyncio.gather(
+            self.get_ticker(client_key, symbol),
+            self.get_position(client_key, symbol),
+        )
+        margin = await self.get_margin(client_key, currency or (ticker or {}).get("currency")
+                                       or DEFAULT_SETTLEMENT_CURRENCY)
+        return TradingContext(ticker=ticker, margin=margin or {}, position=position)
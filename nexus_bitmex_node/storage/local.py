@@ -1,39 +1,137 @@
 import asyncio
+import itertools
 import json
+import time
 import typing
 from typing import Dict, Any
 from collections import defaultdict
 
-from nexus_bitmex_node.models.order import XBt_TO_XBT_FACTOR, BitmexOrder, create_order
-from nexus_bitmex_node.models.trade import BitmexTrade, create_trade
-from nexus_bitmex_node.storage.data_store import DataStore
+import attr
+
+from nexus_bitmex_node import settings
+from nexus_bitmex_node.contract_values import DEFAULT_SETTLEMENT_CURRENCY, settlement_currency_factor
+from nexus_bitmex_node.models.base import BitmexBaseModel
+from nexus_bitmex_node.models.order import BitmexOrder, create_order
+from nexus_bitmex_node.models.position import BitmexPosition, create_position
+from nexus_bitmex_node.models.symbol import BitmexSymbol, create_symbol
+from nexus_bitmex_node.models.trade import OPEN_TRADE_STATUSES, BitmexTrade, create_trade
+from nexus_bitmex_node.storage.codecs import Value, decode_value
+from nexus_bitmex_node.storage.data_store import DataStore, TradingContext
+
+# Secondary indexes of the stored kinds (last part of the key)
+INDEXED_FIELDS: Dict[str, typing.Tuple[str, ...]] = {
+    "orders": ("client_order_id",),
+    "trades": ("client_order_id", "order_status", "symbol"),
+}
+
+# Stored entry of every kind from its stored dict. Tickers and margins are kept as dicts
+LOADERS: Dict[str, typing.Callable[[dict], Any]] = {
+    "orders": create_order,
+    "margins": lambda data: data,
+    "positions": lambda data: create_position(data, local=True),
+    "trades": create_trade,
+    "tickers": lambda data: data,
+}
+
+
+def merge(stored: typing.Optional[Any], update: Any) -> Any:
+    """
+    Merge of the Redis store scripts: every non-null field of the update wins. The stored entry is
+    not changed, readers holding it keep a consistent value
+    """
+    if stored is None:
+        return update
+
+    if isinstance(update, dict):
+        return {**stored, **{field: value for field, value in update.items() if value is not None}}
+
+    changes = {field: value for field, value in attr.asdict(update, recurse=False).items() if value is not None}
+    return attr.evolve(stored, **changes)
+
+
+def serialize(entry: Any) -> str:
+    return entry.to_json() if isinstance(entry, BitmexBaseModel) else json.dumps(entry)
+
+
+class IndexedTable:
+    """
+    Entries of one stored hash keyed by their primary key, with indexes of the primary keys by the
+    values of `indexed_fields`. Entries are replaced, never changed in place, so the indexes stay valid.
+    `entries` is ordered by the last update
+    """
+    def __init__(self, indexed_fields: typing.Tuple[str, ...] = ()):
+        self.entries: Dict[str, Any] = {}
+        self.updated_at: Dict[str, float] = {}
+        # Field -> value -> primary keys (dicts as insertion ordered sets)
+        self._indexes: Dict[str, Dict[Any, Dict[str, None]]] = {field: defaultdict(dict) for field in indexed_fields}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key: str) -> typing.Optional[Any]:
+        return self.entries.get(key)
+
+    def put(self, key: str, entry: Any, updated_at: typing.Optional[float] = None):
+        self.remove(key)
+        self.entries[key] = entry
+        self.updated_at[key] = time.time() if updated_at is None else updated_at
+        for field, index in self._indexes.items():
+            index[self._field(entry, field)][key] = None
+
+    def remove(self, key: str):
+        stored = self.entries.pop(key, None)
+        if stored is not None:
+            del self.updated_at[key]
+            self._unindex(key, stored)
+
+    def find(self, field: str, value: Any) -> typing.List[Any]:
+        return [self.entries[key] for key in self._indexes[field].get(value, ())]
+
+    def _unindex(self, key: str, entry: Any):
+        for field, index in self._indexes.items():
+            value = self._field(entry, field)
+            keys = index.get(value)
+            if keys is not None:
+                keys.pop(key, None)
+                if not keys:
+                    del index[value]
+
+    @staticmethod
+    def _field(entry: Any, field: str) -> Any:
+        return entry.get(field) if isinstance(entry, dict) else getattr(entry, field)
 
 
 class LocalDataStoreClient:
-    _cache: typing.Dict
+    _tables: typing.Dict[str, IndexedTable]
 
     def __init__(self):
-        self._cache = {}
+        self._tables = {}
 
     def close(self):
-        self._cache = {}
+        self._tables = {}
 
-    def put(self, key: str, data: Any):
-        self._cache[key] = data
+    def table(self, key: str) -> IndexedTable:
+        table = self._tables.get(key)
+        if table is None:
+            table = self._tables[key] = IndexedTable(INDEXED_FIELDS.get(key.rsplit(":", 1)[-1], ()))
+        return table
 
-    def put_dict(self, key: str, field: str, data: Any):
-        if key not in self._cache:
-            self._cache[key] = {}
-        self._cache[key][field] = data
-
-    def get(self, key: str) -> Dict[Any, Any]:
-        return self._cache.get(key, {})
-
-    def get_field(self, key: str, field: str) -> Any:
-        return self._cache.get(key, {}).get(field)
+    def export(self, prefix: str = "") -> Dict[str, Dict[str, str]]:
+        """
+        :return: the stored hashes whose key starts with `prefix`, with their entries as JSON, as in Redis
+        """
+        return {
+            key: {field: serialize(entry) for field, entry in table.entries.items()}
+            for key, table in self._tables.items() if key.startswith(prefix)
+        }
 
 
 class LocalDataStore(DataStore):
+    """
+    In-memory store of the native models, for tests and single node deployments. Lookups by key and
+    secondary index don't copy or parse: returned entries are shared and must not be changed.
+    Entries are only serialized when exported (`as_json`, `export`)
+    """
     _client: LocalDataStoreClient
 
     def register_listeners(self):
@@ -44,122 +142,187 @@ class LocalDataStore(DataStore):
         self.register_positions_updated_listener(self.save_positions, loop)
         self.register_order_placed_listener(self.save_order, loop)
 
-    async def start(self):
+    async def start(self, *args, **kwargs):
         self._client = LocalDataStoreClient()
 
     async def stop(self):
         self._client.close()
 
+    def export(self, client_key: str) -> Dict[str, Dict[str, str]]:
+        return self._client.export(f"bitmex:{client_key}:")
+
+    def load(self, key: str, stored: Dict[str, Value], scores: typing.Optional[Dict[str, float]] = None):
+        """
+        Adds the entries of a hash read from Redis (see `RedisDataStore.export`). Entries already in
+        the store are newer and kept. With `scores` (the update times in milliseconds of the trades
+        index) the entries are added in update order with their stored update time, entries missing
+        from the index are the oldest, as for `COMPACT_TRADES`
+        """
+        table = self._client.table(key)
+        load_entry = LOADERS[key.rsplit(":", 1)[-1]]
+        newer = list(table.entries)
+        fields = sorted(stored, key=lambda field: scores.get(field, 0)) if scores is not None else stored
+        for field in fields:
+            if table.get(field) is None:
+                updated_at = scores.get(field, 0) / 1000 if scores is not None else None
+                table.put(field, load_entry(decode_value(stored[field])), updated_at)
+
+        # Keeps `entries` ordered by the last update
+        for field in newer:
+            table.entries[field] = table.entries.pop(field)
+
     """ Orders """
     async def save_order(self, client_key: str, order: BitmexOrder):
-        self._client.put_dict(f"bitmex:{client_key}:orders", str(order.id), order.to_json())
+        orders = self._client.table(f"bitmex:{client_key}:orders")
+        orders.put(str(order.id), merge(orders.get(str(order.id)), order))
 
     async def get_orders(self, client_key: str) -> typing.Dict[str, BitmexOrder]:
-        stored: Dict = self._client.get(f"bitmex:{client_key}:orders")
-        orders: Dict[str, BitmexOrder] = {}
-        for order_id, data in stored.items():
-            orders[order_id] = create_order(json.loads(data))
-        return orders
+        return dict(self._client.table(f"bitmex:{client_key}:orders").entries)
 
     async def get_order(self, client_key: str, order_id: str) -> typing.Optional[BitmexOrder]:
-        element = await self._get_single_match_key_element("orders", client_key, order_id, "order_id")
-        return create_order(element) if element else None
+        return self._client.table(f"bitmex:{client_key}:orders").get(str(order_id))
+
+    async def get_order_by_client_order_id(self, client_key: str,
+                                           client_order_id: str) -> typing.Optional[BitmexOrder]:
+        orders = self._client.table(f"bitmex:{client_key}:orders").find("client_order_id", client_order_id)
+        return orders[-1] if orders else None
 
     """ Margins """
     async def save_margins(self, client_key: str, data: typing.Dict):
-        margins: typing.Dict = defaultdict(dict)
-        to_store = await self.get_margins(client_key)
+        margins = self._client.table(f"bitmex:{client_key}:margins")
         for entry in data.get("info", []):
-            currency = entry["currency"]
-            balance = entry["marginBalance"]
-            used = entry["maintMargin"]
-            available = balance - used
-
-            balance, used, available = (round(val * XBt_TO_XBT_FACTOR, 8) for val in (balance, used, available,))
+            balance = entry.get("availableMargin") or entry.get("marginBalance")
+            if balance is None:
+                continue
 
-            margin_data = {
+            currency = entry["currency"]
+            factor = settlement_currency_factor(currency)
+            stored = margins.get(currency)
+            if entry.get("maintMargin") is not None:
+                used = round(entry["maintMargin"] * factor, 10)
+            elif stored:
+                used = stored["used"]
+            else:
+                continue
+
+            balance = round(balance * factor, 10)
+            margins.put(currency, {
                 "balance": balance,
                 "used": used,
-                "available": available,
-            }
-            to_store.update({currency: margin_data})
+                "available": round(balance - used, 10),
+            })
 
-        self._client.put(f"bitmex:{client_key}:margins", to_store)
-
-    async def get_margins(self, client_key: str):
-        stored: Dict = self._client.get(f"bitmex:{client_key}:margins")
-        margins: typing.Dict = {}
-        for symbol, data in stored.items():
-            margins[symbol] = data
-        return margins
+    async def get_margins(self, client_key: str, as_json=False):
+        margins = self._client.table(f"bitmex:{client_key}:margins").entries
+        if as_json:
+            return {currency: serialize(margin) for currency, margin in margins.items()}
+        return dict(margins)
 
     async def get_margin(self, client_key: str, symbol: str):
-        return self._client.get_field(f"bitmex:{client_key}:margins", symbol)
+        return self._client.table(f"bitmex:{client_key}:margins").get(symbol) or {}
 
     """ Positions """
     async def save_positions(self, client_key: str, data: typing.List):
-        to_store = await self.get_positions(client_key)
+        positions = self._client.table(f"bitmex:{client_key}:positions")
         for entry in data:
-            symbol = entry["symbol"]
-            to_store.update({symbol: json.dumps(entry)})
-        self._client.put(f"bitmex:{client_key}:positions", to_store)
+            position: BitmexPosition = merge(positions.get(entry["symbol"]), create_position(entry))
+            positions.put(position.symbol, attr.evolve(position, is_open=position.current_quantity not in (0, None)))
 
-    async def get_positions(self, client_key: str):
-        stored: typing.Dict = self._client.get(f"bitmex:{client_key}:positions")
-        positions: typing.Dict = {}
-        for symbol, data in stored.items():
-            positions[symbol] = json.loads(data)
-        return positions
+    async def get_positions(self, client_key: str, as_json=False) -> typing.Dict[str, BitmexPosition]:
+        positions = self._client.table(f"bitmex:{client_key}:positions").entries
+        if as_json:
+            return {symbol: serialize(position) for symbol, position in positions.items()}
+        return dict(positions)
 
-    async def get_position(self, client_key: str, symbol: str):
-        element = await self._get_single_match_key_element("positions", client_key, symbol, "symbol")
-        return create_trade(element) if element else None
+    async def get_position(self, client_key: str, symbol: str) -> typing.Optional[BitmexPosition]:
+        return self._client.table(f"bitmex:{client_key}:positions").get(symbol)
 
     """ Trades """
     async def save_trades(self, client_key: str, data: typing.List):
-        new_trades: typing.List[BitmexTrade] = [create_trade(entry.get("info")) for entry in data]
-        to_store = await self.get_trades(client_key, as_json=True)
-        for trade in new_trades:
-            trade_id = trade.order_id
-            to_store.update({trade_id: trade.to_json()})
-        self._client.put(f"bitmex:{client_key}:trades", to_store)
+        trades = self._client.table(f"bitmex:{client_key}:trades")
+        for entry in data:
+            trade: BitmexTrade = create_trade(entry.get("info", entry))
+            trades.put(trade.order_id, merge(trades.get(trade.order_id), trade))
+        self._compact_trades(trades)
 
     async def get_trades(self, client_key: str, as_json=False):
-        stored: typing.Dict = self._client.get(f"bitmex:{client_key}:trades")
+        trades = self._client.table(f"bitmex:{client_key}:trades").entries
         if as_json:
-            return stored
-
-        trades: typing.Dict[str, BitmexTrade] = {}
-        for trade_id, data in stored.items():
-            trades[trade_id] = create_trade(json.loads(data))
-        return trades
+            return {trade_id: serialize(trade) for trade_id, trade in trades.items()}
+        return dict(trades)
 
     async def get_trade(self, client_key: str, order_id: str) -> typing.Optional[BitmexTrade]:
-        element = await self._get_single_match_key_element("trades", client_key, order_id, "order_id")
-        return create_trade(element) if element else None
+        return self._client.table(f"bitmex:{client_key}:trades").get(order_id)
+
+    async def get_trades_page(self, client_key: str, offset: int = 0, limit: int = 100) -> typing.List[BitmexTrade]:
+        """
+        :return: trades by their last update, newest first
+        """
+        trades = self._client.table(f"bitmex:{client_key}:trades").entries
+        return list(itertools.islice(reversed(trades.values()), offset, offset + limit))
+
+    async def get_trade_by_client_order_id(self, client_key: str,
+                                           client_order_id: str) -> typing.Optional[BitmexTrade]:
+        trades = self._client.table(f"bitmex:{client_key}:trades").find("client_order_id", client_order_id)
+        return trades[-1] if trades else None
+
+    async def get_trades_by_status(self, client_key: str, status: str) -> typing.List[BitmexTrade]:
+        return self._client.table(f"bitmex:{client_key}:trades").find("order_status", status)
+
+    async def get_trades_by_symbol(self, client_key: str, symbol: str) -> typing.List[BitmexTrade]:
+        return self._client.table(f"bitmex:{client_key}:trades").find("symbol", symbol)
+
+    @staticmethod
+    def _compact_trades(trades: IndexedTable):
+        """
+        Removes the oldest trades over the retention limits, up to `TRADE_COMPACTION_BATCH` at a time (see
+        `COMPACT_TRADES`). Open orders are kept and skipped. Only the oldest trade is looked at while the
+        trades are within the limits
+        """
+        if not trades.entries:
+            return
+
+        excess = len(trades) - settings.TRADE_RETENTION_COUNT if settings.TRADE_RETENTION_COUNT else 0
+        oldest = time.time() - settings.TRADE_RETENTION_AGE if settings.TRADE_RETENTION_AGE else 0
+        if excess <= 0 and trades.updated_at[next(iter(trades.entries))] >= oldest:
+            return
+
+        removed: typing.List[str] = []
+        for order_id, trade in trades.entries.items():
+            if len(removed) >= settings.TRADE_COMPACTION_BATCH:
+                break
+            if len(removed) >= excess and trades.updated_at[order_id] >= oldest:
+                break
+            if trade.order_status not in OPEN_TRADE_STATUSES:
+                removed.append(order_id)
+
+        for order_id in removed:
+            trades.remove(order_id)
 
     """ Tickers """
     async def save_tickers(self, client_key: str, data: typing.Dict):
-        to_store = await self.get_tickers(client_key)
-        for symbol, val in data.items():
-            to_store.update({symbol: json.dumps(val)})
-        self._client.put(f"bitmex:{client_key}:tickers", to_store)
-
-    async def get_tickers(self, client_key: str):
-        stored: typing.Dict = self._client.get(f"bitmex:{client_key}:tickers")
-        tickers: typing.Dict = {}
-        for symbol, data in stored.items():
-            tickers[symbol] = json.loads(data)
-        return tickers
+        # Tickers are kept as the dicts `get_ticker` returns
+        tickers = self._client.table(f"bitmex:{client_key}:tickers")
+        for entry in data.values():
+            ticker = attr.asdict(create_symbol(entry), recurse=False)
+            tickers.put(ticker["symbol"], merge(tickers.get(ticker["symbol"]), ticker))
+
+    async def get_tickers(self, client_key: str, as_json=False):
+        tickers = self._client.table(f"bitmex:{client_key}:tickers").entries
+        if as_json:
+            return {symbol: serialize(ticker) for symbol, ticker in tickers.items()}
+        return {symbol: BitmexSymbol(**ticker) for symbol, ticker in tickers.items()}
 
     async def get_ticker(self, client_key: str, symbol: str):
-        return await self._get_single_match_key_element("tickers", client_key, symbol, "symbol") or None
-
-    async def _get_single_match_key_element(self, type_key: str, client_key: str, entry_key: str, match_key: str):
-        stored = self._client.get(f"bitmex:{client_key}:{type_key}")
-        for entry in stored.values():
-            data = json.loads(entry)
-            if data[match_key] == entry_key:
-                return data
-        else:
-            return None
+        return self._client.table(f"bitmex:{client_key}:tickers").get(symbol)
+
+    """ Trading context """
+    async def get_trading_context(self, client_key: str, symbol: str,
+                                  currency: typing.Optional[str] = None) -> TradingContext:
+        ticker = self._client.table(f"bitmex:{client_key}:tickers").get(symbol)
+        currency = currency or (ticker or {}).get("currency") or DEFAULT_SETTLEMENT_CURRENCY
+        return TradingContext(
+            ticker=ticker,
+            margin=self._client.table(f"bitmex:{client_key}:margins").get(currency) or {},
+            position=self._client.table(f"bitmex:{client_key}:positions").get(symbol),
+        )
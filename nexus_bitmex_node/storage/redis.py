@@ -1,20 +1,65 @@
-import json
 import typing
 import asyncio
+import logging
+import time
 from collections import defaultdict
+from datetime import datetime
 
 import aioredis
+import attr
+import watchtower
 from aioredis import Redis
 
-from nexus_bitmex_node.models.order import XBt_TO_XBT_FACTOR, BitmexOrder, create_order
+from nexus_bitmex_node import settings
+from nexus_bitmex_node.contract_values import DEFAULT_SETTLEMENT_CURRENCY, settlement_currency_factor
+from nexus_bitmex_node.event_bus import EventBus
+from nexus_bitmex_node.metrics import metrics
+from nexus_bitmex_node.models.base import BitmexBaseModel
+from nexus_bitmex_node.models.order import BitmexOrder, create_order
 from nexus_bitmex_node.models.position import BitmexPosition, create_position
 from nexus_bitmex_node.models.symbol import BitmexSymbol, create_symbol
 from nexus_bitmex_node.models.trade import BitmexTrade, create_trade
-from nexus_bitmex_node.storage.data_store import DataStore
+from nexus_bitmex_node.storage.change_log import ChangeKind, ChangeLog, compact_json
+from nexus_bitmex_node.storage.codecs import TICKER_SCHEMA, Value, create_codec, decode_value
+from nexus_bitmex_node.storage.data_store import DataStore, TradingContext
+from nexus_bitmex_node.storage.scripts import (
+    RedisScript, COMPACT_TRADES, MERGE_MARGINS, MERGE_POSITIONS, MERGE_TRADES,
+)
+from nexus_bitmex_node.storage.write_behind import WriteBehindBuffer
+
+logger = logging.getLogger(__name__)
+logger.addHandler(watchtower.CloudWatchLogHandler(log_group="nexus-bitmex-node", stream_name=settings.app_env))
+
+trades_compacted = metrics.counter("trades_compacted_total", "Stored trades removed by the retention limits")
+
+# Instrument fields that make up a stored ticker (see `SYMBOL_SPEC`)
+TICKER_SOURCE_FIELDS = (
+    "symbol", "state", "settlCurrency", "underlying", "quoteCurrency", "markPrice", "lotSize", "maxPrice",
+    "maxOrderQty", "tickSize", "lastPriceProtected", "multiplier", "isQuanto", "isInverse",
+    "underlyingToSettleMultiplier",
+)
 
 
 class RedisDataStore(DataStore):
     _client: Redis
+    _writes: WriteBehindBuffer
+    _stored_tickers: typing.Dict[str, typing.Dict[str, typing.Tuple[tuple, BitmexSymbol]]]
+    _compaction_task: typing.Optional[asyncio.Future] = None
+    _changes: typing.Optional[ChangeLog] = None
+
+    def __init__(self, event_bus: EventBus):
+        super().__init__(event_bus)
+        # Last written ticker of every symbol, with the instrument fields it was built from
+        self._stored_tickers = defaultdict(dict)
+        # Positions, margins and trades stay JSON: they are merged by Lua scripts with cjson
+        self._ticker_codec = create_codec(settings.DATA_CODEC, TICKER_SCHEMA)
+        # Read-merge-write of stored entities in one atomic round trip
+        self._merge_margins = RedisScript(MERGE_MARGINS)
+        self._merge_positions = RedisScript(MERGE_POSITIONS)
+        self._merge_trades = RedisScript(MERGE_TRADES)
+        self._compact_trades = RedisScript(COMPACT_TRADES)
+        # Accounts whose trades this process wrote, compacted in the background
+        self._trade_accounts: typing.Set[str] = set()
 
     def register_listeners(self):
         loop = asyncio.get_event_loop()
@@ -26,26 +71,57 @@ class RedisDataStore(DataStore):
 
     async def start(self, url: str):
         self._client = await aioredis.create_redis_pool(url, encoding="utf-8")
+        self._writes = WriteBehindBuffer(
+            self._client,
+            flush_interval=settings.REDIS_WRITE_FLUSH_INTERVAL,
+            max_lag=settings.REDIS_WRITE_MAX_LAG,
+            max_retry_delay=settings.REDIS_WRITE_MAX_RETRY_DELAY,
+        )
+        self._writes.start()
+        if settings.CHANGE_LOG_ENABLED:
+            self._changes = ChangeLog(self._client, max_len=settings.CHANGE_LOG_MAX_LEN)
+
+        for script in (self._merge_margins, self._merge_positions, self._merge_trades, self._compact_trades):
+            await script.load(self._client)
+
+        if settings.TRADE_RETENTION_COUNT or settings.TRADE_RETENTION_AGE:
+            self._compaction_task = asyncio.ensure_future(self._compact_trades_periodically())
 
     async def stop(self):
+        if self._compaction_task:
+            self._compaction_task.cancel()
+            self._compaction_task = None
+        await self._writes.stop()
+        self._stored_tickers.clear()
         self._client.close()
         await self._client.wait_closed()
 
     """ Orders """
     async def save_order(self, client_key: str, order: BitmexOrder):
-        existing: BitmexOrder = await self._client.hmget(f"bitmex:{client_key}:orders", order.id, encoding="utf-8")
-        existing.update(order)
-
-        if not existing:
+        key = f"bitmex:{client_key}:orders"
+        stored = await self._hget(key, str(order.id))
+        existing: typing.Optional[BitmexOrder] = create_order(decode_value(stored)) if stored else None
+        to_store = existing.update(order) if existing else order
+
+        field = str(order.id)
+        fields = {field: to_store.to_json()}
+        if self._changes and self._writes.pending_field(key, field) is not None:
+            # A failed write of the order is buffered, it must not land after this one
+            await self._writes.flush()
+        if not self._changes or self._writes.pending_field(key, field) is not None:
+            self._writes.hset(key, fields)
             return
 
-        await self._client.hmset_dict(f"bitmex:{client_key}:orders", order.id, existing.to_json())
+        # Not buffered: the order is written with its change record. A failed write is buffered and retried
+        # without its record
+        if not await self._changes.append(client_key, ChangeKind.ORDER, [(field, order)], writes={key: fields}):
+            self._writes.hset(key, fields)
 
     async def get_orders(self, client_key: str) -> typing.Dict[str, BitmexOrder]:
-        stored: typing.Dict = await self._client.hgetall(f"bitmex:{client_key}:orders", encoding="utf-8")
+        stored: typing.Dict = await self._hgetall(f"bitmex:{client_key}:orders")
         orders: typing.Dict[str, BitmexOrder] = {}
         for order_id, data in stored.items():
-            orders[order_id] = create_order(json.loads(data))
+            orders[order_id] = create_order(decode_value(data))
         return orders
 
     async def get_order(self, client_key: str, order_id: str) -> typing.Optional[BitmexOrder]:
@@ -54,86 +130,59 @@ class RedisDataStore(DataStore):
 
     """ Margins """
     async def save_margins(self, client_key: str, data: typing.Dict):
-        margins: typing.Dict = defaultdict(dict)
-        to_store = await self.get_margins(client_key)
+        args: typing.List = []
         for entry in data.get("info", []):
-            currency = entry["currency"]
-            existing = to_store.get(entry["currency"], {})
-
             balance = entry.get("availableMargin") or entry.get("marginBalance")
-            used = entry.get("maintMargin") if "maintMargin" in entry else existing.get("used")
-
-            if None in (balance, used):
+            if balance is None:
                 continue
 
-            available = balance - used
-
-            balance, used, available = (round(val * XBt_TO_XBT_FACTOR, 10) for val in (balance, used, available,))
-
-            margin_data = json.dumps({
-                "balance": balance,
-                "used": used,
-                "available": available,
-            })
-            to_store.update({currency: margin_data})
+            used = entry.get("maintMargin")
+            currency = entry["currency"]
+            args.extend((currency, balance, "" if used is None else used, repr(settlement_currency_factor(currency))))
 
-        if not to_store:
+        if not args:
             return
 
-        for key, val in to_store.items():
-            if isinstance(val, dict):
-                to_store[key] = json.dumps(val)
-        await self._client.hmset_dict(f"bitmex:{client_key}:margins", to_store)
+        await self._merge_margins(self._client, keys=[f"bitmex:{client_key}:margins"], args=args)
 
     async def get_margins(self, client_key: str, as_json=False):
-        stored: typing.Dict = await self._client.hgetall(f"bitmex:{client_key}:margins", encoding="utf-8")
+        stored: typing.Dict = await self._hgetall(f"bitmex:{client_key}:margins")
         if as_json:
             return stored
 
         margins: typing.Dict = {}
         for symbol, data in stored.items():
-            margins[symbol] = json.loads(data)
+            margins[symbol] = decode_value(data)
         return margins
 
     async def get_margin(self, client_key: str, symbol: str):
-        stored = await self._client.hmget(f"bitmex:{client_key}:margins", symbol, encoding="utf-8")
-        if not isinstance(stored, list):
-            return {}
-
-        filter(None, stored)
-
+        stored = await self._hget(f"bitmex:{client_key}:margins", symbol)
         if not stored:
             return {}
 
-        return json.loads(stored[0])
+        return decode_value(stored)
 
     """ Positions """
     async def save_positions(self, client_key: str, data: typing.List):
-        to_store: typing.Dict = await self.get_positions(client_key)
-        new_positions: typing.List[BitmexPosition] = [create_position(entry) for entry in data]
-        for new_position in new_positions:
-            symbol = new_position.symbol
-            existing: BitmexPosition = to_store.get(symbol, new_position)
-            to_store.update({symbol: existing.update(new_position)})
-        for symbol, position in to_store.items():
-            to_store.update(({symbol: position.to_json()}))
-
-        if not to_store:
+        positions: typing.List[BitmexPosition] = [create_position(entry) for entry in data]
+        if not positions:
             return
 
-        for key, val in to_store.items():
-            if isinstance(val, dict):
-                to_store[key] = json.dumps(val)
-        await self._client.hmset_dict(f"bitmex:{client_key}:positions", to_store)
+        change_keys, args = self._change_log_args(client_key, ChangeKind.POSITION)
+        for position in positions:
+            args.extend((position.symbol, position.to_json(), self._change_record(position)))
+
+        await self._merge_positions(self._client, keys=[f"bitmex:{client_key}:positions"] + change_keys, args=args)
+        self._changes_appended(ChangeKind.POSITION, len(positions))
 
     async def get_positions(self, client_key: str, as_json=False) -> typing.Dict[str, BitmexPosition]:
-        stored: typing.Dict = await self._client.hgetall(f"bitmex:{client_key}:positions", encoding="utf-8")
+        stored: typing.Dict = await self._hgetall(f"bitmex:{client_key}:positions")
         if as_json:
             return stored
 
         positions: typing.Dict = {}
         for symbol, data in stored.items():
-            positions[symbol] = create_position(json.loads(data))
+            positions[symbol] = create_position(decode_value(data))
         return positions
 
     async def get_position(self, client_key: str, symbol: str) -> typing.Optional[BitmexPosition]:
@@ -142,73 +191,199 @@ class RedisDataStore(DataStore):
 
     """ Trades """
     async def save_trades(self, client_key: str, data: typing.List):
-        new_trades: typing.List[BitmexTrade] = [create_trade(entry.get("info", entry)) for entry in data]
-        to_store = await self.get_trades(client_key, as_json=True)
-        for new_trade in new_trades:
-            trade_id = new_trade.order_id
-            existing: BitmexTrade = create_trade(json.loads(to_store.get(trade_id, new_trade.to_json())))
-            to_store.update({trade_id: existing.update(new_trade).to_json()})
-
-        if not to_store:
+        updated_at = int(time.time() * 1000)
+        trades: typing.List[BitmexTrade] = [create_trade(entry.get("info", entry)) for entry in data]
+        if not trades:
             return
 
-        for key, val in to_store.items():
-            if isinstance(val, dict):
-                to_store[key] = json.dumps(val)
-        await self._client.hmset_dict(f"bitmex:{client_key}:trades", to_store)
+        change_keys, args = self._change_log_args(client_key, ChangeKind.TRADE)
+        for trade in trades:
+            args.extend((trade.order_id, trade.to_json(), updated_at, self._change_record(trade)))
 
-    async def get_trades(self, client_key: str, as_json=False):
-        stored: typing.Dict = await self._client.hgetall(f"bitmex:{client_key}:trades", encoding="utf-8")
-        if as_json:
-            return stored
+        key = f"bitmex:{client_key}:trades"
+        await self._merge_trades(self._client, keys=[key, f"{key}:index"] + change_keys, args=args)
+        self._trade_accounts.add(client_key)
+        self._changes_appended(ChangeKind.TRADE, len(trades))
 
-        trades: typing.Dict[str, BitmexTrade] = {}
-        for trade_id, data in stored.items():
-            trades[trade_id] = create_trade(json.loads(data))
+    async def get_trades(self, client_key: str, as_json=False):
+        trades: typing.Dict = {}
+        async for trade_id, data in self._client.ihscan(f"bitmex:{client_key}:trades", count=100):
+            trades[trade_id] = data if as_json else create_trade(decode_value(data))
         return trades
 
+    async def get_trades_page(self, client_key: str, offset: int = 0, limit: int = 100) -> typing.List[BitmexTrade]:
+        """
+        :return: trades by their last update, newest first
+        """
+        key = f"bitmex:{client_key}:trades"
+        order_ids = await self._client.zrevrange(f"{key}:index", offset, offset + limit - 1)
+        if not order_ids:
+            return []
+
+        stored = await self._client.hmget(key, *order_ids)
+        return [create_trade(decode_value(data)) for data in stored if data]
+
     async def get_trade(self, client_key: str, order_id: str) -> typing.Optional[BitmexTrade]:
         element = await self._get_single_match_key_element("trades", client_key, order_id, "order_id")
         return create_trade(element) if element else None
 
     """ Tickers """
     async def save_tickers(self, client_key: str, data: typing.Dict):
-        to_store: typing.Dict = await self.get_tickers(client_key)
-        new_symbols: typing.List[BitmexSymbol] = [create_symbol(entry) for entry in data.values()]
-        for new_symbol in new_symbols:
-            symbol = new_symbol.symbol
-            existing: BitmexSymbol = to_store.get(symbol, new_symbol)
-            to_store.update({symbol: existing.update(new_symbol)})
-        for symbol, ticker in to_store.items():
-            to_store.update(({symbol: ticker.to_json()}))
+        """
+        Writes only the symbols whose stored fields changed since this process last wrote them.
+        Instrument updates carry every symbol, most of them unchanged
+        """
+        stored_tickers = self._stored_tickers[client_key]
+        to_store: typing.Dict[str, str] = {}
+
+        for entry in data.values():
+            source = tuple(entry.get(field) for field in TICKER_SOURCE_FIELDS)
+            symbol = entry.get("symbol")
+            stored = stored_tickers.get(symbol)
+            if stored and stored[0] == source:
+                continue
+
+            new_symbol: BitmexSymbol = create_symbol(entry)
+            ticker = stored[1].update(new_symbol) if stored else new_symbol
+            stored_tickers[new_symbol.symbol] = (source, ticker)
+            to_store[new_symbol.symbol] = self._ticker_codec.encode(attr.asdict(ticker, recurse=False))
 
         if not to_store:
             return
 
-        for key, val in to_store.items():
-            if isinstance(val, dict):
-                to_store[key] = json.dumps(val)
-        await self._client.hmset_dict(f"bitmex:{client_key}:tickers", to_store)
+        self._writes.hset(f"bitmex:{client_key}:tickers", to_store)
 
     async def get_tickers(self, client_key: str, as_json=False):
-        stored: typing.Dict = await self._client.hgetall(f"bitmex:{client_key}:tickers", encoding="utf-8")
+        stored: typing.Dict = await self._hgetall(f"bitmex:{client_key}:tickers")
         if as_json:
             return stored
 
         tickers: typing.Dict[str, BitmexSymbol] = {}
         for symbol, data in stored.items():
-            tickers[symbol] = create_symbol(json.loads(data))
+            tickers[symbol] = create_symbol(decode_value(data))
         return tickers
 
     async def get_ticker(self, client_key: str, symbol: str):
         return await self._get_single_match_key_element("tickers", client_key, symbol, "symbol") or None
 
+    """ Trading context """
+    async def get_trading_context(self, client_key: str, symbol: str,
+                                  currency: typing.Optional[str] = None) -> TradingContext:
+        """
+        Reads the ticker, margin and position in one pipeline. Without `currency` the XBt margin is read
+        with them, and the margin of the ticker's settlement currency after them when it is another one
+        """
+        margins_key = f"bitmex:{client_key}:margins"
+        fields = (
+            (f"bitmex:{client_key}:tickers", symbol),
+            (margins_key, currency or DEFAULT_SETTLEMENT_CURRENCY),
+            (f"bitmex:{client_key}:positions", symbol),
+        )
+        pipeline = self._client.pipeline()
+        reads = [pipeline.hmget(key, field, encoding=None) for key, field in fields]
+        await pipeline.execute()
+
+        values: typing.List[typing.Optional[Value]] = []
+        for (key, field), read in zip(fields, reads):
+            pending = self._writes.pending_field(key, field)
+            values.append(pending if pending is not None else (await read)[0])
+
+        ticker, margin, position = values
+        ticker = decode_value(ticker) if ticker else None
+        settlement_currency = (ticker or {}).get("currency")
+        if not currency and settlement_currency and settlement_currency != DEFAULT_SETTLEMENT_CURRENCY:
+            margin = await self._hget(margins_key, settlement_currency)
+
+        return TradingContext(
+            ticker=ticker,
+            margin=decode_value(margin) if margin else {},
+            position=create_position(decode_value(position), local=True) if position else None,
+        )
+
     """ Utils """
+    async def export(self, kinds: typing.Iterable[str]) -> typing.Dict[str, typing.Dict[str, typing.Any]]:
+        """
+        :return: the stored hashes of `kinds` ("tickers", "positions", ...) of every account, read in one
+            pipeline. The index of a trades hash is read with it, as order id -> update time in
+            milliseconds under the index key
+        """
+        keys: typing.List[str] = []
+        for kind in kinds:
+            keys.extend([key async for key in self._client.iscan(match=f"bitmex:*:{kind}")])
+
+        pipeline = self._client.pipeline()
+        reads = [pipeline.hgetall(key, encoding=None) for key in keys]
+        index_keys = [f"{key}:index" for key in keys if key.endswith(":trades")]
+        index_reads = [pipeline.zrange(key, 0, -1, withscores=True, encoding="utf-8") for key in index_keys]
+        await pipeline.execute()
+
+        hashes: typing.Dict[str, typing.Dict[str, typing.Any]] = {}
+        for key, read in zip(keys, reads):
+            stored = await read
+            hashes[key] = self._writes.overlay(key, {field.decode("utf-8"): value for field, value in stored.items()})
+        for key, read in zip(index_keys, index_reads):
+            hashes[key] = dict(await read)
+        return hashes
+
+    async def compact_trades(self, client_key: str) -> int:
+        """
+        Removes the trades over the retention limits, up to `TRADE_COMPACTION_BATCH` at a time
+        """
+        oldest = int((time.time() - settings.TRADE_RETENTION_AGE) * 1000) if settings.TRADE_RETENTION_AGE else 0
+        key = f"bitmex:{client_key}:trades"
+        removed = await self._compact_trades(
+            self._client,
+            keys=[key, f"{key}:index"],
+            args=[settings.TRADE_RETENTION_COUNT, oldest, settings.TRADE_COMPACTION_BATCH],
+        )
+        if removed:
+            trades_compacted.inc(removed)
+        return removed
+
+    async def _compact_trades_periodically(self):
+        while True:
+            await asyncio.sleep(settings.TRADE_COMPACTION_INTERVAL)
+            for client_key in list(self._trade_accounts):
+                try:
+                    await self.compact_trades(client_key)
+                except Exception as e:
+                    logger.error({
+                        "event": "RedisDataStore.compact_trades",
+                        "account": client_key,
+                        "error": str(e),
+                        "timestamp": datetime.now(),
+                    })
+
+    def _change_log_args(self, client_key: str, kind: str) -> typing.Tuple[typing.List[str], typing.List]:
+        # The merge scripts append the change records with the merged state, no stream key when the log is off
+        if not self._changes:
+            return [], [kind, 0]
+        return self._changes.script_args(client_key, kind)
+
+    def _change_record(self, model: BitmexBaseModel) -> str:
+        return compact_json(model) if self._changes else ""
+
+    def _changes_appended(self, kind: str, count: int):
+        if self._changes:
+            self._changes.appended(kind, count)
+
     async def _get_single_match_key_element(self, type_key: str, client_key: str, entry_key: str, match_key: str):
-        stored = await self._client.hmget(f"bitmex:{client_key}:{type_key}", entry_key, encoding="utf-8")
-        for entry in stored:
-            data = json.loads(entry)
-            if data[match_key] == entry_key:
-                return data
-        else:
+        entry = await self._hget(f"bitmex:{client_key}:{type_key}", entry_key)
+        if not entry:
             return None
+
+        data = decode_value(entry)
+        return data if data[match_key] == entry_key else None
+
+    async def _hgetall(self, key: str) -> typing.Dict[str, Value]:
+        # Values are read as bytes, they may be binary encoded
+        stored = await self._client.hgetall(key, encoding=None)
+        return self._writes.overlay(key, {field.decode("utf-8"): value for field, value in stored.items()})
+
+    async def _hget(self, key: str, field: str) -> typing.Optional[Value]:
+        pending = self._writes.pending_field(key, field)
+        if pending is not None:
+            return pending
+
+        stored = await self._client.hmget(key, field, encoding=None)
+        return stored[0] if stored else None
@@ -0,0 +1,164 @@
+import typing
+
+from aioredis import Redis, ReplyError
+
+from nexus_bitmex_node.models.trade import OPEN_TRADE_STATUSES
+
+# Merge of `BitmexBaseModel.update`: every non-null field of the update wins
+MERGE_FUNCTION = """
+local function merge(stored, update)
+    if not stored then
+        return update
+    end
+    local merged = cjson.decode(stored)
+    for field, value in pairs(update) do
+        if value ~= cjson.null then
+            merged[field] = value
+        end
+    end
+    return merged
+end
+"""
+
+# Record of an update in the account's change stream (see `ChangeLog`), appended by the script that writes the update
+# so that the record and the state it records are written together. No stream key: the change log is off
+APPEND_CHANGE_FUNCTION = """
+local function append_change(stream, kind, max_len, entry_id, data)
+    if stream then
+        redis.call("XADD", stream, "MAXLEN", "~", max_len, "*", "kind", kind, "id", entry_id, "data", data)
+    end
+end
+"""
+
+# KEYS[1]: positions hash, KEYS[2]: change stream (optional). ARGV[1]: change kind, ARGV[2]: stream max length,
+# then symbol, position JSON, change record JSON, ...
+MERGE_POSITIONS = MERGE_FUNCTION + APPEND_CHANGE_FUNCTION + """
+for i = 3, #ARGV, 3 do
+    local position = merge(redis.call("HGET", KEYS[1], ARGV[i]), cjson.decode(ARGV[i + 1]))
+    local quantity = position["current_quantity"]
+    position["is_open"] = quantity ~= nil and quantity ~= cjson.null and quantity ~= 0
+    redis.call("HSET", KEYS[1], ARGV[i], cjson.encode(position))
+    append_change(KEYS[2], ARGV[1], ARGV[2], ARGV[i], ARGV[i + 2])
+end
+return (#ARGV - 2) / 3
+"""
+
+# KEYS[1]: trades hash, KEYS[2]: its time index, KEYS[3]: change stream (optional). ARGV[1]: change kind, ARGV[2]:
+# stream max length, then order id, trade JSON, update time (ms), change record JSON, ...
+MERGE_TRADES = MERGE_FUNCTION + APPEND_CHANGE_FUNCTION + """
+for i = 3, #ARGV, 4 do
+    local trade = merge(redis.call("HGET", KEYS[1], ARGV[i]), cjson.decode(ARGV[i + 1]))
+    redis.call("HSET", KEYS[1], ARGV[i], cjson.encode(trade))
+    redis.call("ZADD", KEYS[2], ARGV[i + 2], ARGV[i])
+    append_change(KEYS[3], ARGV[1], ARGV[2], ARGV[i], ARGV[i + 3])
+end
+return (#ARGV - 2) / 4
+"""
+
+# KEYS[1]: trades hash, KEYS[2]: its time index. ARGV[1]: trades to keep (0: all), ARGV[2]: oldest update time to
+# keep (ms, 0: all), ARGV[3]: most trades removed. Removes the oldest trades over either limit, open orders are kept
+# and skipped: the index is read a page at a time past them. Trades stored before the index existed are indexed as
+# the oldest
+COMPACT_TRADES = """
+local open = {%s}
+
+if redis.call("HLEN", KEYS[1]) > redis.call("ZCARD", KEYS[2]) then
+    for _, order_id in ipairs(redis.call("HKEYS", KEYS[1])) do
+        redis.call("ZADD", KEYS[2], "NX", 0, order_id)
+    end
+end
+
+local keep, oldest, batch = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local excess = 0
+if keep > 0 then
+    excess = redis.call("ZCARD", KEYS[2]) - keep
+end
+if excess <= 0 and (oldest == 0 or redis.call("ZCOUNT", KEYS[2], "-inf", "(" .. oldest) == 0) then
+    return 0
+end
+
+local removed, skipped = 0, 0
+while removed < batch do
+    -- Removed trades leave the index, the next page starts after the open ones
+    local oldest_trades = redis.call("ZRANGE", KEYS[2], skipped, skipped + batch - 1, "WITHSCORES")
+    if #oldest_trades == 0 then
+        break
+    end
+
+    for i = 1, #oldest_trades, 2 do
+        local order_id, updated_at = oldest_trades[i], tonumber(oldest_trades[i + 1])
+        if removed >= batch or (removed >= excess and updated_at >= oldest) then
+            return removed
+        end
+
+        local stored = redis.call("HGET", KEYS[1], order_id)
+        if not stored or not open[cjson.decode(stored)["order_status"]] then
+            redis.call("HDEL", KEYS[1], order_id)
+            redis.call("ZREM", KEYS[2], order_id)
+            removed = removed + 1
+        else
+            skipped = skipped + 1
+        end
+    end
+end
+return removed
+""" % ", ".join(f'["{status}"] = true' for status in OPEN_TRADE_STATUSES)
+
+# KEYS[1]: margins hash. ARGV: currency, margin balance, maintenance margin ("" when not sent), currency factor, ...
+# Balances are sent in the currency's base unit (XBt, USDt) and stored in its major unit (XBT, USDT) rounded to
+# 10 decimals. Without a maintenance margin the stored `used` is kept
+MERGE_MARGINS = """
+local function round(value)
+    return tonumber(string.format("%.10f", value))
+end
+
+local updated = 0
+for i = 1, #ARGV, 4 do
+    local factor = tonumber(ARGV[i + 3])
+    local used
+    if ARGV[i + 2] ~= "" then
+        used = round(tonumber(ARGV[i + 2]) * factor)
+    else
+        local stored = redis.call("HGET", KEYS[1], ARGV[i])
+        if stored then
+            used = cjson.decode(stored)["used"]
+        end
+    end
+
+    if used and used ~= cjson.null then
+        local balance = round(tonumber(ARGV[i + 1]) * factor)
+        redis.call("HSET", KEYS[1], ARGV[i], cjson.encode({
+            balance = balance,
+            used = used,
+            available = round(balance - used),
+        }))
+        updated = updated + 1
+    end
+end
+return updated
+"""
+
+
+class RedisScript:
+    """
+    Lua script loaded once with SCRIPT LOAD and called by its SHA. It is loaded again when Redis
+    lost its script cache (restart, failover)
+    """
+    def __init__(self, source: str):
+        self.source = source
+        self.sha: typing.Optional[str] = None
+
+    async def load(self, client: Redis):
+        self.sha = await client.script_load(self.source)
+
+    async def __call__(self, client: Redis, keys: typing.List[str], args: typing.List) -> typing.Any:
+        if not self.sha:
+            await self.load(client)
+
+        try:
+            return await client.evalsha(self.sha, keys=keys, args=args)
+        except ReplyError as e:
+            if not str(e).startswith("NOSCRIPT"):
+                raise
+            await self.load(client)
+            return await client.evalsha(self.sha, keys=keys, args=args)
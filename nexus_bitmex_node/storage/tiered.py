@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import time
+import typing
+from datetime import datetime
+
+import watchtower
+
+from nexus_bitmex_node import settings
+from nexus_bitmex_node.event_bus import EventBus
+from nexus_bitmex_node.metrics import metrics
+from nexus_bitmex_node.models.order import BitmexOrder
+from nexus_bitmex_node.models.position import BitmexPosition
+from nexus_bitmex_node.models.trade import BitmexTrade
+from nexus_bitmex_node.storage.data_store import DataStore, TradingContext
+from nexus_bitmex_node.storage.local import LOADERS, LocalDataStore
+from nexus_bitmex_node.storage.redis import RedisDataStore
+
+logger = logging.getLogger(__name__)
+logger.addHandler(watchtower.CloudWatchLogHandler(log_group="nexus-bitmex-node", stream_name=settings.app_env))
+
+replication_lag = metrics.histogram("data_store_replication_lag_seconds",
+                                    "Time from a write to memory until it was written to Redis")
+replication_errors = metrics.counter("data_store_replication_errors_total", "Writes to Redis that failed")
+replication_dropped = metrics.counter("data_store_replication_dropped_total",
+                                      "Writes not sent to Redis because too many were waiting")
+
+Replication = typing.Tuple[float, typing.Callable[..., typing.Awaitable], tuple]
+
+
+class TieredDataStore(DataStore):
+    """
+    `LocalDataStore` (L1) serves every read and is written first. The same writes are replayed to
+    `RedisDataStore` (L2) in order by a background task, for durability and for the other services
+    reading Redis. L1 is hydrated from Redis on start. A failed L2 write is retried with backoff, the
+    writes after it wait. While too many writes wait, new writes of the entries the exchange sends again
+    with their next update are dropped, orders never are. Neither store may listen to the event bus
+    """
+    _replication: typing.Optional["asyncio.Queue[Replication]"] = None
+
+    def __init__(self, event_bus: EventBus, local: LocalDataStore, remote: RedisDataStore):
+        self._local = local
+        self._remote = remote
+        self._replication_task: typing.Optional[asyncio.Future] = None
+        self._dropping = False
+        super().__init__(event_bus)
+
+    def register_listeners(self):
+        loop = asyncio.get_event_loop()
+        self.register_margins_updated_listener(self.save_margins, loop)
+        self.register_ticker_updated_listener(self.save_tickers, loop)
+        self.register_trades_updated_listener(self.save_trades, loop)
+        self.register_positions_updated_listener(self.save_positions, loop)
+        self.register_order_placed_listener(self.save_order, loop)
+
+    async def start(self, url: str):
+        await self._remote.start(url)
+        await self._local.start()
+        await self.hydrate()
+
+        self._replication = asyncio.Queue()
+        self._replication_task = asyncio.ensure_future(self._replicate())
+
+    async def stop(self):
+        if self._replication_task:
+            # Redis gets the writes made before the stop, unless it is down
+            try:
+                await asyncio.wait_for(self._replication.join(), settings.REPLICATION_STOP_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.error({
+                    "event": "TieredDataStore.stop",
+                    "error": "Redis writes were not replicated before the stop",
+                    "writes": self._replication.qsize(),
+                    "timestamp": datetime.now(),
+                })
+            self._replication_task.cancel()
+            self._replication_task = None
+        await self._remote.stop()
+        await self._local.stop()
+
+    async def hydrate(self):
+        started = time.monotonic()
+        exported = await self._remote.export(LOADERS)
+        stored = {key: entries for key, entries in exported.items() if not key.endswith(":index")}
+        for key, entries in stored.items():
+            self._local.load(key, entries, exported.get(f"{key}:index"))
+
+        logger.info({
+            "event": "TieredDataStore.hydrate",
+            "hashes": len(stored),
+            "entries": sum(len(entries) for entries in stored.values()),
+            "duration": round(time.monotonic() - started, 3),
+            "timestamp": datetime.now(),
+        })
+
+    """ Orders """
+    async def save_order(self, client_key: str, order: BitmexOrder):
+        await self._local.save_order(client_key, order)
+        self._replicate_later(self._remote.save_order, client_key, order)
+
+    async def get_orders(self, client_key: str) -> typing.Dict[str, BitmexOrder]:
+        return await self._local.get_orders(client_key)
+
+    async def get_order(self, client_key: str, order_id: str) -> typing.Optional[BitmexOrder]:
+        return await self._local.get_order(client_key, order_id)
+
+    """ Margins """
+    async def save_margins(self, client_key: str, data: typing.Dict):
+        await self._local.save_margins(client_key, data)
+        self._replicate_later(self._remote.save_margins, client_key, data)
+
+    async def get_margins(self, client_key: str):
+        return await self._local.get_margins(client_key)
+
+    async def get_margin(self, client_key: str, symbol: str):
+        return await self._local.get_margin(client_key, symbol)
+
+    """ Positions """
+    async def save_positions(self, client_key: str, data: typing.List):
+        await self._local.save_positions(client_key, data)
+        self._replicate_later(self._remote.save_positions, client_key, data)
+
+    async def get_positions(self, client_key: str) -> typing.Dict[str, BitmexPosition]:
+        return await self._local.get_positions(client_key)
+
+    async def get_position(self, client_key: str, symbol: str) -> typing.Optional[BitmexPosition]:
+        return await self._local.get_position(client_key, symbol)
+
+    """ Trades """
+    async def save_trades(self, client_key: str, data: typing.List[BitmexTrade]):
+        await self._local.save_trades(client_key, data)
+        self._replicate_later(self._remote.save_trades, client_key, data)
+
+    async def get_trades(self, client_key: str):
+        return await self._local.get_trades(client_key)
+
+    async def get_trade(self, client_key: str, trade_id: str) -> typing.Optional[BitmexTrade]:
+        return await self._local.get_trade(client_key, trade_id)
+
+    async def get_trades_page(self, client_key: str, offset: int = 0, limit: int = 100) -> typing.List[BitmexTrade]:
+        return await self._local.get_trades_page(client_key, offset, limit)
+
+    """ Tickers """
+    async def save_tickers(self, client_key: str, data: typing.Dict):
+        await self._local.save_tickers(client_key, data)
+        self._replicate_later(self._remote.save_tickers, client_key, data)
+
+    async def get_tickers(self, client_key: str):
+        return await self._local.get_tickers(client_key)
+
+    async def get_ticker(self, client_key: str, symbol: str):
+        return await self._local.get_ticker(client_key, symbol)
+
+    """ Trading context """
+    async def get_trading_context(self, client_key: str, symbol: str,
+                                  currency: typing.Optional[str] = None) -> TradingContext:
+        return await self._local.get_trading_context(client_key, symbol, currency)
+
+    """ Utils """
+    def _replicate_later(self, write: typing.Callable[..., typing.Awaitable], *args):
+        if self._replication is None:
+            return
+
+        # Orders are only sent once, the other entries again with their next update
+        if self._replication.qsize() >= settings.REPLICATION_QUEUE_SIZE and write != self._remote.save_order:
+            replication_dropped.inc(write=write.__name__)
+            if not self._dropping:
+                self._dropping = True
+                logger.error({
+                    "event": "TieredDataStore.replicate_later",
+                    "error": "Too many Redis writes waiting, dropping the ones sent again by the exchange",
+                    "writes": self._replication.qsize(),
+                    "timestamp": datetime.now(),
+                })
+            return
+
+        self._dropping = False
+        self._replication.put_nowait((time.monotonic(), write, args))
+
+    async def _replicate(self):
+        while True:
+            written_at, write, args = await self._replication.get()
+            try:
+                await self._write_until_done(write, args)
+                replication_lag.observe(time.monotonic() - written_at)
+            finally:
+                self._replication.task_done()
+
+    @staticmethod
+    async def _write_until_done(write: typing.Callable[..., typing.Awaitable], args: tuple):
+        """
+        Retries the write until Redis takes it, the writes after it wait so they are replayed in order
+        """
+        delay = settings.REPLICATION_RETRY_DELAY
+        while True:
+            try:
+                await write(*args)
+                return
+            except Exception as e:
+                replication_errors.inc()
+                logger.error({
+                    "event": "TieredDataStore.replicate",
+                    "write": write.__name__,
+                    "error": str(e),
+                    "retry_in": delay,
+                    "timestamp": datetime.now(),
+                })
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, settings.REPLICATION_MAX_RETRY_DELAY)
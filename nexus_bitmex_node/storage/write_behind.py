@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import time
+import typing
+from datetime import datetime
+
+import watchtower
+from aioredis import Redis
+
+from nexus_bitmex_node import settings
+from nexus_bitmex_node.metrics import metrics
+
+logger = logging.getLogger(__name__)
+logger.addHandler(watchtower.CloudWatchLogHandler(log_group="nexus-bitmex-node", stream_name=settings.app_env))
+
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+write_batch_size = metrics.histogram("redis_write_batch_size", "Hash fields written per flush", BATCH_SIZE_BUCKETS)
+write_flush_seconds = metrics.histogram("redis_write_flush_seconds", "Duration of a write-behind pipeline flush")
+writes_coalesced = metrics.counter("redis_writes_coalesced_total", "Pending hash field writes replaced before a flush")
+write_flush_errors = metrics.counter("redis_write_flush_errors_total", "Write-behind flushes that failed")
+
+HashWrites = typing.Dict[str, typing.Dict[str, typing.Union[str, bytes]]]
+
+
+class WriteBehindBuffer:
+    """
+    Coalesces hash field writes per key and field and flushes them in one Redis pipeline once writes have been
+    quiet for `flush_interval` seconds, or at the latest `max_lag` seconds after the oldest pending write.
+    A failed flush is retried after a delay doubling from `flush_interval` up to `max_retry_delay` seconds.
+    Pending and in-flight writes are overlaid on reads so callers always read their own writes
+    """
+    def __init__(self, client: Redis, flush_interval: float = 0.05, max_lag: float = 0.25,
+                 max_retry_delay: float = 10.0):
+        self._client = client
+        self.flush_interval = flush_interval
+        self.max_lag = max_lag
+        self.max_retry_delay = max_retry_delay
+
+        self._pending: HashWrites = {}
+        self._in_flight: HashWrites = {}
+        self._first_write = 0.0
+        self._last_write = 0.0
+        self._retry_delay = 0.0
+        self._retry_at = 0.0
+        self._has_pending = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: typing.Optional[asyncio.Future] = None
+
+    def __len__(self):
+        return sum(len(fields) for fields in self._pending.values())
+
+    def start(self):
+        if not self._task:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        """
+        Stops the flush task and writes everything still pending
+        """
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def hset(self, key: str, fields: typing.Dict[str, str]):
+        if not fields:
+            return
+
+        now = time.monotonic()
+        if not self._pending:
+            self._first_write = now
+        self._last_write = now
+
+        pending = self._pending.setdefault(key, {})
+        replaced = sum(1 for field in fields if field in pending)
+        if replaced:
+            writes_coalesced.inc(replaced, key=key.rsplit(":", 1)[-1])
+        pending.update(fields)
+        self._has_pending.set()
+
+    def overlay(self, key: str, stored: typing.Dict[str, str]) -> typing.Dict[str, str]:
+        """
+        :param stored: fields of `key` read from Redis
+        :return: the fields as they will be once the pending writes are flushed
+        """
+        in_flight, pending = self._in_flight.get(key), self._pending.get(key)
+        if not in_flight and not pending:
+            return stored
+        return {**stored, **(in_flight or {}), **(pending or {})}
+
+    def pending_field(self, key: str, field: str) -> typing.Optional[str]:
+        pending = self._pending.get(key, {}).get(field)
+        return pending if pending is not None else self._in_flight.get(key, {}).get(field)
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._pending:
+                return
+
+            batch, self._pending = self._pending, {}
+            self._in_flight = batch
+            self._has_pending.clear()
+
+            started = time.monotonic()
+            try:
+                pipeline = self._client.pipeline()
+                for key, fields in batch.items():
+                    pipeline.hmset_dict(key, fields)
+                await pipeline.execute()
+            except Exception as e:
+                # Backs off so an unavailable Redis gets one flush (and one error) per retry delay
+                self._retry_delay = min(max(self._retry_delay * 2, self.flush_interval), self.max_retry_delay)
+                self._retry_at = time.monotonic() + self._retry_delay
+                write_flush_errors.inc()
+                logger.error({
+                    "event": "WriteBehindBuffer.flush",
+                    "keys": list(batch),
+                    "error": str(e),
+                    "retry_in": self._retry_delay,
+                    "timestamp": datetime.now(),
+                })
+                # Newer writes win over the failed batch, which is retried with the next flush
+                for key, fields in batch.items():
+                    self._pending[key] = {**fields, **self._pending.get(key, {})}
+                self._first_write = self._last_write = time.monotonic()
+                self._has_pending.set()
+            else:
+                self._retry_delay = self._retry_at = 0.0
+                write_batch_size.observe(sum(len(fields) for fields in batch.values()))
+                write_flush_seconds.observe(time.monotonic() - started)
+            finally:
+                self._in_flight = {}
+
+    async def _run(self):
+        while True:
+            await self._has_pending.wait()
+
+            while True:
+                deadline = min(self._last_write + self.flush_interval, self._first_write + self.max_lag)
+                deadline = max(deadline, self._retry_at)
+                delay = deadline - time.monotonic()
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+
+            await self.flush()
@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import time
+import typing
+from datetime import datetime
+
+import watchtower
+
+from nexus_bitmex_node import settings
+from nexus_bitmex_node.metrics import metrics
+
+if typing.TYPE_CHECKING:
+    from nexus_bitmex_node.bitmex import BitmexManager
+    from nexus_bitmex_node.bitmex_client import BitmexClient
+
+logger = logging.getLogger(__name__)
+logger.addHandler(watchtower.CloudWatchLogHandler(log_group="nexus-bitmex-node", stream_name=settings.app_env))
+
+fallback_polls = metrics.counter("stream_fallback_polls_total", "REST polls made while a private stream was stale")
+
+ORDERS_STREAM = "orders"
+POSITIONS_STREAM = "positions"
+BALANCE_STREAM = "balance"
+# Instrument updates arrive every few seconds on the websocket connection the private streams share
+TICKERS_STREAM = "tickers"
+
+
+class StreamFreshness:
+    """
+    Time of the last update received on each websocket stream, and of the last failed watch of the streams
+    that failed since their last update. A private stream can be quiet for long (no order activity), the
+    connection the streams share is alive while any stream delivers
+    """
+    def __init__(self):
+        self._started = time.monotonic()
+        self._updated_at: typing.Dict[str, float] = {}
+        self._lost_at: typing.Dict[str, float] = {}
+
+    def touch(self, stream: str):
+        self._updated_at[stream] = time.monotonic()
+        self._lost_at.pop(stream, None)
+
+    def lose(self, stream: str):
+        self._lost_at[stream] = time.monotonic()
+
+    def recover(self, stream: str):
+        self._lost_at.pop(stream, None)
+
+    def age(self, stream: str) -> float:
+        return time.monotonic() - self._updated_at.get(stream, self._started)
+
+    def connection_age(self) -> float:
+        """
+        :return: seconds since an update was received on any stream
+        """
+        return time.monotonic() - max(self._updated_at.values(), default=self._started)
+
+    def is_stale(self, stream: str, stale_after: float) -> bool:
+        """
+        :return: whether updates of `stream` may be missed: its watch failed since its last update, or the
+            connection delivered nothing for `stale_after` seconds. A quiet stream on a live connection is not
+        """
+        return stream in self._lost_at or self.connection_age() > stale_after
+
+    def is_reconnected(self, stream: str) -> bool:
+        """
+        :return: whether the connection delivered again since the watch of `stream` failed, the stream is
+            subscribed again and only a poll of what it missed is left
+        """
+        lost_at = self._lost_at.get(stream)
+        return lost_at is not None and self.connection_age() < time.monotonic() - lost_at
+
+
+class StreamPollingFallback:
+    """
+    Polls the REST API for the private streams that lost their subscription, or for all of them once the
+    websocket connection has been silent for more than `stale_after` seconds, and feeds the results to the same
+    `BitmexManager.update_*_data` diffing as the streams. The interval grows while polls bring nothing new, never
+    uses more than `budget_share` of the account's rate limit, and polling stops as soon as a stream delivers
+    again or was polled once subscribed again
+    """
+    def __init__(self, manager: "BitmexManager", client_id: str, client: "BitmexClient",
+                 stale_after: float, min_interval: float, max_interval: float, budget_share: float):
+        self._manager = manager
+        self._client_id = client_id
+        self._client = client
+        self._stale_after = stale_after
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._budget_share = budget_share
+        self._interval = min_interval
+        self._polling: typing.Set[str] = set()
+
+    @property
+    def interval(self) -> float:
+        return self._interval
+
+    @property
+    def polling(self) -> typing.Set[str]:
+        return set(self._polling)
+
+    async def run(self):
+        while True:
+            stale = self._stale_streams()
+            self._log_transitions(stale)
+
+            if not stale:
+                self._interval = self._min_interval
+                await asyncio.sleep(self._stale_after / 2)
+                continue
+
+            changed = False
+            freshness = self._client.stream_freshness
+            for stream in stale:
+                reconnected = freshness.is_reconnected(stream)
+                try:
+                    changed = await self._poll(stream) or changed
+                    if reconnected:
+                        # The poll started after the stream was subscribed again, it has seen what was missed
+                        freshness.recover(stream)
+                except Exception as e:
+                    logger.info({
+                        "event": "StreamPollingFallback.poll",
+                        "stream": stream,
+                        "error": str(e),
+                        "timestamp": datetime.now(),
+                    })
+
+            self._interval = self._next_interval(changed, len(stale))
+            await asyncio.sleep(self._interval)
+
+    def _stale_streams(self) -> typing.List[str]:
+        freshness = self._client.stream_freshness
+        return [
+            stream for stream in (ORDERS_STREAM, POSITIONS_STREAM, BALANCE_STREAM)
+            if freshness.is_stale(stream, self._stale_after)
+        ]
+
+    def _next_interval(self, changed: bool, requests: int) -> float:
+        scheduler = self._client.scheduler
+        budget_interval = requests * scheduler.period / (scheduler.limit * self._budget_share)
+
+        interval = self._min_interval if changed else self._interval * 1.5
+        return min(self._max_interval, max(interval, budget_interval))
+
+    async def _poll(self, stream: str) -> bool:
+        fallback_polls.inc(stream=stream)
+        client = self._client
+
+        if stream == ORDERS_STREAM:
+            orders = await client.fetch_orders(limit=100, params={"reverse": True})
+            client.submitted_orders.observe(orders)
+            return await self._manager.update_orders_data(self._client_id, orders)
+        if stream == POSITIONS_STREAM:
+            positions = await client.fetch_positions()
+            return await self._manager.update_positions_data(
+                self._client_id, {position["symbol"]: position for position in positions}
+            )
+        if stream == BALANCE_STREAM:
+            balance = await client.fetch_balance()
+            return await self._manager.update_margin_data(self._client_id, balance)
+        return False
+
+    def _log_transitions(self, stale: typing.List[str]):
+        stale_set = set(stale)
+        for stream in stale_set ^ self._polling:
+            logger.info({
+                "event": "StreamPollingFallback.start" if stream in stale_set else "StreamPollingFallback.stop",
+                "stream": stream,
+                "timestamp": datetime.now(),
+            })
+        self._polling = stale_set
@@ -0,0 +1,152 @@
+import asyncio
+import contextvars
+import inspect
+import itertools
+import logging
+import time
+import typing
+from datetime import datetime
+
+import watchtower
+
+from nexus_bitmex_node import settings
+from nexus_bitmex_node.metrics import metrics
+
+logger = logging.getLogger(__name__)
+logger.addHandler(watchtower.CloudWatchLogHandler(log_group="nexus-bitmex-node", stream_name=settings.app_env))
+
+mailbox_wait_seconds = metrics.histogram("symbol_actor_mailbox_wait_seconds", "Time a command waited in its mailbox")
+
+# Lane of the commands that are not tied to one symbol
+ACCOUNT_LANE = "*"
+
+Handler = typing.Callable[..., typing.Awaitable[None]]
+# Queued at, sender's context, handler, args, kwargs
+Command = typing.Tuple[float, contextvars.Context, Handler, tuple, dict]
+
+
+class SymbolActor:
+    """
+    Runs the commands of one symbol one at a time, in the order they arrived
+    """
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self._mailbox: "asyncio.Queue[Command]" = asyncio.Queue()
+        self._running: typing.Optional[Command] = None
+        self._worker: asyncio.Future = asyncio.ensure_future(self._run())
+
+    @property
+    def queued(self) -> int:
+        return self._mailbox.qsize()
+
+    def tell(self, handler: Handler, *args, **kwargs):
+        self._mailbox.put_nowait((time.monotonic(), contextvars.copy_context(), handler, args, kwargs))
+
+    async def stop(self, timeout: float = 0) -> typing.List[Command]:
+        """
+        Runs the queued commands for up to `timeout` seconds, then cancels the running one
+        :return: the commands that did not run to the end
+        """
+        try:
+            await asyncio.wait_for(self._mailbox.join(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+
+        dropped = [self._running] if self._running else []
+        while not self._mailbox.empty():
+            dropped.append(self._mailbox.get_nowait())
+        return dropped
+
+    async def _run(self):
+        while True:
+            command = self._running = await self._mailbox.get()
+            queued_at, context, handler, args, kwargs = command
+            mailbox_wait_seconds.observe(time.monotonic() - queued_at, symbol=self.symbol)
+            try:
+                # Runs in the sender's context so the command keeps its trace
+                await context.run(asyncio.ensure_future, handler(*args, **kwargs))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error({
+                    "event": "SymbolActor.error",
+                    "symbol": self.symbol,
+                    "handler": getattr(handler, "__name__", str(handler)),
+                    "error": str(e),
+                    "timestamp": datetime.now(),
+                })
+            self._running = None
+            self._mailbox.task_done()
+
+
+class SymbolActorPool:
+    """
+    One actor per symbol: commands for a symbol are serialized, different symbols run in parallel.
+    Commands that do not run, told after the stop or dropped by it, are passed to `on_dropped` with
+    their arguments so they can be answered
+    """
+    _actors: typing.Dict[str, SymbolActor]
+
+    def __init__(self, on_dropped: typing.Optional[Handler] = None):
+        self._actors = {}
+        self._closed = False
+        self._on_dropped = on_dropped
+
+    def tell(self, symbol: typing.Optional[str], handler: Handler, *args, **kwargs):
+        if self._closed:
+            asyncio.ensure_future(self._drop((time.monotonic(), contextvars.copy_context(), handler, args, kwargs)))
+            return
+
+        symbol = symbol or ACCOUNT_LANE
+        actor = self._actors.get(symbol)
+        if not actor:
+            actor = self._actors[symbol] = SymbolActor(symbol)
+        actor.tell(handler, *args, **kwargs)
+
+    def dispatcher(self, handler: Handler, symbol_of: typing.Callable[..., typing.Any]) -> Handler:
+        """
+        Wraps an event bus listener so that it runs on the actor of the command's symbol
+        :param symbol_of: returns (or resolves to) the symbol of a command from the listener's arguments
+        """
+        async def dispatch(*args, **kwargs):
+            symbol = symbol_of(*args, **kwargs)
+            if inspect.isawaitable(symbol):
+                symbol = await symbol
+            self.tell(symbol, handler, *args, **kwargs)
+
+        dispatch.__name__ = getattr(handler, "__name__", "dispatch")
+        return dispatch
+
+    def state(self) -> typing.Dict[str, int]:
+        return {symbol: actor.queued for symbol, actor in self._actors.items()}
+
+    async def stop(self, timeout: float = 0):
+        """
+        Lets every actor run its queued commands for up to `timeout` seconds, the others are dropped
+        """
+        self._closed = True
+        actors, self._actors = list(self._actors.values()), {}
+        dropped = await asyncio.gather(*[actor.stop(timeout) for actor in actors])
+        for command in itertools.chain.from_iterable(dropped):
+            await self._drop(command)
+
+    async def _drop(self, command: Command):
+        _, context, handler, args, kwargs = command
+        if not self._on_dropped:
+            return
+
+        try:
+            await context.run(asyncio.ensure_future, self._on_dropped(handler, *args, **kwargs))
+        except Exception as e:
+            logger.error({
+                "event": "SymbolActorPool.drop",
+                "handler": getattr(handler, "__name__", str(handler)),
+                "error": str(e),
+                "timestamp": datetime.now(),
+            })
@@ -0,0 +1,136 @@
+import contextvars
+import time
+import typing
+from collections import OrderedDict
+
+from nexus_bitmex_node import settings
+from nexus_bitmex_node.metrics import metrics
+
+stage_latency_seconds = metrics.histogram(
+    "order_lifecycle_stage_seconds", "Time spent between two consecutive stages of an order command"
+)
+total_latency_seconds = metrics.histogram(
+    "order_lifecycle_seconds", "Time from AMQP delivery to each stage of an order command"
+)
+
+# Stages
+AMQP_DELIVERED = "amqp_delivered"
+TRIGGERED = "triggered"
+BUS_DISPATCHED = "bus_dispatched"
+LEVERAGE_SET = "leverage_set"
+REST_SUBMIT = "rest_submit"
+# Every attempt after the first one of a retried REST call
+REST_RETRY = "rest_retry"
+REST_ACK = "rest_ack"
+STREAM_UPDATE = "stream_update"
+RESPONSE_PUBLISHED = "response_published"
+
+
+class OrderTrace:
+    """
+    Monotonic timestamps of the stages an order command went through
+    """
+    def __init__(self, trace_id: str, command: str, started: typing.Optional[float] = None):
+        self.trace_id = trace_id
+        self.command = command
+        self.started = time.monotonic() if started is None else started
+        self.stages: typing.List[typing.Tuple[str, float]] = []
+
+    def mark(self, stage: str, at: typing.Optional[float] = None):
+        now = time.monotonic() if at is None else at
+        previous = self.stages[-1][1] if self.stages else self.started
+        self.stages.append((stage, now))
+
+        stage_latency_seconds.observe(now - previous, command=self.command, stage=stage)
+        total_latency_seconds.observe(now - self.started, command=self.command, stage=stage)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.trace_id,
+            "command": self.command,
+            "stages": [
+                {"stage": stage, "elapsedMs": round((timestamp - self.started) * 1000, 3)}
+                for stage, timestamp in self.stages
+            ],
+        }
+
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("current_trace", default=None)
+
+
+class OrderTracer:
+    """
+    Keeps the most recent traces by message id. The trace of the command being handled is also stored in a
+    context variable, which the event bus tasks inherit, so REST calls can be marked without passing it around
+    """
+    def __init__(self, max_traces: int = 1000):
+        self._max_traces = max_traces
+        self._traces: "OrderedDict[str, OrderTrace]" = OrderedDict()
+        self._by_cl_ord_id: "OrderedDict[str, OrderTrace]" = OrderedDict()
+
+    def start(self, trace_id: str, command: str, stage: str = AMQP_DELIVERED,
+              started: typing.Optional[float] = None) -> OrderTrace:
+        trace = OrderTrace(trace_id, command, started)
+        trace.mark(stage, at=started)
+        _current_trace.set(trace)
+
+        self._put(self._traces, trace_id, trace)
+        return trace
+
+    def get(self, trace_id: typing.Optional[str]) -> typing.Optional[OrderTrace]:
+        return self._traces.get(trace_id) if trace_id else None
+
+    @staticmethod
+    def current() -> typing.Optional[OrderTrace]:
+        return _current_trace.get()
+
+    def mark(self, stage: str):
+        trace = self.current()
+        if trace:
+            trace.mark(stage)
+
+    def mark_attempt(self, attempt_number: int):
+        """
+        Marks a REST call: REST_SUBMIT once, then REST_RETRY for every retry
+        """
+        self.mark(REST_SUBMIT if attempt_number <= 1 else REST_RETRY)
+
+    def mark_submitted(self, cl_ord_id: str, attempt_number: int = 1):
+        trace = self.current()
+        if trace:
+            self.mark_attempt(attempt_number)
+            self._put(self._by_cl_ord_id, cl_ord_id, trace)
+
+    def observe_orders(self, orders: typing.Iterable[dict]):
+        """
+        Marks the first orders stream update of every submitted clOrdID
+        """
+        if not self._by_cl_ord_id:
+            return
+
+        for order in orders:
+            cl_ord_id = (order.get("info") or {}).get("clOrdID")
+            trace = self._by_cl_ord_id.pop(cl_ord_id, None) if cl_ord_id else None
+            if trace:
+                trace.mark(STREAM_UPDATE)
+
+    def attach(self, trace_id: typing.Optional[str], payload: dict) -> dict:
+        """
+        Marks the response of a traced command as published and, if `ORDER_TRACE_IN_RESPONSE` is set,
+        adds the trace to its payload
+        """
+        trace = self.get(trace_id)
+        if trace:
+            trace.mark(RESPONSE_PUBLISHED)
+            if settings.ORDER_TRACE_IN_RESPONSE:
+                payload["trace"] = trace.to_dict()
+        return payload
+
+    def _put(self, entries: "OrderedDict[str, OrderTrace]", key: str, trace: OrderTrace):
+        entries[key] = trace
+        entries.move_to_end(key)
+        while len(entries) > self._max_traces:
+            entries.popitem(last=False)
+
+
+tracer = OrderTracer()
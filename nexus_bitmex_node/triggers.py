@@ -0,0 +1,211 @@
+import bisect
+import enum
+import logging
+import time
+import typing
+from datetime import datetime
+
+import watchtower
+from attr import dataclass
+
+from nexus_bitmex_node import settings
+from nexus_bitmex_node.metrics import metrics
+from nexus_bitmex_node.models.order import StopTriggerType
+
+logger = logging.getLogger(__name__)
+logger.addHandler(watchtower.CloudWatchLogHandler(log_group="nexus-bitmex-node", stream_name=settings.app_env))
+
+conditional_orders_armed = metrics.counter("conditional_orders_armed_total", "Conditional orders waiting on triggers")
+conditional_orders_triggered = metrics.counter("conditional_orders_triggered_total", "Conditional orders triggered")
+
+# Ticker (instrument) field watched by each trigger price type
+TICKER_PRICE_FIELDS = {
+    StopTriggerType.LAST_PRICE: "lastPrice",
+    StopTriggerType.MARK_PRICE: "markPrice",
+}
+
+
+class TriggerDirection(enum.Enum):
+    ABOVE = "ABOVE"
+    BELOW = "BELOW"
+
+
+@dataclass
+class TriggerLeg:
+    order_id: str
+    symbol: str
+    price: float
+    direction: TriggerDirection
+    price_type: StopTriggerType
+    satisfied: bool = False
+
+
+@dataclass
+class ConditionalOrder:
+    id: str
+    client_order_id: str
+    symbol: str
+    order_data: dict
+    legs: typing.List[TriggerLeg]
+    created_at: float
+
+
+def create_conditional_order(message_id: str, order_data: dict) -> ConditionalOrder:
+    """
+    :param order_data: create order command whose main order has `triggers`:
+        [{"symbol": ..., "price": ..., "direction": "ABOVE" | "BELOW", "priceType": "LAST_PRICE" | "MARK_PRICE"}]
+    :raises ValueError: on an invalid trigger or a main order without symbol
+    """
+    main_order = dict((order_data.get("orders") or {}).get("main") or {})
+    if not main_order.get("symbol"):
+        raise ValueError("Conditional order requires a symbol")
+    triggers = main_order.pop("triggers", None) or []
+    if not isinstance(triggers, list):
+        triggers = [triggers]
+
+    legs = []
+    for trigger in triggers:
+        try:
+            legs.append(TriggerLeg(
+                order_id=message_id,
+                symbol=trigger.get("symbol") or main_order["symbol"],
+                price=float(trigger["price"]),
+                direction=TriggerDirection(str(trigger["direction"]).upper()),
+                price_type=StopTriggerType(trigger.get("priceType") or StopTriggerType.LAST_PRICE.value),
+            ))
+        except (AttributeError, KeyError, TypeError, ValueError):
+            raise ValueError(f"Invalid trigger: {trigger}")
+
+    if not legs:
+        raise ValueError("Conditional order requires at least one trigger")
+
+    return ConditionalOrder(
+        id=message_id,
+        client_order_id=str(main_order.get("clOrderId", "")),
+        symbol=main_order["symbol"],
+        order_data=dict(order_data, orders=dict(order_data["orders"], main=main_order)),
+        legs=legs,
+        created_at=time.monotonic(),
+    )
+
+
+class PriceLevels:
+    """
+    Pending legs of one symbol, price type and direction, sorted by trigger price
+    """
+    def __init__(self, direction: TriggerDirection):
+        self.direction = direction
+        self._prices: typing.List[float] = []
+        self._legs: typing.List[TriggerLeg] = []
+
+    def __len__(self):
+        return len(self._legs)
+
+    def add(self, leg: TriggerLeg):
+        index = bisect.bisect_right(self._prices, leg.price)
+        self._prices.insert(index, leg.price)
+        self._legs.insert(index, leg)
+
+    def remove(self, leg: TriggerLeg):
+        index = bisect.bisect_left(self._prices, leg.price)
+        while index < len(self._prices) and self._prices[index] == leg.price:
+            if self._legs[index] is leg:
+                del self._prices[index]
+                del self._legs[index]
+                return
+            index += 1
+
+    def pop_crossed(self, price: float) -> typing.List[TriggerLeg]:
+        """
+        Removes and returns the legs crossed by `price`, found by bisection
+        """
+        if self.direction == TriggerDirection.ABOVE:
+            index = bisect.bisect_right(self._prices, price)
+            crossed = self._legs[:index]
+            del self._prices[:index]
+            del self._legs[:index]
+        else:
+            index = bisect.bisect_left(self._prices, price)
+            crossed = self._legs[index:]
+            del self._prices[index:]
+            del self._legs[index:]
+        return crossed
+
+
+class TriggerEngine:
+    """
+    Local conditional orders. Legs are indexed by symbol in sorted `PriceLevels`, so a ticker update only
+    visits the levels it crossed. A conditional order fires once all of its legs were crossed.
+    Orders are only kept in memory: the ones still pending when the account disconnects are lost
+    """
+    _levels: typing.Dict[typing.Tuple[str, StopTriggerType, TriggerDirection], PriceLevels]
+    _orders: typing.Dict[str, ConditionalOrder]
+
+    def __init__(self, on_trigger: typing.Callable[[ConditionalOrder, float], None]):
+        self._on_trigger = on_trigger
+        self._levels = {}
+        self._orders = {}
+
+    def __len__(self):
+        return len(self._orders)
+
+    @property
+    def pending(self) -> typing.List[ConditionalOrder]:
+        return list(self._orders.values())
+
+    def add(self, order: ConditionalOrder):
+        self._orders[order.id] = order
+        for leg in order.legs:
+            key = (leg.symbol, leg.price_type, leg.direction)
+            levels = self._levels.get(key)
+            if not levels:
+                levels = self._levels[key] = PriceLevels(leg.direction)
+            levels.add(leg)
+
+        conditional_orders_armed.inc(symbol=order.symbol)
+        logger.info({
+            "event": "TriggerEngine.add",
+            "order_id": order.id,
+            "client_order_id": order.client_order_id,
+            "legs": order.legs,
+            "timestamp": datetime.now(),
+        })
+
+    def cancel_by_client_order_id_prefix(self, prefix: str) -> typing.List[ConditionalOrder]:
+        canceled = [order for order in self._orders.values() if order.client_order_id.startswith(prefix)]
+        for order in canceled:
+            self._remove(order)
+        return canceled
+
+    def on_ticker(self, symbol: str, ticker: dict):
+        triggered_at = time.monotonic()
+
+        for price_type, field in TICKER_PRICE_FIELDS.items():
+            price = ticker.get(field)
+            if price is None:
+                continue
+
+            for direction in TriggerDirection:
+                levels = self._levels.get((symbol, price_type, direction))
+                if not levels:
+                    continue
+
+                for leg in levels.pop_crossed(price):
+                    leg.satisfied = True
+                    self._fire_if_satisfied(leg.order_id, triggered_at)
+
+    def _fire_if_satisfied(self, order_id: str, triggered_at: float):
+        order = self._orders.get(order_id)
+        if not order or not all(leg.satisfied for leg in order.legs):
+            return
+
+        self._remove(order)
+        conditional_orders_triggered.inc(symbol=order.symbol)
+        self._on_trigger(order, triggered_at)
+
+    def _remove(self, order: ConditionalOrder):
+        self._orders.pop(order.id, None)
+        for leg in order.legs:
+            levels = self._levels.get((leg.symbol, leg.price_type, leg.direction))
+            if levels and not leg.satisfied:
+                levels.remove(leg)
@@ -0,0 +1,74 @@
+import logging
+import typing
+from datetime import datetime
+
+import watchtower
+
+from nexus_bitmex_node import settings
+from nexus_bitmex_node.exceptions import PreTradeValidationError
+from nexus_bitmex_node.instrument_specs import instrument_specs, InstrumentSpec, Rounding
+from nexus_bitmex_node.metrics import metrics
+from nexus_bitmex_node.models.order import BitmexOrder, OrderSide, OrderType
+from nexus_bitmex_node.models.symbol import BitmexSymbol, create_symbol
+
+logger = logging.getLogger(__name__)
+logger.addHandler(watchtower.CloudWatchLogHandler(log_group="nexus-bitmex-node", stream_name=settings.app_env))
+
+pre_trade_rejections = metrics.counter("pre_trade_rejections_total", "Orders rejected locally before submission")
+
+# One satoshi, absorbs float rounding when the whole available margin is spent
+MARGIN_TOLERANCE = 1e-8
+
+
+def _reject(order: BitmexOrder, reason: str, message: str):
+    pre_trade_rejections.inc(symbol=order.symbol, reason=reason)
+    logger.info({
+        "event": "validate_order.rejected",
+        "order": order,
+        "reason": reason,
+        "error": message,
+        "timestamp": datetime.now(),
+    })
+    raise PreTradeValidationError(message)
+
+
+def validate_order(order: BitmexOrder, ticker: dict, quantity: float, price: float,
+                   margin: float) -> typing.Tuple[int, float]:
+    """
+    Normalizes an order to the instrument's lot size and tick grid, and rejects it locally
+    when Bitmex would reject it anyway
+    :param ticker: stored instrument data of the order's symbol
+    :param quantity: contracts computed from the order percent
+    :param price: limit price, or the reference price of a market order
+    :param margin: available margin in the instrument's settlement currency
+    :return: the quantity and price to submit
+    :raises PreTradeValidationError:
+    """
+    symbol: BitmexSymbol = create_symbol(ticker)
+    spec: InstrumentSpec = instrument_specs.get(symbol)
+
+    if not symbol.is_open:
+        _reject(order, "instrument_closed", f"Instrument {symbol.symbol} is not open for trading")
+
+    quantity = int(spec.round_quantity(quantity))
+    if quantity <= 0:
+        _reject(order, "quantity_below_lot_size", f"Order quantity is below the lot size of {spec.lot_size}")
+    if symbol.max_order_qty and quantity > symbol.max_order_qty:
+        _reject(order, "quantity_above_max",
+                f"Order quantity {quantity} is above the maximum order quantity of {symbol.max_order_qty:g}")
+
+    if order.order_type != OrderType.MARKET:
+        if not price or price <= 0:
+            _reject(order, "invalid_price", "Invalid price")
+        # Never rounds to a worse price than requested
+        price = spec.round_price(price, Rounding.FLOOR if order.side == OrderSide.BUY else Rounding.CEILING)
+        if symbol.max_price and price > symbol.max_price:
+            _reject(order, "price_above_max", f"Price {price:g} is above the maximum price of {symbol.max_price:g}")
+
+    required_margin = quantity * BitmexOrder.get_contract_value(ticker, price) / (order.leverage or 1)
+    if required_margin > (margin or 0) + MARGIN_TOLERANCE:
+        _reject(order, "insufficient_margin",
+                f"Account has insufficient Available Balance, {required_margin:.8f} "
+                f"{(symbol.currency or '').upper()} required")
+
+    return quantity, price
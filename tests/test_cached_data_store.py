@@ -0,0 +1,133 @@
+import asyncio
+
+import aioredis
+
+from nexus_bitmex_node.event_bus import EventBus
+from nexus_bitmex_node.storage.cached import MISSING, CachedDataStore, VersionedCache
+
+TICKER = {"symbol": "XBTUSD", "currency": "XBt", "lastPrice": 50000}
+
+
+class FakeStore:
+    def __init__(self):
+        self.tickers = {}
+        self.positions = {}
+        self.reads = []
+        self.read_started = asyncio.Event()
+        self.read_released = asyncio.Event()
+        self.read_released.set()
+
+    async def get_ticker(self, client_key: str, symbol: str):
+        self.reads.append(("tickers", symbol))
+        self.read_started.set()
+        value = self.tickers.get(symbol)
+        await self.read_released.wait()
+        return value
+
+    async def get_position(self, client_key: str, symbol: str):
+        self.reads.append(("positions", symbol))
+        return self.positions.get(symbol)
+
+    async def save_tickers(self, client_key: str, data: dict):
+        self.tickers.update(data)
+
+
+class FakeChannel:
+    def __init__(self):
+        self.names: asyncio.Queue = asyncio.Queue()
+        self._name = None
+
+    async def wait_message(self):
+        self._name = await self.names.get()
+        return True
+
+    async def get(self, encoding=None):
+        return self._name, b"hset"
+
+
+class FakeConnection:
+    def __init__(self, channel: FakeChannel):
+        self._channel = channel
+
+    async def psubscribe(self, pattern: str):
+        return [self._channel]
+
+    def close(self):
+        pass
+
+
+def test_a_value_read_before_an_invalidation_is_not_stored():
+    cache = VersionedCache()
+    version = cache.version("bitmex:1:tickers", "XBTUSD")
+
+    cache.invalidate("bitmex:1:tickers", ["XBTUSD"])
+    cache.put("bitmex:1:tickers", "XBTUSD", TICKER, version)
+    assert cache.get("bitmex:1:tickers", "XBTUSD") is MISSING
+
+    version = cache.version("bitmex:1:tickers", "XBTUSD")
+    cache.invalidate_group("bitmex:1:tickers")
+    cache.put("bitmex:1:tickers", "XBTUSD", TICKER, version)
+    assert cache.get("bitmex:1:tickers", "XBTUSD") is MISSING
+
+
+def test_a_read_racing_a_write_does_not_cache_the_old_value():
+    async def scenario():
+        store = FakeStore()
+        store.tickers["XBTUSD"] = dict(TICKER)
+        data_store = CachedDataStore(EventBus(), store)
+
+        store.read_released.clear()
+        read = asyncio.ensure_future(data_store.get_ticker("1", "XBTUSD"))
+        await store.read_started.wait()
+        await data_store.save_tickers("1", {"XBTUSD": dict(TICKER, lastPrice=51000)})
+        store.read_released.set()
+
+        assert (await read)["lastPrice"] == 50000
+        assert (await data_store.get_ticker("1", "XBTUSD"))["lastPrice"] == 51000
+        assert len(store.reads) == 2
+
+    asyncio.run(scenario())
+
+
+def test_missing_tickers_are_read_again_but_missing_positions_are_cached():
+    async def scenario():
+        store = FakeStore()
+        data_store = CachedDataStore(EventBus(), store)
+
+        for _ in range(2):
+            assert await data_store.get_ticker("1", "XBTUSD") is None
+            assert await data_store.get_position("1", "XBTUSD") is None
+
+        assert store.reads == [("tickers", "XBTUSD"), ("positions", "XBTUSD"), ("tickers", "XBTUSD")]
+
+    asyncio.run(scenario())
+
+
+def test_keyspace_notifications_invalidate_the_written_hash(monkeypatch):
+    async def scenario():
+        store = FakeStore()
+        store.tickers["XBTUSD"] = dict(TICKER)
+        store.positions["XBTUSD"] = {"symbol": "XBTUSD"}
+        data_store = CachedDataStore(EventBus(), store, keyspace_events=True)
+        channel = FakeChannel()
+
+        async def create_redis(url, encoding=None):
+            return FakeConnection(channel)
+
+        monkeypatch.setattr(aioredis, "create_redis", create_redis)
+        watch = asyncio.ensure_future(data_store._watch_keyspace("redis://test"))
+        await asyncio.sleep(0)
+
+        await data_store.get_ticker("1", "XBTUSD")
+        await data_store.get_position("1", "XBTUSD")
+        channel.names.put_nowait("__keyspace@0__:bitmex:1:tickers")
+        while not channel.names.empty():
+            await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        await data_store.get_ticker("1", "XBTUSD")
+        await data_store.get_position("1", "XBTUSD")
+
+        watch.cancel()
+        assert store.reads == [("tickers", "XBTUSD"), ("positions", "XBTUSD"), ("tickers", "XBTUSD")]
+
+    asyncio.run(scenario())
@@ -0,0 +1,147 @@
+import asyncio
+import json
+
+from nexus_bitmex_node.event_bus import EventBus
+from nexus_bitmex_node.models.position import create_position
+from nexus_bitmex_node.storage.change_log import ChangeKind, ChangeLog, change_log_key
+from nexus_bitmex_node.storage.redis import RedisDataStore
+
+
+class FakeTransaction:
+    def __init__(self, client: "FakeRedis", atomic: bool):
+        self._client = client
+        self._atomic = atomic
+        self._commands = []
+
+    def hmset_dict(self, key, fields):
+        self._commands.append(("hmset_dict", key, dict(fields)))
+
+    def xadd(self, key, fields, max_len=None):
+        self._commands.append(("xadd", key, dict(fields), max_len))
+
+    async def execute(self):
+        await asyncio.sleep(0)
+        if self._client.failures:
+            self._client.failures -= 1
+            raise ConnectionError("Connection lost")
+        self._client.executed.append((self._atomic, self._commands))
+
+
+class FakeRedis:
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.executed = []
+        self.scripts = {}
+        self.calls = []
+
+    def pipeline(self):
+        return FakeTransaction(self, atomic=False)
+
+    def multi_exec(self):
+        return FakeTransaction(self, atomic=True)
+
+    async def script_load(self, source):
+        sha = f"sha{len(self.scripts)}"
+        self.scripts[sha] = source
+        return sha
+
+    async def evalsha(self, sha, keys, args):
+        self.calls.append((self.scripts[sha], keys, args))
+        return 1
+
+
+def create_test_store(client: FakeRedis, change_log: bool = True) -> RedisDataStore:
+    store = RedisDataStore(EventBus())
+    store._client = client
+    store._changes = ChangeLog(client, max_len=100) if change_log else None
+    return store
+
+
+def test_records_are_written_with_the_state_in_one_transaction():
+    async def scenario():
+        client = FakeRedis()
+        position = create_position({"symbol": "XBTUSD", "currentQty": 100, "leverage": None})
+
+        appended = await ChangeLog(client, max_len=100).append(
+            "1", ChangeKind.POSITION, [("XBTUSD", position)], writes={"bitmex:1:positions": {"XBTUSD": "{}"}})
+
+        assert appended
+        (atomic, commands), = client.executed
+        assert atomic
+        assert [command[0] for command in commands] == ["hmset_dict", "xadd"]
+        _, key, record, max_len = commands[1]
+        assert (key, max_len) == (change_log_key("1"), 100)
+        assert record["kind"] == ChangeKind.POSITION and record["id"] == "XBTUSD"
+        assert json.loads(record["data"]) == {"symbol": "XBTUSD", "current_quantity": 100}
+
+    asyncio.run(scenario())
+
+
+def test_a_failed_transaction_writes_neither_the_state_nor_the_record():
+    async def scenario():
+        client = FakeRedis(failures=1)
+        position = create_position({"symbol": "XBTUSD", "currentQty": 100})
+
+        appended = await ChangeLog(client).append(
+            "1", ChangeKind.POSITION, [("XBTUSD", position)], writes={"bitmex:1:positions": {"XBTUSD": "{}"}})
+
+        assert not appended
+        assert client.executed == []
+
+    asyncio.run(scenario())
+
+
+def test_position_records_are_appended_by_the_merge_script():
+    async def scenario():
+        client = FakeRedis()
+        store = create_test_store(client)
+
+        await store.save_positions("1", [{"symbol": "XBTUSD", "currentQty": 100}, {"symbol": "ETHUSD"}])
+
+        (source, keys, args), = client.calls
+        assert source == store._merge_positions.source
+        assert keys == ["bitmex:1:positions", change_log_key("1")]
+        assert args[:2] == [ChangeKind.POSITION, 100]
+        symbols, records = args[2::3], args[4::3]
+        assert symbols == ["XBTUSD", "ETHUSD"]
+        assert [json.loads(record) for record in records] == [
+            {"symbol": "XBTUSD", "current_quantity": 100},
+            {"symbol": "ETHUSD"},
+        ]
+        # No write outside the script
+        assert client.executed == []
+
+    asyncio.run(scenario())
+
+
+def test_trade_records_are_appended_by_the_merge_script():
+    async def scenario():
+        client = FakeRedis()
+        store = create_test_store(client)
+
+        await store.save_trades("1", [{"info": {"orderID": "o1", "symbol": "XBTUSD", "ordStatus": "Filled"}}])
+
+        (source, keys, args), = client.calls
+        assert source == store._merge_trades.source
+        assert keys == ["bitmex:1:trades", "bitmex:1:trades:index", change_log_key("1")]
+        assert args[:2] == [ChangeKind.TRADE, 100]
+        order_id, _, _, record = args[2:]
+        assert order_id == "o1"
+        assert json.loads(record)["order_status"] == "Filled"
+        assert client.executed == []
+
+    asyncio.run(scenario())
+
+
+def test_merge_scripts_get_no_stream_when_the_change_log_is_off():
+    async def scenario():
+        client = FakeRedis()
+        store = create_test_store(client, change_log=False)
+
+        await store.save_positions("1", [{"symbol": "XBTUSD", "currentQty": 100}])
+
+        (_, keys, args), = client.calls
+        assert keys == ["bitmex:1:positions"]
+        assert args[2:] == ["XBTUSD", args[3], ""]
+
+    asyncio.run(scenario())
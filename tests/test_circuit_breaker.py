@@ -0,0 +1,128 @@
+import asyncio
+import time
+
+import pytest
+from ccxt import ExchangeNotAvailable, InvalidOrder, RequestTimeout
+
+from nexus_bitmex_node.bitmex_client import BitmexClient
+from nexus_bitmex_node.circuit_breaker import CircuitBreaker, CircuitState
+from nexus_bitmex_node.exceptions import CircuitOpenError
+from nexus_bitmex_node.rate_limit import RateLimitScheduler
+
+
+def create_test_breaker(open_seconds: float = 0.02) -> CircuitBreaker:
+    return CircuitBreaker("test", failure_rate=0.5, min_requests=4, window=30, open_seconds=open_seconds)
+
+
+def fail(breaker: CircuitBreaker, times: int, error: Exception = None):
+    for _ in range(times):
+        breaker.record_error(breaker.before_request(), error or ExchangeNotAvailable("503"))
+
+
+def open_breaker() -> CircuitBreaker:
+    breaker = create_test_breaker()
+    fail(breaker, 4)
+    assert breaker.state == CircuitState.OPEN
+    return breaker
+
+
+def half_open_breaker() -> CircuitBreaker:
+    breaker = open_breaker()
+    time.sleep(breaker.open_seconds)
+    assert breaker.state == CircuitState.HALF_OPEN
+    return breaker
+
+
+def test_opens_at_the_failure_rate_once_enough_requests_were_seen():
+    breaker = create_test_breaker()
+
+    fail(breaker, 3)
+    assert breaker.state == CircuitState.CLOSED
+
+    breaker.record_success(breaker.before_request())
+    fail(breaker, 1)
+    assert breaker.state == CircuitState.OPEN
+
+
+def test_rejected_requests_do_not_count_as_failures():
+    breaker = create_test_breaker()
+
+    fail(breaker, 10, InvalidOrder("Invalid orderQty"))
+
+    assert breaker.state == CircuitState.CLOSED
+    assert breaker.snapshot()["failures"] == 0
+
+
+def test_open_circuit_fails_fast():
+    breaker = open_breaker()
+
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+
+def test_half_open_circuit_admits_one_probe():
+    breaker = half_open_breaker()
+
+    breaker.before_request()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+
+@pytest.mark.parametrize("error, state", [(None, CircuitState.CLOSED), (RequestTimeout("timeout"), CircuitState.OPEN)])
+def test_probe_outcome_closes_or_reopens(error, state):
+    breaker = half_open_breaker()
+
+    probe = breaker.before_request()
+    if error:
+        breaker.record_error(probe, error)
+    else:
+        breaker.record_success(probe)
+
+    assert breaker.state == state
+
+
+def test_late_results_of_closed_requests_do_not_change_a_half_open_circuit():
+    breaker = create_test_breaker()
+    slow_request = breaker.before_request()
+    fail(breaker, 4)
+    time.sleep(breaker.open_seconds)
+    assert breaker.state == CircuitState.HALF_OPEN
+
+    probe = breaker.before_request()
+    breaker.record_success(slow_request)
+    assert breaker.state == CircuitState.HALF_OPEN
+
+    breaker.record_error(probe, ExchangeNotAvailable("503"))
+    assert breaker.state == CircuitState.OPEN
+
+
+def test_released_probe_frees_its_slot():
+    breaker = half_open_breaker()
+
+    breaker.release(breaker.before_request())
+
+    breaker.record_success(breaker.before_request())
+    assert breaker.state == CircuitState.CLOSED
+
+
+def test_check_does_not_take_the_probe_slot():
+    breaker = half_open_breaker()
+
+    breaker.check()
+    breaker.before_request()
+
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+
+def test_open_circuit_fails_fast_without_taking_a_rate_limit_token():
+    async def scenario():
+        scheduler = RateLimitScheduler(limit=10, period=60)
+        client = BitmexClient(scheduler=scheduler, circuit_breaker=open_breaker())
+
+        with pytest.raises(CircuitOpenError):
+            await client.fetch2("order", "private", "POST")
+
+        assert scheduler.tokens == 10
+
+    asyncio.run(scenario())
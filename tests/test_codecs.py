@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from nexus_bitmex_node.storage.codecs import BINARY_FORMAT_VERSION, TICKER_SCHEMA, BinaryCodec, JsonCodec, \
+    create_codec, decode_value
+
+TICKER = {
+    "symbol": "XBTUSD",
+    "state": "Open",
+    "currency": "XBt",
+    "underlying": "XBT",
+    "quote_currency": "USD",
+    "mark_price": 50000.5,
+    "lot_size": 100,
+    "max_price": 1000000,
+    "max_order_qty": 10000000,
+    "tick_size": 0.5,
+    "last_price_protected": 50000.0,
+    "multiplier": -100000000,
+    "is_quanto": False,
+    "is_inverse": True,
+    "underlying_to_settle_multiplier": -100000000,
+}
+
+
+def test_tickers_round_trip_and_numbers_keep_their_type():
+    encoded = BinaryCodec(TICKER_SCHEMA).encode(TICKER)
+
+    assert isinstance(encoded, bytes)
+    assert encoded[0] == BINARY_FORMAT_VERSION
+    decoded = decode_value(encoded)
+    assert decoded == TICKER
+    assert [type(decoded[field]) for field in TICKER] == [type(value) for value in TICKER.values()]
+
+
+def test_null_and_missing_fields_are_decoded_as_null():
+    ticker = dict(TICKER, state=None, mark_price=None, is_quanto=None)
+    del ticker["multiplier"]
+
+    encoded = BinaryCodec(TICKER_SCHEMA).encode(ticker)
+
+    assert decode_value(encoded) == dict(ticker, multiplier=None)
+    assert len(encoded) < len(BinaryCodec(TICKER_SCHEMA).encode(TICKER))
+
+
+def test_integers_outside_int64_are_stored_as_floats():
+    encoded = BinaryCodec(TICKER_SCHEMA).encode(dict(TICKER, max_order_qty=1 << 64))
+
+    assert decode_value(encoded)["max_order_qty"] == float(1 << 64)
+
+
+def test_data_with_fields_outside_the_schema_is_stored_as_json():
+    ticker = dict(TICKER, fundingRate=0.0001)
+
+    encoded = BinaryCodec(TICKER_SCHEMA).encode(ticker)
+
+    assert json.loads(encoded) == ticker
+    assert decode_value(encoded) == ticker
+
+
+def test_json_values_are_decoded_from_strings_and_bytes():
+    encoded = JsonCodec().encode(TICKER)
+
+    assert decode_value(encoded) == TICKER
+    assert decode_value(encoded.encode("utf-8")) == TICKER
+
+
+def test_an_unknown_format_version_is_rejected():
+    encoded = BinaryCodec(TICKER_SCHEMA).encode(TICKER)
+
+    with pytest.raises(ValueError, match="Unknown stored format version"):
+        decode_value(bytes((BINARY_FORMAT_VERSION + 1,)) + encoded[1:])
+
+
+def test_create_codec():
+    assert isinstance(create_codec("binary", TICKER_SCHEMA), BinaryCodec)
+    assert isinstance(create_codec("json", TICKER_SCHEMA), JsonCodec)
+    with pytest.raises(ValueError, match="Unknown data codec"):
+        create_codec("msgpack", TICKER_SCHEMA)
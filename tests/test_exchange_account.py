@@ -0,0 +1,41 @@
+import asyncio
+
+from nexus_bitmex_node.bitmex import BitmexManager
+from nexus_bitmex_node.event_bus import EventBus
+from nexus_bitmex_node.exchange_account import ExchangeAccount
+from nexus_bitmex_node.storage.local import LocalDataStore
+from nexus_bitmex_node.triggers import create_conditional_order
+
+
+def create_test_account() -> ExchangeAccount:
+    return ExchangeAccount(EventBus(), LocalDataStore(EventBus()), "1", "key", "secret")
+
+
+def arm_conditional_order(account: ExchangeAccount, message_id: str, client_order_id: str):
+    account._triggers.add(create_conditional_order(message_id, {"orders": {"main": {
+        "symbol": "XBTUSD",
+        "clOrderId": client_order_id,
+        "triggers": [{"price": 100, "direction": "ABOVE"}],
+    }}}))
+
+
+def test_cancel_by_client_order_id_keeps_orders_of_longer_ids(monkeypatch):
+    prefixes = []
+
+    async def cancel_orders_by_cl_ord_id_prefix(client, prefix):
+        prefixes.append(prefix)
+        return []
+
+    monkeypatch.setattr(BitmexManager, "cancel_orders_by_cl_ord_id_prefix", cancel_orders_by_cl_ord_id_prefix)
+
+    async def scenario():
+        account = create_test_account()
+        arm_conditional_order(account, "1", "c1_main")
+        arm_conditional_order(account, "10", "c10_main")
+
+        await account._on_cancel_orders("m1", {"accountId": "1", "clOrderId": "c1"})
+
+        assert prefixes == ["c1_"]
+        assert [order.id for order in account._triggers.pending] == ["10"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,179 @@
+import asyncio
+
+from nexus_bitmex_node.execution import ExecutionScheduler, ExecutionSpec, ExecutionStatus, ExecutionType, \
+    TimerWheel, create_execution_state
+from nexus_bitmex_node.models.order import BitmexOrder, OrderSide, OrderType
+from nexus_bitmex_node.rate_limit import RateLimitScheduler
+
+TICKER = {
+    "symbol": "XBTUSD",
+    "state": "Open",
+    "currency": "XBt",
+    "underlying": "XBT",
+    "quote_currency": "USD",
+    "mark_price": 50000,
+    "last_price_protected": 50000,
+    "lot_size": 100,
+    "tick_size": 0.5,
+    "max_price": 1000000,
+    "max_order_qty": 10000000,
+}
+
+
+class FakeExchange:
+    def __init__(self):
+        self.placed = []
+        self.canceled = []
+        self.progress = []
+
+    async def place_slice(self, state, quantity, cl_ord_id):
+        self.placed.append((cl_ord_id, quantity))
+        return {}
+
+    async def cancel_slices(self, state, cl_ord_ids):
+        self.canceled.extend(cl_ord_ids)
+
+    async def on_progress(self, state):
+        self.progress.append(state.status)
+
+
+def create_test_scheduler(exchange: FakeExchange, wheel: TimerWheel) -> ExecutionScheduler:
+    return ExecutionScheduler(wheel, RateLimitScheduler(), 1, exchange.place_slice, exchange.on_progress,
+                              cancel_slices=exchange.cancel_slices)
+
+
+def create_test_state(spec: ExecutionSpec, total_qty: int = 1000, message_id: str = "m1"):
+    order = BitmexOrder(id=1, client_order_id="c1_main", symbol="XBTUSD", side=OrderSide.BUY,
+                        order_type=OrderType.LIMIT, close_order=False, percent=10, leverage=1, price=50000,
+                        stop_price=None, stop_trigger_type=None, trailing_stop_percent=None)
+    return create_execution_state(message_id, order, spec, TICKER, 1, total_qty)
+
+
+async def advance(wheel: TimerWheel, ticks: int = 1):
+    for _ in range(ticks):
+        wheel._advance()
+        # Let the dispatched slices run
+        for _ in range(3):
+            await asyncio.sleep(0)
+
+
+def fill(cl_ord_id: str, quantity: int, price: float = 50000) -> dict:
+    return {"info": {"clOrdID": cl_ord_id, "ordStatus": "Filled", "cumQty": quantity, "avgPx": price}}
+
+
+def test_twap_slices_round_up_to_the_lot_size_and_the_last_slice_takes_the_rest():
+    async def scenario():
+        exchange = FakeExchange()
+        wheel = TimerWheel(tick=0.01, slots=8)
+        scheduler = create_test_scheduler(exchange, wheel)
+        state = create_test_state(ExecutionSpec(type=ExecutionType.TWAP, slices=3, duration=0.03))
+
+        await scheduler.start(state)
+        assert [quantity for _, quantity in exchange.placed] == [400]
+
+        await advance(wheel, 2)
+        assert [quantity for _, quantity in exchange.placed] == [400, 400, 200]
+        assert len(wheel) == 0
+
+        for cl_ord_id, quantity in exchange.placed:
+            await scheduler.on_order_update(fill(cl_ord_id, quantity))
+
+        assert state.status == ExecutionStatus.DONE
+        assert state.filled_qty == 1000
+        assert "m1" not in scheduler
+
+    asyncio.run(scenario())
+
+
+def test_iceberg_places_the_next_slice_once_the_visible_one_filled():
+    async def scenario():
+        exchange = FakeExchange()
+        wheel = TimerWheel(tick=0.01, slots=8)
+        scheduler = create_test_scheduler(exchange, wheel)
+        state = create_test_state(ExecutionSpec(type=ExecutionType.ICEBERG, visible_qty=250))
+
+        await scheduler.start(state)
+        for number in range(5):
+            assert len(exchange.placed) == number + 1
+            cl_ord_id, quantity = exchange.placed[-1]
+            await scheduler.on_order_update(fill(cl_ord_id, quantity))
+            await advance(wheel)
+
+        assert [quantity for _, quantity in exchange.placed] == [200] * 5
+        assert state.status == ExecutionStatus.DONE
+
+    asyncio.run(scenario())
+
+
+def test_cancel_stops_the_parent_order_and_cancels_its_live_slices():
+    async def scenario():
+        exchange = FakeExchange()
+        wheel = TimerWheel(tick=0.01, slots=8)
+        scheduler = create_test_scheduler(exchange, wheel)
+        state = create_test_state(ExecutionSpec(type=ExecutionType.TWAP, slices=3, duration=0.03))
+
+        await scheduler.start(state)
+        await scheduler.on_order_update(fill(exchange.placed[0][0], 400))
+        await advance(wheel)
+
+        assert await scheduler.cancel("m1") is state
+        assert await scheduler.cancel("m1") is None
+        assert state.status == ExecutionStatus.CANCELED
+        assert exchange.canceled == [exchange.placed[1][0]]
+
+        # The slice already on the wheel does not place anything
+        await advance(wheel, 8)
+        assert len(exchange.placed) == 2
+
+    asyncio.run(scenario())
+
+
+def test_a_slice_canceled_on_the_exchange_stops_the_parent_order():
+    async def scenario():
+        exchange = FakeExchange()
+        wheel = TimerWheel(tick=0.01, slots=8)
+        scheduler = create_test_scheduler(exchange, wheel)
+        state = create_test_state(ExecutionSpec(type=ExecutionType.TWAP, slices=2, duration=0.02))
+
+        await scheduler.start(state)
+        await advance(wheel)
+        first, second = (cl_ord_id for cl_ord_id, _ in exchange.placed)
+
+        await scheduler.on_order_update({"info": {"clOrdID": first, "ordStatus": "Canceled", "cumQty": 0}})
+
+        assert state.status == ExecutionStatus.CANCELED
+        assert exchange.canceled == [second]
+        assert "m1" not in scheduler
+
+    asyncio.run(scenario())
+
+
+def test_updates_of_unknown_orders_are_ignored():
+    async def scenario():
+        exchange = FakeExchange()
+        scheduler = create_test_scheduler(exchange, TimerWheel())
+
+        await scheduler.on_order_update({"info": {"clOrdID": "c9_main", "ordStatus": "Filled"}})
+        await scheduler.on_order_update({"info": {}})
+        await scheduler.on_order_update({})
+
+        assert exchange.progress == []
+
+    asyncio.run(scenario())
+
+
+def test_timer_wheel_fires_callbacks_after_their_delay_across_rounds():
+    wheel = TimerWheel(tick=1, slots=4)
+    fired = []
+    wheel.schedule(1, lambda: fired.append("a"))
+    wheel.schedule(2.5, lambda: fired.append("b"))
+    # More ticks than slots: the timer waits for a second round of the wheel
+    wheel.schedule(6, lambda: fired.append("c"))
+
+    ticks = []
+    for _ in range(7):
+        wheel._advance()
+        ticks.append(list(fired))
+
+    assert ticks == [["a"], ["a"], ["a", "b"], ["a", "b"], ["a", "b"], ["a", "b", "c"], ["a", "b", "c"]]
+    assert len(wheel) == 0
@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+from nexus_bitmex_node import settings
+from nexus_bitmex_node.event_bus import EventBus
+from nexus_bitmex_node.models.trade import create_trade
+from nexus_bitmex_node.storage.local import LocalDataStore
+
+
+def create_test_trade(order_id: str, status: str = "Filled") -> dict:
+    return {
+        "orderID": order_id, "symbol": "XBTUSD", "side": "Buy", "ordType": "Limit", "ordStatus": status,
+        "orderQty": 100, "cumQty": 100, "avgPx": 50000.0, "clOrdID": f"c{order_id}", "clOrdLinkID": None,
+        "pegPriceType": None, "pegOffsetValue": None, "text": None, "stopPx": None,
+    }
+
+
+def stored_trade(order_id: str) -> str:
+    return create_trade(create_test_trade(order_id)).to_json()
+
+
+def test_loaded_trades_follow_the_stored_index():
+    async def scenario():
+        store = LocalDataStore(EventBus())
+        await store.start()
+        await store.save_trades("1", [create_test_trade("new")])
+
+        store.load("bitmex:1:trades", {order_id: stored_trade(order_id) for order_id in ("b", "a", "c")},
+                   {"a": 1000, "b": 2000})
+
+        trades = store._client.table("bitmex:1:trades")
+        # Unindexed trades are the oldest, trades updated since the export the newest
+        assert list(trades.entries) == ["c", "a", "b", "new"]
+        assert trades.updated_at["a"] == 1.0
+        assert [trade.order_id for trade in await store.get_trades_page("1", limit=2)] == ["new", "b"]
+
+    asyncio.run(scenario())
+
+
+def test_compaction_skips_a_full_batch_of_open_trades(monkeypatch):
+    monkeypatch.setattr(settings, "TRADE_RETENTION_COUNT", 2)
+    monkeypatch.setattr(settings, "TRADE_RETENTION_AGE", 0)
+    monkeypatch.setattr(settings, "TRADE_COMPACTION_BATCH", 2)
+
+    async def scenario():
+        store = LocalDataStore(EventBus())
+        await store.start()
+        for order_id, status in (("1", "New"), ("2", "New"), ("3", "Filled"), ("4", "Filled")):
+            await store.save_trades("1", [create_test_trade(order_id, status)])
+
+        # The oldest batch is open, the filled trades after it are removed
+        assert set(await store.get_trades("1")) == {"1", "2"}
+
+    asyncio.run(scenario())
+
+
+def test_trades_are_kept_without_retention_limits(monkeypatch):
+    monkeypatch.setattr(settings, "TRADE_RETENTION_COUNT", 0)
+    monkeypatch.setattr(settings, "TRADE_RETENTION_AGE", 0)
+
+    async def scenario():
+        store = LocalDataStore(EventBus())
+        await store.start()
+        await store.save_trades("1", [create_test_trade(str(order_id)) for order_id in range(5)])
+
+        assert len(await store.get_trades("1")) == 5
+
+    asyncio.run(scenario())
+
+
+def test_trades_over_the_retention_age_are_removed(monkeypatch):
+    monkeypatch.setattr(settings, "TRADE_RETENTION_COUNT", 0)
+    monkeypatch.setattr(settings, "TRADE_RETENTION_AGE", 60)
+
+    async def scenario():
+        store = LocalDataStore(EventBus())
+        await store.start()
+        store.load("bitmex:1:trades", {order_id: stored_trade(order_id) for order_id in ("old", "new")},
+                   {"old": 1000, "new": time.time() * 1000})
+        await store.save_trades("1", [create_test_trade("newest")])
+
+        assert set(await store.get_trades("1")) == {"new", "newest"}
+
+    asyncio.run(scenario())
@@ -0,0 +1,53 @@
+import asyncio
+import json
+
+import pytest
+
+from nexus_bitmex_node.exceptions import WrongOrderError
+from nexus_bitmex_node.queues.order.helpers import handle_cancel_order_message, is_bulk_cancel_message
+
+
+class FakeMessage:
+    def __init__(self, data):
+        self.body = json.dumps(data).encode("utf-8")
+
+
+def cancel_order_message(**data) -> dict:
+    return asyncio.run(handle_cancel_order_message(FakeMessage({"accountId": "1", **data})))
+
+
+@pytest.mark.parametrize("data, bulk", [
+    ({"orderId": "1"}, False),
+    ({"orderId": "1", "clOrderId": "c1"}, False),
+    ({"clOrderId": "c1"}, True),
+    ({"clOrderIdPrefix": "c1_"}, True),
+    ({"orderIds": ["1", "2"]}, True),
+    ({"cancelAll": True, "symbol": "XBTUSD"}, True),
+    ({"cancelAllAfter": "60000"}, True),
+])
+def test_bulk_cancel_messages_go_to_cancel_orders(data, bulk):
+    assert is_bulk_cancel_message(cancel_order_message(**data)) == bulk
+
+
+def test_cancel_all_after_is_parsed_as_milliseconds():
+    assert cancel_order_message(cancelAllAfter="60000")["cancelAllAfter"] == 60000
+
+
+@pytest.mark.parametrize("data", [
+    {"cancelAllAfter": "soon"},
+    {"cancelAllAfter": [60000]},
+    {"orderId": 1},
+    {"clOrderIdPrefix": ["c1_"]},
+    {"orderIds": "1,2"},
+    {"orderIds": ["1", 2]},
+    {},
+])
+def test_invalid_cancel_messages_are_rejected(data):
+    with pytest.raises(WrongOrderError):
+        cancel_order_message(**data)
+
+
+@pytest.mark.parametrize("body", [{"orderId": "1"}, ["1"]])
+def test_cancel_messages_require_an_account(body):
+    with pytest.raises(WrongOrderError):
+        asyncio.run(handle_cancel_order_message(FakeMessage(body)))
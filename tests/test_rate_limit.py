@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+from nexus_bitmex_node.rate_limit import RateLimitScheduler, RequestPriority, _to_int, request_priority
+
+
+@pytest.mark.parametrize("path, method, priority", [
+    ("order", "POST", RequestPriority.ORDER),
+    ("order/bulk", "PUT", RequestPriority.ORDER),
+    ("order", "GET", RequestPriority.READ),
+    ("position/leverage", "POST", RequestPriority.ACCOUNT),
+])
+def test_request_priority(path, method, priority):
+    assert request_priority(path, method) == priority
+
+
+@pytest.mark.parametrize("value, expected", [("12", 12), ("7.9", 7), (3, 3), (None, None), ("", None), ("x", None)])
+def test_to_int(value, expected):
+    assert _to_int(value) == expected
+
+
+def test_remaining_header_lowers_local_tokens():
+    scheduler = RateLimitScheduler(limit=60, period=6000)
+
+    scheduler.update_from_headers({"X-RateLimit-Remaining": "10", "X-RateLimit-Limit": "120"})
+
+    assert scheduler.limit == 120
+    assert scheduler.tokens == pytest.approx(10, abs=0.1)
+
+
+def test_remaining_header_never_raises_local_tokens():
+    scheduler = RateLimitScheduler(limit=60, period=6000)
+    scheduler.update_from_headers({"x-ratelimit-remaining": "5"})
+
+    scheduler.update_from_headers({"x-ratelimit-remaining": "50"})
+
+    assert scheduler.tokens == pytest.approx(5, abs=0.1)
+
+
+def test_missing_or_invalid_headers_are_ignored():
+    scheduler = RateLimitScheduler(limit=60, period=6000)
+
+    scheduler.update_from_headers(None)
+    scheduler.update_from_headers({"x-ratelimit-remaining": "n/a", "x-ratelimit-limit": ""})
+
+    assert scheduler.limit == 60
+    assert scheduler.tokens == pytest.approx(60, abs=0.1)
+
+
+def test_retry_after_blocks_every_priority():
+    async def scenario():
+        scheduler = RateLimitScheduler(limit=60, period=6000)
+        scheduler.update_from_headers({"Retry-After": "30"})
+
+        acquired = asyncio.ensure_future(scheduler.acquire(RequestPriority.ORDER))
+        await asyncio.sleep(0.01)
+        assert not acquired.done()
+        assert scheduler.tokens == pytest.approx(0, abs=0.1)
+        acquired.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_reads_leave_the_reserve_to_orders():
+    async def scenario():
+        scheduler = RateLimitScheduler(limit=3, period=6000, reserve=2)
+
+        await scheduler.acquire(RequestPriority.READ)
+        read = asyncio.ensure_future(scheduler.acquire(RequestPriority.READ))
+        await asyncio.sleep(0.01)
+        assert not read.done()
+
+        await asyncio.wait_for(scheduler.acquire(RequestPriority.ORDER), 1)
+        await asyncio.wait_for(scheduler.acquire(RequestPriority.ORDER), 1)
+        read.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_waiters_are_served_by_priority():
+    async def scenario():
+        scheduler = RateLimitScheduler(limit=1, period=0.05, reserve=0)
+        await scheduler.acquire(RequestPriority.ORDER)
+
+        served = []
+
+        async def acquire(priority):
+            await scheduler.acquire(priority)
+            served.append(priority)
+
+        waiters = [
+            asyncio.ensure_future(acquire(RequestPriority.READ)),
+            asyncio.ensure_future(acquire(RequestPriority.ACCOUNT)),
+            asyncio.ensure_future(acquire(RequestPriority.ORDER)),
+        ]
+        await asyncio.sleep(0)
+        await asyncio.wait_for(asyncio.gather(*waiters), 2)
+
+        assert served == [RequestPriority.ORDER, RequestPriority.ACCOUNT, RequestPriority.READ]
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        scheduler = RateLimitScheduler(limit=1, period=6000, reserve=0)
+        await scheduler.acquire(RequestPriority.ORDER)
+
+        waiter = asyncio.ensure_future(scheduler.acquire(RequestPriority.READ))
+        await asyncio.sleep(0)
+        assert scheduler.queued == 1
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert scheduler.queued == 0
+
+    asyncio.run(scenario())
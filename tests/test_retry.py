@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+from ccxt import DDoSProtection, ExchangeError, ExchangeNotAvailable, InvalidNonce, InvalidOrder, RequestTimeout
+
+from nexus_bitmex_node.exceptions import CircuitOpenError, PreTradeValidationError
+from nexus_bitmex_node.retry import Backoff, ErrorClass, RetryPolicy, classify_error
+
+
+@pytest.mark.parametrize("error, error_class", [
+    # An open circuit is an ExchangeNotAvailable but must not be retried
+    (CircuitOpenError(5), ErrorClass.FATAL),
+    # DDoSProtection and InvalidNonce are NetworkErrors, their own class wins
+    (DDoSProtection("429"), ErrorClass.RATE_LIMIT),
+    (InvalidNonce("bad nonce"), ErrorClass.NONCE),
+    (ExchangeError("This request has expired"), ErrorClass.NONCE),
+    (ExchangeNotAvailable("503"), ErrorClass.OVERLOAD),
+    (ExchangeError("The system is currently overloaded"), ErrorClass.OVERLOAD),
+    (RequestTimeout("timeout"), ErrorClass.NETWORK),
+    (asyncio.TimeoutError(), ErrorClass.NETWORK),
+    (ConnectionResetError(), ErrorClass.NETWORK),
+    (InvalidOrder("Invalid orderQty"), ErrorClass.FATAL),
+    (PreTradeValidationError("Invalid price"), ErrorClass.FATAL),
+    (KeyError("price"), ErrorClass.FATAL),
+    (RuntimeError("empty order result"), ErrorClass.NETWORK),
+])
+def test_classify_error(error, error_class):
+    assert classify_error(error) == error_class
+
+
+def test_backoff_grows_up_to_its_maximum():
+    backoff = Backoff(initial=0.1, multiplier=2, maximum=0.5)
+
+    assert [backoff.base_delay(attempt) for attempt in range(1, 6)] == pytest.approx([0.1, 0.2, 0.4, 0.5, 0.5])
+
+
+def test_backoff_jitter_only_adds_delay():
+    backoff = Backoff(initial=1.0, multiplier=2, maximum=8.0, jitter=0.5)
+
+    for attempt in range(1, 5):
+        base = backoff.base_delay(attempt)
+        assert base <= backoff.delay(attempt) <= base * 1.5
+
+
+def call_with_retries(policy: RetryPolicy, errors: list) -> int:
+    """
+    :return: the attempts made. The call raises `errors` in turn, then succeeds
+    """
+    attempts = 0
+
+    async def call():
+        nonlocal attempts
+        async for attempt in policy.retrying():
+            with attempt:
+                attempts += 1
+                if errors:
+                    raise errors.pop(0)
+
+    asyncio.run(call())
+    return attempts
+
+
+def immediate_policy(max_attempts: int = 3, deadline: float = 5.0) -> RetryPolicy:
+    return RetryPolicy("test", deadline=deadline, backoffs={
+        ErrorClass.NETWORK: Backoff(initial=0, max_attempts=max_attempts),
+        ErrorClass.NONCE: Backoff(initial=0, max_attempts=2),
+    })
+
+
+def test_network_errors_are_retried():
+    assert call_with_retries(immediate_policy(), [RequestTimeout("1"), RequestTimeout("2")]) == 3
+
+
+def test_fatal_errors_are_not_retried():
+    with pytest.raises(InvalidOrder):
+        call_with_retries(immediate_policy(), [InvalidOrder("Invalid orderQty")])
+
+
+def test_attempts_are_limited_per_error_class():
+    with pytest.raises(InvalidNonce):
+        call_with_retries(immediate_policy(), [InvalidNonce("1"), InvalidNonce("2"), InvalidNonce("3")])
+
+
+def test_retries_stop_at_the_deadline():
+    policy = RetryPolicy("test", deadline=0.05, backoffs={
+        ErrorClass.NETWORK: Backoff(initial=0.1, max_attempts=10),
+    })
+
+    with pytest.raises(RequestTimeout):
+        call_with_retries(policy, [RequestTimeout("1"), RequestTimeout("2")])
@@ -0,0 +1,206 @@
+import asyncio
+import json
+import typing
+from collections import defaultdict
+
+import lupa
+
+from nexus_bitmex_node.storage.scripts import COMPACT_TRADES, MERGE_MARGINS, MERGE_POSITIONS, MERGE_TRADES, \
+    RedisScript
+
+
+class LuaRedis:
+    """
+    Runs the scripts with Lua against in-memory hashes, sorted sets and streams. `cjson` is emulated with
+    Python's json, JSON nulls are decoded to `cjson.null` as in Redis
+    """
+    hashes: typing.Dict[str, typing.Dict[str, str]]
+    indexes: typing.Dict[str, typing.Dict[str, float]]
+    streams: typing.Dict[str, typing.List[dict]]
+    scripts: typing.Dict[str, str]
+
+    def __init__(self):
+        self.hashes = defaultdict(dict)
+        self.indexes = defaultdict(dict)
+        self.streams = defaultdict(list)
+        self.scripts = {}
+
+        self._lua = lupa.LuaRuntime(unpack_returned_tuples=True)
+        self._lua.execute("cjson = {null = {}}")
+        self._is_null = self._lua.eval("function(value) return value == cjson.null end")
+        lua_globals = self._lua.globals()
+        lua_globals.cjson.decode = self._decode
+        lua_globals.cjson.encode = self._encode
+        lua_globals.redis = self._lua.table(call=self._call)
+
+    async def script_load(self, source: str) -> str:
+        sha = f"sha{len(self.scripts)}"
+        self.scripts[sha] = source
+        return sha
+
+    async def evalsha(self, sha: str, keys: typing.List[str], args: typing.List):
+        lua_globals = self._lua.globals()
+        lua_globals.KEYS = self._lua.table(*keys)
+        lua_globals.ARGV = self._lua.table(*[str(arg) for arg in args])
+        return self._lua.execute(self.scripts[sha])
+
+    def stored(self, key: str) -> typing.Dict[str, dict]:
+        return {field: json.loads(value) for field, value in self.hashes[key].items()}
+
+    def _decode(self, value: str):
+        null = self._lua.globals().cjson.null
+        return self._lua.table_from({
+            field: null if field_value is None else field_value for field, field_value in json.loads(value).items()
+        })
+
+    def _encode(self, table) -> str:
+        return json.dumps({field: None if self._is_null(value) else value for field, value in table.items()})
+
+    def _ordered(self, key: str) -> typing.List[str]:
+        index = self.indexes[key]
+        return sorted(index, key=lambda member: (index[member], member))
+
+    def _call(self, command: str, key: str, *args):
+        command = command.upper()
+        if command == "HGET":
+            return self.hashes[key].get(args[0], False)
+        if command == "HSET":
+            self.hashes[key][args[0]] = args[1]
+            return 1
+        if command == "HDEL":
+            return int(self.hashes[key].pop(args[0], None) is not None)
+        if command == "HLEN":
+            return len(self.hashes[key])
+        if command == "HKEYS":
+            return self._lua.table(*self.hashes[key])
+        if command == "ZADD":
+            if args[0] == "NX":
+                return int(self.indexes[key].setdefault(args[2], float(args[1])) == float(args[1]))
+            self.indexes[key][args[1]] = float(args[0])
+            return 1
+        if command == "ZREM":
+            return int(self.indexes[key].pop(args[0], None) is not None)
+        if command == "ZCARD":
+            return len(self.indexes[key])
+        if command == "ZCOUNT":
+            # Only the exclusive "(max" form used by the scripts
+            maximum = float(args[1][1:])
+            return sum(1 for score in self.indexes[key].values() if score < maximum)
+        if command == "ZRANGE":
+            members = self._ordered(key)[int(args[0]):int(args[1]) + 1]
+            reply = [item for member in members for item in (member, str(self.indexes[key][member]))]
+            return self._lua.table(*reply)
+        if command == "XADD":
+            fields = args[args.index("*") + 1:]
+            self.streams[key].append(dict(zip(fields[::2], fields[1::2])))
+            return f"{len(self.streams[key])}-0"
+        raise NotImplementedError(command)
+
+
+def run(script: str, client: LuaRedis, keys: typing.List[str], args: typing.List):
+    return asyncio.run(RedisScript(script)(client, keys=keys, args=args))
+
+
+def save_trades(client: LuaRedis, *trades: typing.Tuple[str, str, int]):
+    """
+    :param trades: order id, order status, update time (ms)
+    """
+    for order_id, status, updated_at in trades:
+        client.hashes["trades"][order_id] = json.dumps({"order_id": order_id, "order_status": status})
+        client.indexes["trades:index"][order_id] = updated_at
+
+
+def test_positions_merge_the_non_null_fields_of_the_update():
+    client = LuaRedis()
+    position = {"symbol": "XBTUSD", "current_quantity": 100, "leverage": 10, "mark_price": 50000}
+    run(MERGE_POSITIONS, client, ["positions"], ["position", 0, "XBTUSD", json.dumps(position), ""])
+
+    update = {"symbol": "XBTUSD", "current_quantity": 0, "leverage": None, "mark_price": 51000}
+    run(MERGE_POSITIONS, client, ["positions"], ["position", 0, "XBTUSD", json.dumps(update), ""])
+
+    assert client.stored("positions")["XBTUSD"] == {
+        "symbol": "XBTUSD", "current_quantity": 0, "leverage": 10, "mark_price": 51000, "is_open": False,
+    }
+    assert client.streams == {}
+
+
+def test_merged_positions_and_trades_append_their_change_records():
+    client = LuaRedis()
+    position = {"symbol": "XBTUSD", "current_quantity": 100}
+    run(MERGE_POSITIONS, client, ["positions", "changes"],
+        ["position", 100, "XBTUSD", json.dumps(position), '{"current_quantity":100}'])
+    run(MERGE_TRADES, client, ["trades", "trades:index", "changes"],
+        ["trade", 100, "o1", json.dumps({"order_id": "o1", "order_status": "New"}), 1000, '{"order_status":"New"}'])
+
+    assert client.stored("positions")["XBTUSD"]["is_open"] is True
+    assert client.streams["changes"] == [
+        {"kind": "position", "id": "XBTUSD", "data": '{"current_quantity":100}'},
+        {"kind": "trade", "id": "o1", "data": '{"order_status":"New"}'},
+    ]
+
+
+def test_trades_merge_the_non_null_fields_and_are_indexed_by_update_time():
+    client = LuaRedis()
+    trade = {"order_id": "o1", "order_status": "New", "avg_price": None, "text": "Submitted"}
+    run(MERGE_TRADES, client, ["trades", "trades:index"], ["trade", 0, "o1", json.dumps(trade), 1000, ""])
+
+    update = {"order_id": "o1", "order_status": "Filled", "avg_price": 50000.5, "text": None}
+    run(MERGE_TRADES, client, ["trades", "trades:index"], ["trade", 0, "o1", json.dumps(update), 2000, ""])
+
+    assert client.stored("trades")["o1"] == {
+        "order_id": "o1", "order_status": "Filled", "avg_price": 50000.5, "text": "Submitted",
+    }
+    assert client.indexes["trades:index"] == {"o1": 2000}
+
+
+def test_margins_are_converted_to_the_major_unit_and_keep_their_used_margin():
+    client = LuaRedis()
+    run(MERGE_MARGINS, client, ["margins"], ["XBt", 150000000, 50000000, 0.00000001])
+    run(MERGE_MARGINS, client, ["margins"], ["XBt", 200000000, "", 0.00000001])
+    # No maintenance margin and nothing stored: the margin is not known yet
+    updated = run(MERGE_MARGINS, client, ["margins"], ["USDt", 1000000, "", 0.000001])
+
+    assert updated == 0
+    assert client.stored("margins") == {"XBt": {"balance": 2, "used": 0.5, "available": 1.5}}
+
+
+def test_compaction_keeps_the_newest_trades_and_skips_open_ones():
+    client = LuaRedis()
+    save_trades(client, ("o1", "Filled", 1), ("o2", "New", 2), ("o3", "Canceled", 3), ("o4", "Filled", 4),
+                ("o5", "Filled", 5))
+
+    removed = run(COMPACT_TRADES, client, ["trades", "trades:index"], [2, 0, 500])
+
+    # The open trade counts in the kept trades but is never removed
+    assert removed == 3
+    assert sorted(client.hashes["trades"]) == ["o2", "o5"]
+    assert sorted(client.indexes["trades:index"]) == ["o2", "o5"]
+
+
+def test_compaction_pages_past_a_full_batch_of_open_trades():
+    client = LuaRedis()
+    save_trades(client, ("o1", "New", 1), ("o2", "PartiallyFilled", 2), ("o3", "Filled", 3), ("o4", "Filled", 4))
+
+    removed = run(COMPACT_TRADES, client, ["trades", "trades:index"], [1, 0, 2])
+
+    assert removed == 2
+    assert sorted(client.hashes["trades"]) == ["o1", "o2"]
+
+
+def test_compaction_removes_trades_older_than_the_age_limit():
+    client = LuaRedis()
+    save_trades(client, ("o1", "Filled", 1000), ("o2", "Untriggered", 1500), ("o3", "Filled", 2000))
+
+    assert run(COMPACT_TRADES, client, ["trades", "trades:index"], [0, 2000, 500]) == 1
+    assert sorted(client.hashes["trades"]) == ["o2", "o3"]
+    # Nothing over the limits
+    assert run(COMPACT_TRADES, client, ["trades", "trades:index"], [0, 2000, 500]) == 0
+
+
+def test_compaction_indexes_unindexed_trades_as_the_oldest():
+    client = LuaRedis()
+    save_trades(client, ("o2", "Filled", 2000), ("o3", "Filled", 3000))
+    client.hashes["trades"]["o1"] = json.dumps({"order_id": "o1", "order_status": "Filled"})
+
+    assert run(COMPACT_TRADES, client, ["trades", "trades:index"], [2, 0, 500]) == 1
+    assert sorted(client.hashes["trades"]) == ["o2", "o3"]
@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+from nexus_bitmex_node.stream_fallback import (
+    BALANCE_STREAM,
+    ORDERS_STREAM,
+    POSITIONS_STREAM,
+    TICKERS_STREAM,
+    StreamFreshness,
+    StreamPollingFallback,
+)
+
+
+class FakeScheduler:
+    limit = 60
+    period = 60.0
+
+
+class FakeClient:
+    def __init__(self):
+        self.stream_freshness = StreamFreshness()
+        self.scheduler = FakeScheduler()
+        self.polls = []
+
+    async def fetch_orders(self, **kwargs):
+        self.polls.append(ORDERS_STREAM)
+        return []
+
+    async def fetch_positions(self):
+        self.polls.append(POSITIONS_STREAM)
+        return []
+
+    async def fetch_balance(self):
+        self.polls.append(BALANCE_STREAM)
+        return {}
+
+
+class FakeManager:
+    async def update_orders_data(self, client_id, orders):
+        return False
+
+    async def update_positions_data(self, client_id, positions):
+        return False
+
+    async def update_margin_data(self, client_id, balance):
+        return False
+
+
+def create_test_fallback(client: FakeClient, stale_after: float = 0.02) -> StreamPollingFallback:
+    return StreamPollingFallback(FakeManager(), "1", client, stale_after=stale_after, min_interval=0.01,
+                                 max_interval=0.01, budget_share=1)
+
+
+def test_an_idle_stream_on_a_live_connection_is_not_polled():
+    async def scenario():
+        client = FakeClient()
+        client.stream_freshness.touch(ORDERS_STREAM)
+        task = asyncio.ensure_future(create_test_fallback(client).run())
+
+        # No order activity, instrument updates keep arriving on the connection
+        for _ in range(10):
+            client.stream_freshness.touch(TICKERS_STREAM)
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+        assert client.stream_freshness.age(ORDERS_STREAM) > 0.05
+        assert client.polls == []
+
+    asyncio.run(scenario())
+
+
+def test_every_private_stream_is_polled_once_the_connection_is_silent():
+    async def scenario():
+        client = FakeClient()
+        fallback = create_test_fallback(client)
+        task = asyncio.ensure_future(fallback.run())
+
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+        assert set(client.polls) == {ORDERS_STREAM, POSITIONS_STREAM, BALANCE_STREAM}
+        assert fallback.polling == {ORDERS_STREAM, POSITIONS_STREAM, BALANCE_STREAM}
+
+    asyncio.run(scenario())
+
+
+def test_a_lost_stream_is_polled_until_polled_once_reconnected():
+    freshness = StreamFreshness()
+    freshness.touch(TICKERS_STREAM)
+    freshness.lose(ORDERS_STREAM)
+
+    assert freshness.is_stale(ORDERS_STREAM, stale_after=30)
+    assert not freshness.is_stale(POSITIONS_STREAM, stale_after=30)
+    assert not freshness.is_reconnected(ORDERS_STREAM)
+
+    time.sleep(0.001)
+    freshness.touch(TICKERS_STREAM)
+    assert freshness.is_reconnected(ORDERS_STREAM)
+
+    freshness.recover(ORDERS_STREAM)
+    assert not freshness.is_stale(ORDERS_STREAM, stale_after=30)
+
+
+def test_an_update_clears_a_lost_stream():
+    freshness = StreamFreshness()
+    freshness.lose(BALANCE_STREAM)
+    freshness.touch(BALANCE_STREAM)
+
+    assert not freshness.is_stale(BALANCE_STREAM, stale_after=30)
@@ -0,0 +1,158 @@
+import asyncio
+
+import pytest
+from ccxt import InvalidOrder, RequestTimeout
+
+from nexus_bitmex_node.bitmex import BitmexManager
+from nexus_bitmex_node.models.order import BitmexOrder, OrderSide, OrderType
+from nexus_bitmex_node.order_index import SubmissionState, SubmittedOrderIndex
+from nexus_bitmex_node.retry import Backoff, ErrorClass, RetryPolicy
+from nexus_bitmex_node.tracing import tracer
+
+TICKER = {
+    "symbol": "XBTUSD",
+    "state": "Open",
+    "currency": "XBt",
+    "underlying": "XBT",
+    "quote_currency": "USD",
+    "mark_price": 50000,
+    "last_price_protected": 50000,
+    "lot_size": 100,
+    "tick_size": 0.5,
+    "max_price": 1000000,
+    "max_order_qty": 10000000,
+}
+
+RETRY = RetryPolicy("place_order", deadline=5, backoffs={
+    ErrorClass.NETWORK: Backoff(initial=0, max_attempts=4, jitter=0),
+})
+
+
+class FakeClient:
+    """
+    Exchange that fails some submissions with `errors`: before accepting the order, or after accepting it
+    (the response was lost). Accepted orders are only found by clOrdID once `hidden_lookups` ran out
+    """
+    def __init__(self, errors=(), accept_before_error: bool = True, hidden_lookups: int = 0):
+        self.submitted_orders = SubmittedOrderIndex()
+        self.errors = list(errors)
+        self.accept_before_error = accept_before_error
+        self.hidden_lookups = hidden_lookups
+        self.exchange_orders = {}
+        self.submissions = []
+        self.lookups = []
+
+    def safe_symbol(self, symbol: str) -> str:
+        return symbol
+
+    async def create_limit_order(self, symbol, side, amount, price, params):
+        cl_ord_id = params["clOrdID"]
+        self.submissions.append(cl_ord_id)
+        if cl_ord_id in self.exchange_orders:
+            raise InvalidOrder("Duplicate clOrdID")
+
+        error = self.errors.pop(0) if self.errors else None
+        if not error or self.accept_before_error:
+            self.exchange_orders[cl_ord_id] = {
+                "id": f"o{len(self.exchange_orders) + 1}",
+                "status": "open",
+                "info": {"clOrdID": cl_ord_id, "ordStatus": "New"},
+            }
+        if error:
+            raise error
+        return self.exchange_orders[cl_ord_id]
+
+    async def create_market_order(self, symbol, side, amount, price, params):
+        return await self.create_limit_order(symbol, side, amount, price, params)
+
+    async def fetch_orders(self, symbol, limit=None, params=None):
+        cl_ord_id = params["filter"]["clOrdID"]
+        self.lookups.append(cl_ord_id)
+        if self.hidden_lookups:
+            self.hidden_lookups -= 1
+            return []
+        return [self.exchange_orders[cl_ord_id]] if cl_ord_id in self.exchange_orders else []
+
+
+def create_test_order() -> BitmexOrder:
+    return BitmexOrder(id=1, client_order_id="c1_main", symbol="XBTUSD", side=OrderSide.BUY,
+                       order_type=OrderType.LIMIT, close_order=False, percent=10, leverage=1, price=50000,
+                       stop_price=None, stop_trigger_type=None, trailing_stop_percent=None)
+
+
+async def place_test_order(client: FakeClient) -> dict:
+    return await BitmexManager.submit_order(client, "c1_main_a1b2", "XBTUSD", lambda: client.create_limit_order(
+        "XBTUSD", "buy", 100, 50000, {"clOrdID": "c1_main_a1b2"}), RETRY)
+
+
+def test_an_order_accepted_before_a_network_error_is_found_instead_of_sent_again():
+    async def scenario():
+        client = FakeClient(errors=[RequestTimeout("timeout")])
+
+        order = await place_test_order(client)
+
+        assert order is client.exchange_orders["c1_main_a1b2"]
+        assert client.submissions == ["c1_main_a1b2"]
+        assert client.lookups == ["c1_main_a1b2"]
+        assert client.submitted_orders.state("c1_main_a1b2") == SubmissionState.ACKNOWLEDGED
+
+    asyncio.run(scenario())
+
+
+def test_an_order_lost_before_the_exchange_is_sent_again_with_the_same_cl_ord_id():
+    async def scenario():
+        client = FakeClient(errors=[RequestTimeout("timeout")] * 2, accept_before_error=False)
+
+        order = await BitmexManager.place_order(client, create_test_order(), TICKER, 1000000, quantity=100)
+
+        cl_ord_id, = client.exchange_orders
+        assert order is client.exchange_orders[cl_ord_id]
+        assert cl_ord_id.startswith("c1_main_")
+        # Every retry looked the pending order up first, then sent it with the same clOrdID
+        assert client.submissions == [cl_ord_id] * 3
+        assert client.lookups == [cl_ord_id] * 2
+
+    asyncio.run(scenario())
+
+
+def test_a_duplicate_cl_ord_id_returns_the_order_already_on_the_exchange():
+    async def scenario():
+        # The lookup after the timeout does not see the accepted order yet, the exchange rejects the resend
+        client = FakeClient(errors=[RequestTimeout("timeout")], hidden_lookups=1)
+
+        order = await place_test_order(client)
+
+        assert order is client.exchange_orders["c1_main_a1b2"]
+        assert len(client.exchange_orders) == 1
+        assert client.submissions == ["c1_main_a1b2"] * 2
+        assert client.lookups == ["c1_main_a1b2"] * 2
+
+    asyncio.run(scenario())
+
+
+def test_a_rejected_order_is_not_retried_nor_kept_pending():
+    async def scenario():
+        client = FakeClient(errors=[InvalidOrder("Invalid orderQty")], accept_before_error=False)
+
+        with pytest.raises(InvalidOrder):
+            await place_test_order(client)
+
+        assert client.submissions == ["c1_main_a1b2"]
+        assert client.lookups == []
+        assert "c1_main_a1b2" not in client.submitted_orders
+
+    asyncio.run(scenario())
+
+
+def test_a_retried_submission_is_traced_as_one_submit_and_its_retries():
+    async def scenario():
+        client = FakeClient(errors=[RequestTimeout("timeout")] * 2, accept_before_error=False)
+        trace = tracer.start("m1", "create_order")
+
+        await place_test_order(client)
+
+        assert [stage for stage, _ in trace.stages] == [
+            "amqp_delivered", "rest_submit", "rest_retry", "rest_retry", "rest_ack",
+        ]
+
+    asyncio.run(scenario())
@@ -0,0 +1,221 @@
+import asyncio
+import contextvars
+
+from nexus_bitmex_node.symbol_actors import ACCOUNT_LANE, SymbolActorPool
+
+
+def test_commands_of_one_symbol_run_one_at_a_time_in_order():
+    async def scenario():
+        pool = SymbolActorPool()
+        events = []
+
+        async def command(number, delay):
+            events.append(("start", number))
+            await asyncio.sleep(delay)
+            events.append(("end", number))
+
+        # The first command is the slowest, the others must still wait for it
+        for number, delay in enumerate((0.03, 0.01, 0)):
+            pool.tell("XBTUSD", command, number, delay)
+        await asyncio.sleep(0.1)
+        await pool.stop()
+
+        assert events == [("start", 0), ("end", 0), ("start", 1), ("end", 1), ("start", 2), ("end", 2)]
+
+    asyncio.run(scenario())
+
+
+def test_symbols_run_in_parallel():
+    async def scenario():
+        pool = SymbolActorPool()
+        released = asyncio.Event()
+        done = []
+
+        async def blocked():
+            await released.wait()
+            done.append("XBTUSD")
+
+        async def command():
+            done.append("ETHUSD")
+
+        pool.tell("XBTUSD", blocked)
+        pool.tell("ETHUSD", command)
+        await asyncio.sleep(0.01)
+        assert done == ["ETHUSD"]
+        assert pool.state() == {"XBTUSD": 0, "ETHUSD": 0}
+
+        released.set()
+        await asyncio.sleep(0.01)
+        await pool.stop()
+        assert done == ["ETHUSD", "XBTUSD"]
+
+    asyncio.run(scenario())
+
+
+def test_commands_queue_behind_a_running_one():
+    async def scenario():
+        pool = SymbolActorPool()
+        released = asyncio.Event()
+
+        async def blocked():
+            await released.wait()
+
+        async def command():
+            pass
+
+        pool.tell("XBTUSD", blocked)
+        pool.tell("XBTUSD", command)
+        pool.tell("XBTUSD", command)
+        await asyncio.sleep(0.01)
+        assert pool.state() == {"XBTUSD": 2}
+
+        released.set()
+        await asyncio.sleep(0.01)
+        assert pool.state() == {"XBTUSD": 0}
+        await pool.stop()
+
+    asyncio.run(scenario())
+
+
+def test_a_failed_command_does_not_stop_its_symbol():
+    async def scenario():
+        pool = SymbolActorPool()
+        done = []
+
+        async def failing():
+            raise ValueError("invalid order")
+
+        async def command():
+            done.append(True)
+
+        pool.tell("XBTUSD", failing)
+        pool.tell("XBTUSD", command)
+        await asyncio.sleep(0.01)
+        await pool.stop()
+
+        assert done == [True]
+
+    asyncio.run(scenario())
+
+
+def test_dispatcher_routes_commands_by_symbol():
+    async def scenario():
+        pool = SymbolActorPool()
+        received = []
+
+        async def listener(message_id, data):
+            received.append((message_id, data.get("symbol")))
+
+        dispatch = pool.dispatcher(listener, lambda message_id, data: data.get("symbol"))
+        await dispatch("1", {"symbol": "XBTUSD"})
+        await dispatch("2", {})
+        await asyncio.sleep(0.01)
+
+        assert dispatch.__name__ == "listener"
+        assert set(pool.state()) == {"XBTUSD", ACCOUNT_LANE}
+        assert received == [("1", "XBTUSD"), ("2", None)]
+        await pool.stop()
+
+    asyncio.run(scenario())
+
+
+def test_commands_run_in_the_senders_context():
+    trace = contextvars.ContextVar("trace", default=None)
+
+    async def scenario():
+        pool = SymbolActorPool()
+        seen = []
+
+        async def command():
+            seen.append(trace.get())
+
+        trace.set("message-1")
+        pool.tell("XBTUSD", command)
+        trace.set("message-2")
+        pool.tell("XBTUSD", command)
+        await asyncio.sleep(0.01)
+        await pool.stop()
+
+        assert seen == ["message-1", "message-2"]
+
+    asyncio.run(scenario())
+
+
+def test_stopped_pool_ignores_commands():
+    async def scenario():
+        pool = SymbolActorPool()
+        done = []
+
+        async def command():
+            done.append(True)
+
+        await pool.stop()
+        pool.tell("XBTUSD", command)
+        await asyncio.sleep(0.01)
+
+        assert done == []
+        assert pool.state() == {}
+
+    asyncio.run(scenario())
+
+
+def test_stop_runs_the_queued_commands_within_the_timeout():
+    async def scenario():
+        pool = SymbolActorPool()
+        done = []
+
+        async def command(number):
+            await asyncio.sleep(0.01)
+            done.append(number)
+
+        for number in range(3):
+            pool.tell("XBTUSD", command, number)
+        await pool.stop(timeout=1)
+
+        assert done == [0, 1, 2]
+
+    asyncio.run(scenario())
+
+
+def test_commands_left_at_the_stop_are_dropped_for_an_answer():
+    async def scenario():
+        dropped = []
+
+        async def on_dropped(handler, message_id):
+            dropped.append((handler.__name__, message_id))
+
+        pool = SymbolActorPool(on_dropped=on_dropped)
+
+        async def blocked(message_id):
+            await asyncio.Event().wait()
+
+        pool.tell("XBTUSD", blocked, "1")
+        pool.tell("XBTUSD", blocked, "2")
+        await asyncio.sleep(0.01)
+        await pool.stop(timeout=0.01)
+        pool.tell("XBTUSD", blocked, "3")
+        await asyncio.sleep(0.01)
+
+        assert dropped == [("blocked", "1"), ("blocked", "2"), ("blocked", "3")]
+
+    asyncio.run(scenario())
+
+
+def test_dispatcher_awaits_the_symbol_lookup():
+    async def scenario():
+        pool = SymbolActorPool()
+
+        async def listener(message_id, data):
+            pass
+
+        async def order_symbol(message_id, data):
+            return {"1": "XBTUSD"}.get(data["orderId"])
+
+        dispatch = pool.dispatcher(listener, order_symbol)
+        await dispatch("1", {"orderId": "1"})
+        await dispatch("2", {"orderId": "2"})
+
+        assert set(pool.state()) == {"XBTUSD", ACCOUNT_LANE}
+        await pool.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from nexus_bitmex_node import settings
+from nexus_bitmex_node.event_bus import EventBus
+from nexus_bitmex_node.models.order import BitmexOrder, OrderSide, OrderType
+from nexus_bitmex_node.storage.local import LocalDataStore
+from nexus_bitmex_node.storage.tiered import TieredDataStore
+
+
+class FakeRemote:
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.writes = []
+
+    async def start(self, url: str):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def export(self, kinds):
+        return {}
+
+    async def save_order(self, client_key: str, order: BitmexOrder):
+        await self._write(("order", order.id))
+
+    async def save_tickers(self, client_key: str, data: dict):
+        await self._write(("tickers", list(data)))
+
+    async def _write(self, write):
+        await asyncio.sleep(0)
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("Connection lost")
+        self.writes.append(write)
+
+
+def create_test_order(order_id: int) -> BitmexOrder:
+    return BitmexOrder(id=order_id, client_order_id=f"c{order_id}_main", symbol="XBTUSD", side=OrderSide.BUY,
+                       order_type=OrderType.LIMIT, close_order=False, percent=10, leverage=1, price=50000,
+                       stop_price=None, stop_trigger_type=None, trailing_stop_percent=None)
+
+
+@pytest.fixture(autouse=True)
+def replication_settings(monkeypatch):
+    monkeypatch.setattr(settings, "REPLICATION_QUEUE_SIZE", 2)
+    monkeypatch.setattr(settings, "REPLICATION_RETRY_DELAY", 0.001)
+    monkeypatch.setattr(settings, "REPLICATION_MAX_RETRY_DELAY", 0.004)
+    monkeypatch.setattr(settings, "REPLICATION_STOP_TIMEOUT", 0.05)
+
+
+async def start_test_store(remote: FakeRemote) -> TieredDataStore:
+    store = TieredDataStore(EventBus(), LocalDataStore(EventBus()), remote)
+    await store.start("redis://test")
+    return store
+
+
+def test_failed_writes_are_retried_in_order():
+    async def scenario():
+        remote = FakeRemote(failures=3)
+        store = await start_test_store(remote)
+
+        await store.save_order("1", create_test_order(1))
+        await store.save_order("1", create_test_order(2))
+        await store.stop()
+
+        assert remote.writes == [("order", 1), ("order", 2)]
+
+    asyncio.run(scenario())
+
+
+def test_orders_are_kept_when_too_many_writes_wait():
+    async def scenario():
+        remote = FakeRemote(failures=1000)
+        store = await start_test_store(remote)
+
+        for order_id in range(3):
+            await store.save_order("1", create_test_order(order_id))
+        await store.save_tickers("1", {})
+
+        remote.failures = 0
+        await store.stop()
+
+        assert remote.writes == [("order", 0), ("order", 1), ("order", 2)]
+
+    asyncio.run(scenario())
+
+
+def test_stop_gives_up_on_redis_after_the_timeout():
+    async def scenario():
+        remote = FakeRemote(failures=1000)
+        store = await start_test_store(remote)
+
+        await store.save_order("1", create_test_order(1))
+        await asyncio.wait_for(store.stop(), 1)
+
+        assert remote.writes == []
+        assert store._replication_task is None
+
+    asyncio.run(scenario())
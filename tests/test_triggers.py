@@ -0,0 +1,87 @@
+import pytest
+
+from nexus_bitmex_node.triggers import ConditionalOrder, TriggerEngine, create_conditional_order
+
+
+def create_test_conditional_order(message_id: str, *triggers: dict, client_order_id: str = None) -> ConditionalOrder:
+    return create_conditional_order(message_id, {"orders": {"main": {
+        "symbol": "XBTUSD",
+        "clOrderId": client_order_id or f"{message_id}_main",
+        "triggers": list(triggers),
+    }}})
+
+
+def above(price: float, symbol: str = "XBTUSD") -> dict:
+    return {"symbol": symbol, "price": price, "direction": "ABOVE"}
+
+
+def below(price: float, symbol: str = "XBTUSD") -> dict:
+    return {"symbol": symbol, "price": price, "direction": "BELOW"}
+
+
+def create_test_engine():
+    fired = []
+    engine = TriggerEngine(lambda order, triggered_at: fired.append(order.id))
+    return engine, fired
+
+
+def test_a_price_fires_only_the_levels_it_crossed_in_price_order():
+    engine, fired = create_test_engine()
+    for message_id, price in (("c", 110), ("a", 100), ("b", 105)):
+        engine.add(create_test_conditional_order(message_id, above(price)))
+    for message_id, price in (("d", 90), ("e", 95)):
+        engine.add(create_test_conditional_order(message_id, below(price)))
+
+    engine.on_ticker("XBTUSD", {"lastPrice": 106})
+    assert fired == ["a", "b"]
+
+    engine.on_ticker("XBTUSD", {"lastPrice": 94})
+    assert fired == ["a", "b", "e"]
+    assert [order.id for order in engine.pending] == ["c", "d"]
+
+
+def test_prices_of_other_symbols_and_price_types_are_ignored():
+    engine, fired = create_test_engine()
+    engine.add(create_test_conditional_order("a", above(100)))
+
+    engine.on_ticker("ETHUSD", {"lastPrice": 200})
+    engine.on_ticker("XBTUSD", {"markPrice": 200})
+
+    assert fired == []
+
+
+def test_an_order_fires_once_all_its_legs_were_crossed():
+    engine, fired = create_test_engine()
+    engine.add(create_test_conditional_order("a", above(100), below(3000, symbol="ETHUSD")))
+
+    engine.on_ticker("XBTUSD", {"lastPrice": 101})
+    assert fired == []
+
+    engine.on_ticker("ETHUSD", {"lastPrice": 2900})
+    engine.on_ticker("ETHUSD", {"lastPrice": 2800})
+    engine.on_ticker("XBTUSD", {"lastPrice": 102})
+    assert fired == ["a"]
+    assert len(engine) == 0
+
+
+def test_cancel_by_prefix_does_not_cancel_longer_client_order_ids():
+    engine, fired = create_test_engine()
+    engine.add(create_test_conditional_order("1", above(100), client_order_id="c1_main"))
+    engine.add(create_test_conditional_order("10", above(100), client_order_id="c10_main"))
+
+    canceled = engine.cancel_by_client_order_id_prefix("c1_")
+    engine.on_ticker("XBTUSD", {"lastPrice": 101})
+
+    assert [order.id for order in canceled] == ["1"]
+    assert fired == ["10"]
+
+
+@pytest.mark.parametrize("main_order, error", [
+    ({"triggers": [above(100)]}, "requires a symbol"),
+    ({"symbol": "XBTUSD", "triggers": []}, "at least one trigger"),
+    ({"symbol": "XBTUSD", "triggers": [{"price": "high", "direction": "ABOVE"}]}, "Invalid trigger"),
+    ({"symbol": "XBTUSD", "triggers": [{"price": 100, "direction": "SIDEWAYS"}]}, "Invalid trigger"),
+])
+def test_invalid_conditional_orders_are_rejected(main_order, error):
+    with pytest.raises(ValueError, match=error):
+        create_conditional_order("1", {"orders": {"main": main_order}})
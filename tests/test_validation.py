@@ -0,0 +1,129 @@
+import pytest
+
+from nexus_bitmex_node.exceptions import PreTradeValidationError
+from nexus_bitmex_node.instrument_specs import InstrumentSpecTable, Rounding, create_instrument_spec
+from nexus_bitmex_node.models.order import BitmexOrder, OrderSide, OrderType
+from nexus_bitmex_node.validation import validate_order
+
+XBTUSD = {
+    "symbol": "XBTUSD",
+    "state": "Open",
+    "currency": "XBt",
+    "underlying": "XBT",
+    "quote_currency": "USD",
+    "mark_price": 50000.0,
+    "lot_size": 100,
+    "max_price": 1000000,
+    "max_order_qty": 10000000,
+    "tick_size": 0.5,
+    "last_price_protected": 50000.0,
+    "multiplier": -100000000,
+    "is_quanto": False,
+    "is_inverse": True,
+    "underlying_to_settle_multiplier": None,
+}
+
+
+def create_test_order(side: OrderSide = OrderSide.BUY, order_type: OrderType = OrderType.LIMIT,
+                      leverage: float = 1) -> BitmexOrder:
+    return BitmexOrder(id=1, client_order_id="c1_main", symbol="XBTUSD", side=side, order_type=order_type,
+                       close_order=False, percent=10, leverage=leverage, price=None, stop_price=None,
+                       stop_trigger_type=None, trailing_stop_percent=None)
+
+
+@pytest.mark.parametrize("price, rounding, expected", [
+    (100.3, Rounding.FLOOR, 100.0),
+    (100.3, Rounding.CEILING, 100.5),
+    (100.25, Rounding.NEAREST, 100.5),
+    (100.2, Rounding.NEAREST, 100.0),
+    (100.5, Rounding.CEILING, 100.5),
+])
+def test_round_price_to_half_ticks(price, rounding, expected):
+    assert create_instrument_spec("XBTUSD", 0.5, 100).round_price(price, rounding) == expected
+
+
+@pytest.mark.parametrize("price, rounding, expected", [
+    # 0.07 * 100 is 7.000000000000001 as a float, it must stay on the 0.07 tick
+    (0.07, Rounding.CEILING, 0.07),
+    (0.07, Rounding.FLOOR, 0.07),
+    (1.005, Rounding.FLOOR, 1.0),
+    (1.005, Rounding.CEILING, 1.01),
+])
+def test_round_price_is_exact_on_decimal_ticks(price, rounding, expected):
+    assert create_instrument_spec("ETHUSDT", 0.01, 1000).round_price(price, rounding) == expected
+
+
+@pytest.mark.parametrize("tick_size, price", [(0.5, 57231.5), (0.05, 2034.15), (0.0001, 0.5319)])
+def test_prices_on_the_grid_are_unchanged(tick_size, price):
+    spec = create_instrument_spec("TEST", tick_size, 1)
+
+    assert spec.round_price(price, Rounding.FLOOR) == price
+    assert spec.round_price(price, Rounding.CEILING) == price
+    assert spec.ticks_to_price(spec.price_to_ticks(price)) == price
+
+
+@pytest.mark.parametrize("lot_size, quantity, expected", [
+    (100, 250, 200),
+    (100, 99, 0),
+    (1, 7.9, 7),
+    (0.001, 0.0119, 0.011),
+])
+def test_round_quantity_down_to_the_lot_size(lot_size, quantity, expected):
+    assert create_instrument_spec("TEST", 0.5, lot_size).round_quantity(quantity) == expected
+
+
+def test_spec_table_is_rebuilt_only_when_the_grid_changes():
+    table = InstrumentSpecTable()
+
+    spec = table.update("XBTUSD", 0.5, 100)
+    assert table.update("XBTUSD", 0.5, 100) is spec
+    assert table.update("XBTUSD", 1, 100).tick_units == 1
+    assert len(table) == 1
+
+
+def test_validate_order_rounds_quantity_and_price_onto_the_grid():
+    quantity, price = validate_order(create_test_order(OrderSide.BUY), XBTUSD, 250.7, 50000.3, margin=1)
+
+    assert (quantity, price) == (200, 50000.0)
+
+
+def test_validate_order_never_rounds_to_a_worse_price():
+    _, buy_price = validate_order(create_test_order(OrderSide.BUY), XBTUSD, 100, 50000.3, margin=1)
+    _, sell_price = validate_order(create_test_order(OrderSide.SELL), XBTUSD, 100, 50000.3, margin=1)
+
+    assert buy_price == 50000.0
+    assert sell_price == 50000.5
+
+
+def test_validate_order_accepts_the_whole_available_margin():
+    # 100 contracts at 50000 cost 0.002 XBT, the float result may exceed it by a rounding error
+    assert validate_order(create_test_order(), XBTUSD, 100, 50000, margin=0.002) == (100, 50000)
+
+
+@pytest.mark.parametrize("ticker, quantity, price, margin, error", [
+    (dict(XBTUSD, state="Closed"), 100, 50000, 1, "not open for trading"),
+    (XBTUSD, 99, 50000, 1, "below the lot size"),
+    (XBTUSD, 20000000, 50000, 1000, "above the maximum order quantity"),
+    (XBTUSD, 100, 0, 1, "Invalid price"),
+    (XBTUSD, 100, 2000000, 1, "above the maximum price"),
+    (XBTUSD, 100, 50000, 0.0019, "insufficient Available Balance"),
+])
+def test_validate_order_rejects(ticker, quantity, price, margin, error):
+    with pytest.raises(PreTradeValidationError, match=error):
+        validate_order(create_test_order(), ticker, quantity, price, margin)
+
+
+def test_market_orders_skip_price_checks():
+    quantity, price = validate_order(create_test_order(order_type=OrderType.MARKET), XBTUSD, 100, 50000.3, margin=1)
+
+    assert (quantity, price) == (100, 50000.3)
+
+
+def test_linear_contracts_are_valued_in_their_settlement_currency():
+    xbtusdt = dict(XBTUSD, symbol="XBTUSDT", currency="USDt", quote_currency="USDT", lot_size=1000,
+                   multiplier=1, is_inverse=False)
+
+    # 1000 contracts of 0.000001 XBT at 50000 are worth 50 USDT
+    assert validate_order(create_test_order(), xbtusdt, 1000, 50000, margin=50) == (1000, 50000)
+    with pytest.raises(PreTradeValidationError, match="50.00000000 USDT required"):
+        validate_order(create_test_order(), xbtusdt, 1000, 50000, margin=49)
@@ -0,0 +1,160 @@
+import asyncio
+
+from nexus_bitmex_node.storage.write_behind import WriteBehindBuffer
+
+
+class FakePipeline:
+    def __init__(self, client: "FakeRedis"):
+        self._client = client
+        self._writes = []
+
+    def hmset_dict(self, key, fields):
+        self._writes.append((key, dict(fields)))
+
+    async def execute(self):
+        await asyncio.sleep(0)
+        self._client.attempts += 1
+        if self._client.failures:
+            self._client.failures -= 1
+            raise ConnectionError("Connection lost")
+        self._client.flushes.append(self._writes)
+        for key, fields in self._writes:
+            self._client.hashes.setdefault(key, {}).update(fields)
+
+
+class FakeRedis:
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.attempts = 0
+        self.flushes = []
+        self.hashes = {}
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+def test_writes_to_the_same_field_are_coalesced():
+    async def scenario():
+        client = FakeRedis()
+        buffer = WriteBehindBuffer(client)
+
+        buffer.hset("bitmex:1:tickers", {"XBTUSD": "a"})
+        buffer.hset("bitmex:1:tickers", {"XBTUSD": "b", "ETHUSD": "c"})
+        assert len(buffer) == 2
+
+        await buffer.flush()
+        assert client.flushes == [[("bitmex:1:tickers", {"XBTUSD": "b", "ETHUSD": "c"})]]
+        assert len(buffer) == 0
+
+    asyncio.run(scenario())
+
+
+def test_pending_and_in_flight_writes_are_read_back():
+    async def scenario():
+        buffer = WriteBehindBuffer(FakeRedis())
+        buffer.hset("bitmex:1:orders", {"1": "pending"})
+
+        assert buffer.pending_field("bitmex:1:orders", "1") == "pending"
+        assert buffer.overlay("bitmex:1:orders", {"1": "stored", "2": "stored"}) == {"1": "pending", "2": "stored"}
+
+        flush = asyncio.ensure_future(buffer.flush())
+        await asyncio.sleep(0)
+        # Sent to Redis but not acknowledged yet
+        assert buffer.pending_field("bitmex:1:orders", "1") == "pending"
+        await flush
+        assert buffer.pending_field("bitmex:1:orders", "1") is None
+
+    asyncio.run(scenario())
+
+
+def test_failed_flush_is_retried_and_newer_writes_win():
+    async def scenario():
+        client = FakeRedis(failures=1)
+        buffer = WriteBehindBuffer(client)
+        buffer.hset("bitmex:1:tickers", {"XBTUSD": "old", "ETHUSD": "old"})
+
+        flush = asyncio.ensure_future(buffer.flush())
+        await asyncio.sleep(0)
+        buffer.hset("bitmex:1:tickers", {"XBTUSD": "new"})
+        await flush
+
+        assert client.flushes == []
+        assert buffer.pending_field("bitmex:1:tickers", "XBTUSD") == "new"
+
+        await buffer.flush()
+        assert client.hashes == {"bitmex:1:tickers": {"XBTUSD": "new", "ETHUSD": "old"}}
+
+    asyncio.run(scenario())
+
+
+def test_flushes_once_writes_are_quiet():
+    async def scenario():
+        client = FakeRedis()
+        buffer = WriteBehindBuffer(client, flush_interval=0.02, max_lag=1)
+        buffer.start()
+
+        buffer.hset("bitmex:1:tickers", {"XBTUSD": "a"})
+        await asyncio.sleep(0.01)
+        buffer.hset("bitmex:1:tickers", {"XBTUSD": "b"})
+        await asyncio.sleep(0.01)
+        assert client.flushes == []
+
+        await asyncio.sleep(0.03)
+        assert client.flushes == [[("bitmex:1:tickers", {"XBTUSD": "b"})]]
+        await buffer.stop()
+
+    asyncio.run(scenario())
+
+
+def test_continuous_writes_are_flushed_within_the_max_lag():
+    async def scenario():
+        client = FakeRedis()
+        buffer = WriteBehindBuffer(client, flush_interval=0.02, max_lag=0.05)
+        buffer.start()
+
+        for price in range(10):
+            buffer.hset("bitmex:1:tickers", {"XBTUSD": str(price)})
+            await asyncio.sleep(0.01)
+
+        assert client.flushes
+        await buffer.stop()
+
+    asyncio.run(scenario())
+
+
+def test_stop_writes_what_is_still_pending():
+    async def scenario():
+        client = FakeRedis()
+        buffer = WriteBehindBuffer(client, flush_interval=10, max_lag=10)
+        buffer.start()
+
+        buffer.hset("bitmex:1:positions", {"XBTUSD": "a"})
+        await buffer.stop()
+
+        assert client.hashes == {"bitmex:1:positions": {"XBTUSD": "a"}}
+
+    asyncio.run(scenario())
+
+
+def test_failed_flushes_back_off_until_one_succeeds():
+    async def scenario():
+        client = FakeRedis(failures=1000)
+        buffer = WriteBehindBuffer(client, flush_interval=0.01, max_lag=0.01, max_retry_delay=0.04)
+        buffer.start()
+
+        buffer.hset("bitmex:1:tickers", {"XBTUSD": "a"})
+        await asyncio.sleep(0.2)
+        # 0.01, 0.02, 0.04, 0.04... apart instead of every 0.01 seconds
+        assert 3 <= client.attempts <= 7
+
+        client.failures = 0
+        await asyncio.sleep(0.06)
+        assert client.hashes == {"bitmex:1:tickers": {"XBTUSD": "a"}}
+
+        attempts = client.attempts
+        buffer.hset("bitmex:1:tickers", {"XBTUSD": "b"})
+        await asyncio.sleep(0.03)
+        assert client.attempts == attempts + 1
+        await buffer.stop()
+
+    asyncio.run(scenario())